@@ -0,0 +1,406 @@
+import abc
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+LEXICON_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lexicons')
+
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+|\n+')
+_WORD_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+# Punctuation ends a RAKE candidate phrase just like a stopword does
+_CHUNK_RE = re.compile(r"[^\w\s']+")
+# Batch token stream: words, punctuation runs and a sentence separator
+# (\x1e is whitespace to \s, so it never merges into a word or chunk)
+_SENTENCE_SEPARATOR = '\x1e'
+_STREAM_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?|\x1e|[^\w\s']+")
+
+NEGATIONS = frozenset((
+    'not', 'no', 'never', 'none', 'nobody', 'nothing', 'neither', 'nor', 'without', 'hardly', 'cannot',
+    "isn't", "wasn't", "aren't", "weren't", "don't", "doesn't", "didn't", "can't", "couldn't",
+    "won't", "wouldn't", "shouldn't",
+))
+NEGATION_WINDOW = 3
+# A negated word keeps part of its weight with the sign flipped: "not good"
+# is mildly negative rather than as negative as "bad"
+NEGATION_FACTOR = -0.75
+INTENSIFIERS = {
+    'very': 1.5, 'really': 1.5, 'so': 1.3, 'too': 1.3, 'highly': 1.5,
+    'extremely': 2.0, 'incredibly': 2.0, 'slightly': 0.5, 'somewhat': 0.5, 'barely': 0.5,
+}
+# Squashes the summed score into (-1, 1); 15 is VADER's constant
+NORMALIZATION_ALPHA = 15
+NEUTRAL_BAND = 0.05
+MAX_PHRASE_WORDS = 3
+MAX_KEYWORDS = 5
+
+
+def load_lexicon(path):
+    scores = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip() and not line.startswith('#'):
+                word, score = line.rstrip('\n').split('\t')
+                scores[word] = float(score)
+    return scores
+
+
+def load_wordlist(path):
+    with open(path, encoding='utf-8') as f:
+        return frozenset(line.strip() for line in f if line.strip())
+
+
+def split_sentences(text):
+    return [s.strip() for s in _SENTENCE_RE.split(text) if s.strip()]
+
+
+def tokenize(text):
+    return _WORD_RE.findall(text.lower())
+
+
+class AnalysisEngine(abc.ABC):
+    """Backend for /api/ai/analyze.
+
+    Engines load lexicons and models in ``__init__`` and are built once per
+    process at import, so ``analyze`` only pays for the document itself.
+    """
+
+    name = None
+    version = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._documents = 0
+        self._stage_ms = Counter()
+
+    @abc.abstractmethod
+    def analyze(self, text):
+        """Return the analysis dict and per-stage timings in ms."""
+
+    def analyze_batch(self, texts):
+        """Analyze many texts; returns a list of analyses and batch timings."""
+        results = []
+        timings = Counter()
+        for text in texts:
+            result, doc_timings = self.analyze(text)
+            results.append(result)
+            timings.update(doc_timings)
+        return results, dict(timings)
+
+    def _record(self, timings, documents=1):
+        with self._lock:
+            self._documents += documents
+            self._stage_ms.update(timings)
+
+    def stats(self):
+        with self._lock:
+            documents = self._documents
+            return {
+                'engine': self.name,
+                'version': self.version,
+                'documents': documents,
+                'avg_ms': {stage: round(total / documents, 3) for stage, total in self._stage_ms.items()}
+                if documents else {},
+            }
+
+
+class LexiconEngine(AnalysisEngine):
+    """Offline analysis: lexicon sentiment, RAKE keywords, extractive summary."""
+
+    name = 'lexicon'
+    version = '1'
+
+    def __init__(self, lexicon_dir=LEXICON_DIR):
+        super().__init__()
+        self.lexicon = load_lexicon(os.path.join(lexicon_dir, 'sentiment.tsv'))
+        self.stopwords = load_wordlist(os.path.join(lexicon_dir, 'stopwords.txt'))
+
+    def analyze(self, text):
+        timings = {}
+        started = mark = time.perf_counter()
+
+        def lap(stage):
+            nonlocal mark
+            now = time.perf_counter()
+            timings[stage] = (now - mark) * 1000
+            mark = now
+
+        sentences = split_sentences(text)
+        tokenized = [tokenize(sentence) for sentence in sentences]
+        lap('tokenize')
+        compound, hits = self._sentiment(tokenized)
+        lap('sentiment')
+        keywords = self._keywords(sentences)
+        lap('keywords')
+        summary = self._summarize(sentences, tokenized)
+        lap('summary')
+        timings['total'] = (time.perf_counter() - started) * 1000
+        self._record(timings)
+
+        word_count = sum(len(tokens) for tokens in tokenized)
+        return self._result(compound, hits, keywords, summary, word_count), timings
+
+    def analyze_batch(self, texts):
+        """Vectorised ``analyze``: one tokenisation pass over every text, then
+        NumPy over flat token arrays for all documents at once.
+
+        Produces the same analyses as calling ``analyze`` on each text.
+        """
+        timings = {}
+        started = mark = time.perf_counter()
+
+        def lap(stage):
+            nonlocal mark
+            now = time.perf_counter()
+            timings[stage] = (now - mark) * 1000
+            mark = now
+
+        # One regex pass over every sentence of every text, then a single
+        # dict lookup per token to turn the strings into vocabulary ids
+        doc_sentences = [split_sentences(text) for text in texts]
+        sentence_doc = np.repeat(np.arange(len(texts)), [len(s) for s in doc_sentences])
+        stream = _STREAM_RE.findall(_SENTENCE_SEPARATOR.join(
+            sentence.replace(_SENTENCE_SEPARATOR, ' ') for sentences in doc_sentences for sentence in sentences
+        ).lower())
+        index = {token: i for i, token in enumerate(dict.fromkeys(stream))}
+        stream_ids = np.fromiter(map(index.__getitem__, stream), dtype=np.int64, count=len(stream))
+        vocabulary = list(index)
+        vocabulary_is_word = np.array([w[0].isalnum() for w in vocabulary], dtype=bool)
+        vocabulary_kind = np.where(vocabulary_is_word, 0, 2).astype(np.int8)
+        vocabulary_kind[np.array([w == _SENTENCE_SEPARATOR for w in vocabulary], dtype=bool)] = 1
+        kind = vocabulary_kind[stream_ids]
+
+        # Flat word arrays: term id, document, global sentence index, and
+        # whether punctuation separated the word from the previous one
+        is_word = kind == 0
+        after_chunk = np.zeros(len(stream), dtype=bool)
+        after_chunk[1:] = kind[:-1] == 2
+        token_sentence = np.cumsum(kind == 1)[is_word]
+        token_break = after_chunk[is_word]
+        token_doc = sentence_doc[token_sentence]
+        # Re-number the words so punctuation has no term id
+        term_of = np.cumsum(vocabulary_is_word) - 1
+        terms = term_of[stream_ids[is_word]]
+        words = [w for w, word in zip(vocabulary, vocabulary_is_word) if word]
+        n_docs, n_sentences, n_terms = len(texts), len(sentence_doc), len(words)
+
+        term_score = np.array([self.lexicon.get(w, 0.0) for w in words], dtype=np.float64)
+        term_boost = np.array([INTENSIFIERS.get(w, 1.0) for w in words], dtype=np.float64)
+        term_negation = np.array([w in NEGATIONS for w in words], dtype=bool)
+        term_stop = np.array([w in self.stopwords for w in words], dtype=bool)
+        term_breaks_phrase = term_stop | np.array([w.isdigit() or len(w) < 2 for w in words], dtype=bool)
+        lap('tokenize')
+
+        # Sentiment: look-behinds become shifted comparisons within a sentence
+        score = term_score[terms] if n_terms else np.zeros(0)
+        boost = np.ones_like(score)
+        negated = np.zeros(len(terms), dtype=bool)
+        if len(terms) > 1:
+            same = token_sentence[1:] == token_sentence[:-1]
+            boost[1:] = np.where(same, term_boost[terms[:-1]], 1.0)
+            is_negation = term_negation[terms]
+            for k in range(1, NEGATION_WINDOW + 1):
+                if k < len(terms):
+                    negated[k:] |= is_negation[:-k] & (token_sentence[k:] == token_sentence[:-k])
+        adjusted = score * boost * np.where(negated, NEGATION_FACTOR, 1.0)
+        totals = np.bincount(token_doc, weights=adjusted, minlength=n_docs)
+        hits = np.bincount(token_doc, weights=score != 0, minlength=n_docs)
+        compound = totals / np.sqrt(totals * totals + NORMALIZATION_ALPHA)
+        lap('sentiment')
+
+        keywords = self._batch_keywords(terms, token_doc, token_sentence, token_break,
+                                        term_breaks_phrase, words, n_docs, n_terms)
+        lap('keywords')
+
+        # Summary: per-(document, term) counts over content words, summed
+        # per sentence
+        sentence_score = np.zeros(n_sentences)
+        content = ~term_stop[terms] if n_terms else np.zeros(0, dtype=bool)
+        if content.any():
+            key = token_doc[content] * n_terms + terms[content]
+            _, inverse, counts = np.unique(key, return_inverse=True, return_counts=True)
+            frequency = counts[inverse].astype(np.float64)
+            top = np.ones(n_docs)
+            np.maximum.at(top, token_doc[content], frequency)
+            sums = np.bincount(token_sentence[content], weights=frequency, minlength=n_sentences)
+            lengths = np.bincount(token_sentence[content], minlength=n_sentences)
+            has_content = lengths > 0
+            sentence_score[has_content] = (
+                sums[has_content] / top[sentence_doc[has_content]] / np.sqrt(lengths[has_content])
+            )
+        first_sentence = np.ones(n_sentences, dtype=bool)
+        first_sentence[1:] = sentence_doc[1:] != sentence_doc[:-1]
+        sentence_score[first_sentence] += 0.1
+
+        summaries = []
+        offset = 0
+        for sentences in doc_sentences:
+            scores = sentence_score[offset:offset + len(sentences)].tolist()
+            offset += len(sentences)
+            summaries.append(' '.join(sentences) if len(sentences) <= 2 else self._pick_sentences(sentences, scores))
+        lap('summary')
+
+        word_counts = np.bincount(token_doc, minlength=n_docs)
+        results = [
+            self._result(float(compound[d]), hits[d] > 0, keywords[d], summaries[d], int(word_counts[d]))
+            for d in range(n_docs)
+        ]
+        timings['total'] = (time.perf_counter() - started) * 1000
+        self._record(timings, documents=n_docs)
+        return results, timings
+
+    def _batch_keywords(self, terms, token_doc, token_sentence, token_break,
+                        term_breaks_phrase, words, n_docs, n_terms):
+        keywords = [[] for _ in range(n_docs)]
+        if not len(terms):
+            return keywords
+
+        # Phrases are runs of non-breaking tokens within one sentence, cut
+        # to their first MAX_PHRASE_WORDS words
+        valid = ~term_breaks_phrase[terms]
+        continues = np.zeros(len(terms), dtype=bool)
+        continues[1:] = valid[:-1] & (token_sentence[1:] == token_sentence[:-1]) & ~token_break[1:]
+        starts = valid & ~continues
+        if not starts.any():
+            return keywords
+        phrase_of = np.cumsum(starts) - 1
+        phrase_start = np.flatnonzero(starts)
+        positions = np.flatnonzero(valid)
+        kept = positions[positions - phrase_start[phrase_of[positions]] < MAX_PHRASE_WORDS]
+        phrase = phrase_of[kept]
+        phrase_length = np.bincount(phrase, minlength=len(phrase_start))
+
+        # RAKE degree/frequency per (document, term), then summed per phrase
+        key = token_doc[kept] * n_terms + terms[kept]
+        _, inverse, frequency = np.unique(key, return_inverse=True, return_counts=True)
+        degree = np.bincount(inverse, weights=phrase_length[phrase])
+        phrase_score = np.bincount(phrase, weights=degree[inverse] / frequency[inverse],
+                                   minlength=len(phrase_start))
+
+        # Best first within each document; equal scores keep first appearance
+        phrase_doc = token_doc[phrase_start]
+        order = np.lexsort((np.arange(len(phrase_start)), -phrase_score, phrase_doc))
+        bounds = np.searchsorted(phrase_doc[order], np.arange(n_docs + 1))
+        for doc in range(n_docs):
+            seen = keywords[doc]
+            for p in order[bounds[doc]:bounds[doc + 1]]:
+                start = phrase_start[p]
+                text = ' '.join(words[t] for t in terms[start:start + phrase_length[p]])
+                if text not in seen:
+                    seen.append(text)
+                    if len(seen) == MAX_KEYWORDS:
+                        break
+        return keywords
+
+    def _result(self, compound, hits, keywords, summary, word_count):
+        label = self._label(compound)
+        return {
+            'sentiment': label,
+            'sentiment_score': round(compound, 4),
+            'keywords': keywords,
+            'summary': summary,
+            'word_count': word_count,
+            # Evidence-weighted: no sentiment words at all is a coin toss
+            'confidence': round(min(0.99, 0.5 + abs(compound) / 2), 2) if hits else 0.5,
+            'recommendations': self._recommendations(label, keywords, word_count),
+        }
+
+    def _sentiment(self, tokenized):
+        total = 0.0
+        hits = 0
+        for tokens in tokenized:
+            for i, token in enumerate(tokens):
+                score = self.lexicon.get(token)
+                if score is None:
+                    continue
+                hits += 1
+                if i and tokens[i - 1] in INTENSIFIERS:
+                    score *= INTENSIFIERS[tokens[i - 1]]
+                if any(t in NEGATIONS for t in tokens[max(0, i - NEGATION_WINDOW):i]):
+                    score *= NEGATION_FACTOR
+                total += score
+        return total / math.sqrt(total * total + NORMALIZATION_ALPHA), hits
+
+    def _label(self, compound):
+        if compound >= NEUTRAL_BAND:
+            return 'positive'
+        if compound <= -NEUTRAL_BAND:
+            return 'negative'
+        return 'neutral'
+
+    def _candidate_phrases(self, sentences):
+        for sentence in sentences:
+            for chunk in _CHUNK_RE.split(sentence.lower()):
+                phrase = []
+                for word in _WORD_RE.findall(chunk):
+                    if word in self.stopwords or word.isdigit() or len(word) < 2:
+                        if phrase:
+                            yield tuple(phrase)
+                        phrase = []
+                    else:
+                        phrase.append(word)
+                if phrase:
+                    yield tuple(phrase)
+
+    def _keywords(self, sentences):
+        # RAKE: a word's score is its co-occurrence degree over its frequency,
+        # a phrase's score the sum over its words
+        phrases = [p[:MAX_PHRASE_WORDS] for p in self._candidate_phrases(sentences)]
+        frequency = Counter()
+        degree = Counter()
+        for phrase in phrases:
+            for word in phrase:
+                frequency[word] += 1
+                degree[word] += len(phrase)
+        scored = {}
+        for phrase in phrases:
+            if phrase not in scored:
+                scored[phrase] = sum(degree[w] / frequency[w] for w in phrase)
+        # sorted() is stable, so ties keep their order of appearance
+        ranked = sorted(scored, key=scored.get, reverse=True)
+        return [' '.join(phrase) for phrase in ranked[:MAX_KEYWORDS]]
+
+    def _summarize(self, sentences, tokenized):
+        if len(sentences) <= 2:
+            return ' '.join(sentences)
+        # Luhn-style: sentences dense in the document's frequent content
+        # words, with a nudge for the opening sentence
+        content = [[t for t in tokens if t not in self.stopwords] for tokens in tokenized]
+        frequency = Counter(t for tokens in content for t in tokens)
+        top = max(frequency.values(), default=1)
+        scores = []
+        for index, tokens in enumerate(content):
+            score = sum(frequency[t] for t in tokens) / top / math.sqrt(len(tokens)) if tokens else 0.0
+            scores.append(score + (0.1 if index == 0 else 0.0))
+        return self._pick_sentences(sentences, scores)
+
+    def _pick_sentences(self, sentences, scores):
+        count = 1 if len(sentences) <= 4 else 2 if len(sentences) <= 12 else 3
+        chosen = sorted(sorted(range(len(sentences)), key=scores.__getitem__, reverse=True)[:count])
+        return ' '.join(sentences[i] for i in chosen)
+
+    def _recommendations(self, label, keywords, word_count):
+        recommendations = []
+        if label == 'negative':
+            recommendations.append('Follow up on the concerns raised')
+        if keywords:
+            recommendations.append(f'Create a task for "{keywords[0]}"')
+        if word_count > 150:
+            recommendations.append('Save the summary to the knowledge base')
+        return recommendations or ['No follow-up needed']
+
+
+ENGINES = {
+    LexiconEngine.name: LexiconEngine,
+}
+
+
+def create_engine(name):
+    try:
+        return ENGINES[name]()
+    except KeyError:
+        raise ValueError(f'Unknown analysis engine {name!r}; available: {", ".join(ENGINES)}') from None
@@ -1,87 +1,213 @@
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from flask import Flask, Response, request, jsonify, render_template, send_from_directory, make_response, stream_with_context
 from flask_cors import CORS
 import os
 import json
+import base64
+import hashlib
+import hmac
 import sqlite3
 from datetime import datetime
 import logging
-from werkzeug.security import generate_password_hash, check_password_hash
+import signal
+import time
+import uuid
 import jwt
+import click
 from functools import wraps
+import database
+import migrations
+import queries
+import search
+import semantic
+import tagging
+import sync
+import analysis
+import generation
+import jobs
+import resultcache
+import auth
+import passwords
+import ratelimit
+import compression
+import assets
+import benchmarks
+from database import get_db, run_write, PoolTimeout
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 app = Flask(__name__, static_folder='../frontend/dist', template_folder='../frontend/dist')
 CORS(app)
 
+# Number of proxies in front of us whose X-Forwarded-For is trusted, so
+# rate limits key on the real client address. 0 (the default) ignores the
+# header: with no proxy, clients could otherwise pick their own address.
+# railway.toml sets 1 for Railway's edge proxy.
+app.config['TRUSTED_PROXIES'] = int(os.environ.get('TRUSTED_PROXIES', 0))
+if app.config['TRUSTED_PROXIES']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXIES'])
+
 # Configuration
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'aria-enhanced-secret-key-2024')
 app.config['DATABASE'] = 'aria_enhanced.db'
 
+# /api/metrics exposes pool, queue and cache internals: it is off unless
+# METRICS_TOKEN is set, and then needs "Authorization: Bearer <token>"
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+
+# Connection pool (one per worker process)
+database.init_app(app)
+
+# gzip/brotli for API responses; static files use build-time sidecars
+compression.init_app(app)
+
+# Per-worker cache of verified JWT claims
+app.config['TOKEN_CACHE_SIZE'] = int(os.environ.get('TOKEN_CACHE_SIZE', 10000))
+token_cache = auth.TokenCache(max_size=app.config['TOKEN_CACHE_SIZE'])
+
+# Short-lived access tokens, renewed with rotating refresh tokens
+app.config['ACCESS_TOKEN_TTL'] = int(os.environ.get('ACCESS_TOKEN_TTL', 900))
+app.config['REFRESH_TOKEN_TTL'] = int(os.environ.get('REFRESH_TOKEN_TTL', 30 * 86400))
+revocations = auth.RevocationList()
+
+# Password hashing runs off the request thread with a bounded queue;
+# tune the cost per host with `flask bench password-hash`
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+app.config['PASSWORD_SALT_LENGTH'] = int(os.environ.get('PASSWORD_SALT_LENGTH', 16))
+app.config['HASH_POOL_WORKERS'] = int(os.environ.get('HASH_POOL_WORKERS', os.cpu_count() or 1))
+app.config['HASH_POOL_QUEUE'] = int(os.environ.get('HASH_POOL_QUEUE', 2 * app.config['HASH_POOL_WORKERS']))
+hashing_pool = passwords.HashingPool(
+    workers=app.config['HASH_POOL_WORKERS'],
+    max_queue=app.config['HASH_POOL_QUEUE'],
+    policy=passwords.PasswordPolicy(app.config['PASSWORD_HASH_METHOD'], app.config['PASSWORD_SALT_LENGTH'])
+)
+
+# Auth rate limits as 'burst/seconds', shared by all workers
+app.config['RATE_LIMIT_ENABLED'] = os.environ.get('RATE_LIMIT_ENABLED', '1') == '1'
+app.config['RATE_LIMIT_DATABASE'] = os.environ.get('RATE_LIMIT_DATABASE', 'ratelimit.db')
+app.config['RATE_LIMIT_LOGIN_IP'] = ratelimit.parse_limit(os.environ.get('RATE_LIMIT_LOGIN_IP', '20/60'))
+app.config['RATE_LIMIT_LOGIN_USER'] = ratelimit.parse_limit(os.environ.get('RATE_LIMIT_LOGIN_USER', '5/300'))
+app.config['RATE_LIMIT_REGISTER_IP'] = ratelimit.parse_limit(os.environ.get('RATE_LIMIT_REGISTER_IP', '10/3600'))
+rate_limiter = ratelimit.RateLimiter(app.config['RATE_LIMIT_DATABASE'], enabled=app.config['RATE_LIMIT_ENABLED'])
+
+# index.html pointing at fingerprinted assets from `flask build-assets`
+app.config['INDEX_MAX_AGE'] = int(os.environ.get('INDEX_MAX_AGE', 60))
+index_page = assets.IndexPage(app.static_folder, max_age=app.config['INDEX_MAX_AGE'])
+
+# Analysis engine, loaded at import so preloaded workers share its lexicons
+app.config['ANALYSIS_ENGINE'] = os.environ.get('ANALYSIS_ENGINE', 'lexicon')
+app.config['ANALYSIS_MAX_CHARS'] = int(os.environ.get('ANALYSIS_MAX_CHARS', 100000))
+app.config['ANALYSIS_MAX_BATCH'] = int(os.environ.get('ANALYSIS_MAX_BATCH', 500))
+analysis_engine = analysis.create_engine(app.config['ANALYSIS_ENGINE'])
+
+# Analyze/generate results keyed by a hash of their inputs: a per-worker LRU
+# in front of a SQLite file shared by all workers. Keys are per user unless
+# RESULT_CACHE_SHARED=1, so hits never reveal what someone else submitted.
+app.config['RESULT_CACHE_ENABLED'] = os.environ.get('RESULT_CACHE_ENABLED', '1') == '1'
+app.config['RESULT_CACHE_SHARED'] = os.environ.get('RESULT_CACHE_SHARED', '0') == '1'
+app.config['RESULT_CACHE_DATABASE'] = os.environ.get('RESULT_CACHE_DATABASE', 'resultcache.db')
+app.config['RESULT_CACHE_TTL'] = int(os.environ.get('RESULT_CACHE_TTL', 86400))
+app.config['RESULT_CACHE_MEMORY_BYTES'] = int(os.environ.get('RESULT_CACHE_MEMORY_BYTES', 32 * 1024 * 1024))
+app.config['RESULT_CACHE_DISK_BYTES'] = int(os.environ.get('RESULT_CACHE_DISK_BYTES', 256 * 1024 * 1024))
+result_cache = resultcache.ResultCache(
+    app.config['RESULT_CACHE_DATABASE'],
+    ttl=app.config['RESULT_CACHE_TTL'],
+    memory_bytes=app.config['RESULT_CACHE_MEMORY_BYTES'],
+    disk_bytes=app.config['RESULT_CACHE_DISK_BYTES'],
+    enabled=app.config['RESULT_CACHE_ENABLED']
+)
+
+# Background AI jobs, run by `flask run-jobs` (started next to gunicorn by
+# gunicorn.conf.py unless JOB_RUNNER=external)
+app.config['JOB_PROCESSES'] = int(os.environ.get('JOB_PROCESSES', os.cpu_count() or 1))
+app.config['JOB_MAX_RUNNING_PER_USER'] = int(os.environ.get('JOB_MAX_RUNNING_PER_USER', 2))
+app.config['JOB_MAX_PENDING_PER_USER'] = int(os.environ.get('JOB_MAX_PENDING_PER_USER', 100))
+app.config['JOB_LEASE_SECONDS'] = int(os.environ.get('JOB_LEASE_SECONDS', 120))
+app.config['JOB_MAX_ATTEMPTS'] = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+app.config['JOB_RETENTION_DAYS'] = int(os.environ.get('JOB_RETENTION_DAYS', 7))
+# Webhooks are only sent to these hosts; empty disables them
+app.config['JOB_WEBHOOK_HOSTS'] = frozenset(
+    host.strip().lower() for host in os.environ.get('JOB_WEBHOOK_HOSTS', '').split(',') if host.strip()
+)
+# Webhook bodies are signed with their own key, never SECRET_KEY: receivers
+# holding the JWT key could mint tokens. Share JOB_WEBHOOK_SECRET with them;
+# unset, a key derived one-way from SECRET_KEY is used.
+app.config['JOB_WEBHOOK_SECRET'] = os.environ.get('JOB_WEBHOOK_SECRET') or hmac.new(
+    app.config['SECRET_KEY'].encode(), b'aria-job-webhook-signing', hashlib.sha256
+).hexdigest()
+
+# Per-worker cache of knowledge embedding matrices
+semantic_index = semantic.SemanticIndex()
+
 # Logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Database initialization
 def init_db():
-    conn = sqlite3.connect(app.config['DATABASE'])
-    cursor = conn.cursor()
-    
-    # Users table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            is_active BOOLEAN DEFAULT TRUE
-        )
-    ''')
-    
-    # Tasks table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS tasks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            title TEXT NOT NULL,
-            description TEXT,
-            status TEXT DEFAULT 'pending',
-            priority TEXT DEFAULT 'medium',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
-    
-    # Knowledge base table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS knowledge_base (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            title TEXT NOT NULL,
-            content TEXT NOT NULL,
-            category TEXT DEFAULT 'general',
-            tags TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
-    
-    # Integrations table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS integrations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            name TEXT NOT NULL,
-            type TEXT NOT NULL,
-            config TEXT,
-            is_active BOOLEAN DEFAULT TRUE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    with database.get_pool(app).connection() as conn:
+        version = migrations.migrate(conn)
+        # Sign-up only needs its own case check where the indexes cannot
+        # enforce it; gunicorn runs this in the master, before the fork
+        app.config['USERS_CHECK_CASE'] = not auth.case_insensitive_unique(conn)
+    logger.info(f"Database schema at version {version}")
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Apply pending schema migrations."""
+    init_db()
+
+app.cli.add_command(benchmarks.bench)
+
+@app.cli.command('compress-assets')
+def compress_assets_command():
+    """Write .gz/.br sidecars for the frontend build."""
+    written = compression.precompress_directory(app.static_folder, app.config['COMPRESS_MIN_SIZE'])
+    logger.info(f"Wrote {len(written)} precompressed files")
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Fingerprint css/js for immutable caching, then precompress."""
+    manifest = assets.fingerprint(app.static_folder)
+    for source, hashed in manifest.items():
+        logger.info(f"{source} -> {hashed}")
+    compress_assets_command.callback()
+
+@app.cli.command('prune-changes')
+@click.option('--days', default=30, show_default=True, help='Keep tombstones newer than this.')
+def prune_changes_command(days):
+    """Drop old delete tombstones from the sync change log."""
+    count = run_write(lambda conn: sync.prune_tombstones(conn, days))
+    logger.info(f"Pruned {count} tombstones older than {days} days")
+
+@app.cli.command('run-jobs')
+@click.option('--processes', type=int, default=None, help='Job processes (default JOB_PROCESSES).')
+def run_jobs_command(processes):
+    """Run queued AI jobs until interrupted."""
+    init_db()
+    runner = jobs.JobRunner(
+        run_write,
+        processes=processes or app.config['JOB_PROCESSES'],
+        engine=app.config['ANALYSIS_ENGINE'],
+        max_running_per_user=app.config['JOB_MAX_RUNNING_PER_USER'],
+        lease_seconds=app.config['JOB_LEASE_SECONDS'],
+        max_attempts=app.config['JOB_MAX_ATTEMPTS'],
+        retention_days=app.config['JOB_RETENTION_DAYS'],
+        webhook_secret=app.config['JOB_WEBHOOK_SECRET']
+    )
+    signal.signal(signal.SIGTERM, runner.stop)
+    signal.signal(signal.SIGINT, runner.stop)
+    runner.run()
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Fail if a hot query is not served by an index."""
+    init_db()
+    with database.get_pool(app).connection() as conn:
+        failures = migrations.unindexed_queries(conn)
+    for name, plan in failures.items():
+        logger.error(f"{name} is not using an index: {plan}")
+    if failures:
+        raise SystemExit(1)
+    logger.info(f"All {len(migrations.HOT_QUERIES)} hot queries use an index")
 
 # Authentication decorator
 def token_required(f):
@@ -91,21 +217,133 @@ def token_required(f):
         if not token:
             return jsonify({'message': 'Token is missing'}), 401
         
-        try:
-            if token.startswith('Bearer '):
-                token = token[7:]
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-            current_user_id = data['user_id']
-        except:
-            return jsonify({'message': 'Token is invalid'}), 401
+        if token.startswith('Bearer '):
+            token = token[7:]
+        
+        # Hot path: a token verified earlier is a dictionary lookup
+        data = token_cache.get(token)
+        if data is None:
+            try:
+                data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
+                data['user_id']
+            except:
+                return jsonify({'message': 'Token is invalid'}), 401
+            token_cache.put(token, data)
+        
+        if revocations.is_revoked(data.get('jti'), get_db):
+            return jsonify({'message': 'Token has been revoked'}), 401
+        current_user_id = data['user_id']
         
         return f(current_user_id, *args, **kwargs)
     return decorated
 
+def create_access_token(user_id, username):
+    return jwt.encode({
+        'user_id': user_id,
+        'username': username,
+        'jti': uuid.uuid4().hex,
+        'exp': time.time() + app.config['ACCESS_TOKEN_TTL']
+    }, app.config['SECRET_KEY'], algorithm='HS256')
+
+def issue_tokens(user_id, username):
+    refresh_token = auth.new_refresh_token()
+    expires_at = time.time() + app.config['REFRESH_TOKEN_TTL']
+    run_write(lambda conn: auth.store_refresh_token(conn, refresh_token, user_id, expires_at))
+    return {
+        'token': create_access_token(user_id, username),
+        'refresh_token': refresh_token,
+        'expires_in': app.config['ACCESS_TOKEN_TTL']
+    }
+
+def upgrade_password_hash(user_id, old_hash, password):
+    # Best effort: a busy hashing pool must not turn a valid login into a 503
+    try:
+        new_hash = hashing_pool.hash(password)
+    except passwords.HashingBusy:
+        return
+    run_write(lambda conn: conn.execute(
+        'UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?',
+        (new_hash, user_id, old_hash)
+    ))
+    logger.info(f"Upgraded password hash for user {user_id} to {hashing_pool.policy.method}")
+
+# Conditional GET keyed on per-user collection versions (see migrations.py)
+def collection_etag(user_id, collections):
+    versions = dict(get_db().execute(
+        queries.COLLECTION_VERSIONS, (user_id,)
+    ).fetchall())
+    state = ','.join(f'{name}:{versions.get(name, 0)}' for name in collections)
+    # Query args pick the page/filter, so they are part of the representation
+    digest = hashlib.sha1(f'{user_id}|{state}|{request.query_string.decode()}'.encode()).hexdigest()
+    return digest[:32]
+
+def conditional_get(*collections):
+    def decorator(f):
+        @wraps(f)
+        def decorated(current_user_id, *args, **kwargs):
+            if request.method != 'GET':
+                return f(current_user_id, *args, **kwargs)
+            # Read the versions before the body: a write landing in between
+            # only makes the ETag older than the data, never newer
+            etag = collection_etag(current_user_id, collections)
+            if request.if_none_match.contains_weak(etag):
+                response = app.response_class(status=304)
+            else:
+                response = make_response(f(current_user_id, *args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            response.vary.add('Authorization')
+            return response
+        return decorated
+    return decorator
+
+# Keyset pagination over (created_at, id), newest first
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+class InvalidCursor(ValueError):
+    pass
+
+def encode_cursor(created_at, row_id):
+    raw = json.dumps([created_at, row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(value):
+    try:
+        padded = value + '=' * (-len(value) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return str(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+
+def fetch_page(query, params, key=queries.PAGE_KEY):
+    # query is one of the queries.*_PAGE listings. The seek on key walks a
+    # (user_id, ..., created_at) index, so every page costs the same no
+    # matter how deep the client has scrolled.
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    cursor = request.args.get('cursor')
+    sql = queries.keyset(query, key, after_cursor=bool(cursor))
+    params = list(params)
+    if cursor:
+        params.extend(decode_cursor(cursor))
+    params.append(limit + 1)
+
+    rows = get_db().execute(sql, params).fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][-1], rows[-1][0])
+    return rows, next_cursor
+
 # Routes
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return index_page.response()
 
 @app.route('/api/health')
 def health_check():
@@ -119,121 +357,257 @@ def health_check():
 # Authentication routes
 @app.route('/api/auth/register', methods=['POST'])
 def register():
+    rate_limiter.hit(f'register:ip:{request.remote_addr}', app.config['RATE_LIMIT_REGISTER_IP'])
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Missing required fields'}), 400
         username = data.get('username')
         email = data.get('email')
         password = data.get('password')
         
         if not all([username, email, password]):
             return jsonify({'error': 'Missing required fields'}), 400
+        if not all(isinstance(value, str) for value in (username, email, password)):
+            return jsonify({'error': 'username, email and password must be strings'}), 400
         
-        conn = sqlite3.connect(app.config['DATABASE'])
-        cursor = conn.cursor()
-        
-        # Check if user exists
-        cursor.execute('SELECT id FROM users WHERE username = ? OR email = ?', (username, email))
-        if cursor.fetchone():
+        # Create user; the case-insensitive UNIQUE indexes are the existence check
+        password_hash = hashing_pool.hash(password)
+        check_case = app.config.get('USERS_CHECK_CASE', True)
+        try:
+            user_id = run_write(lambda conn: auth.create_user(conn, username, email, password_hash, check_case))
+        except auth.UserExists:
             return jsonify({'error': 'User already exists'}), 409
         
-        # Create user
-        password_hash = generate_password_hash(password)
-        cursor.execute(
-            'INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
-            (username, email, password_hash)
-        )
-        user_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        
-        # Generate token
-        token = jwt.encode({
-            'user_id': user_id,
-            'username': username,
-            'exp': datetime.utcnow().timestamp() + 86400  # 24 hours
-        }, app.config['SECRET_KEY'], algorithm='HS256')
-        
         return jsonify({
             'message': 'User created successfully',
-            'token': token,
+            **issue_tokens(user_id, username),
             'user': {'id': user_id, 'username': username, 'email': email}
         }), 201
         
+    except passwords.HashingBusy:
+        raise
     except Exception as e:
         logger.error(f"Registration error: {str(e)}")
         return jsonify({'error': 'Registration failed'}), 500
 
 @app.route('/api/auth/login', methods=['POST'])
 def login():
+    rate_limiter.hit(f'login:ip:{request.remote_addr}', app.config['RATE_LIMIT_LOGIN_IP'])
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Missing credentials'}), 400
         username = data.get('username')
         password = data.get('password')
         
         if not all([username, password]):
             return jsonify({'error': 'Missing credentials'}), 400
+        if not isinstance(username, str) or not isinstance(password, str):
+            return jsonify({'error': 'username and password must be strings'}), 400
         
-        conn = sqlite3.connect(app.config['DATABASE'])
-        cursor = conn.cursor()
+        # Only failures spend from the per-account bucket, so a user who
+        # signs in often is never locked out by their own logins
+        user_key = f'login:user:{username.lower()}'
+        rate_limiter.check(user_key, app.config['RATE_LIMIT_LOGIN_USER'])
         
-        cursor.execute(
-            'SELECT id, username, email, password_hash FROM users WHERE username = ? OR email = ?',
-            (username, username)
-        )
-        user = cursor.fetchone()
-        conn.close()
+        conn = get_db()
+        user = auth.find_login_user(conn, username)
         
-        if not user or not check_password_hash(user[3], password):
+        if not user or not hashing_pool.verify(user[3], password):
+            try:
+                rate_limiter.hit(user_key, app.config['RATE_LIMIT_LOGIN_USER'])
+            except ratelimit.RateLimited:
+                pass
             return jsonify({'error': 'Invalid credentials'}), 401
         
-        # Generate token
-        token = jwt.encode({
-            'user_id': user[0],
-            'username': user[1],
-            'exp': datetime.utcnow().timestamp() + 86400  # 24 hours
-        }, app.config['SECRET_KEY'], algorithm='HS256')
+        if hashing_pool.policy.needs_rehash(user[3]):
+            upgrade_password_hash(user[0], user[3], password)
         
         return jsonify({
             'message': 'Login successful',
-            'token': token,
+            **issue_tokens(user[0], user[1]),
             'user': {'id': user[0], 'username': user[1], 'email': user[2]}
         })
         
+    except (passwords.HashingBusy, ratelimit.RateLimited):
+        raise
     except Exception as e:
         logger.error(f"Login error: {str(e)}")
         return jsonify({'error': 'Login failed'}), 500
 
+@app.route('/api/auth/refresh', methods=['POST'])
+def refresh():
+    data = request.get_json(silent=True)
+    refresh_token = data.get('refresh_token') if isinstance(data, dict) else None
+    if not refresh_token:
+        return jsonify({'error': 'Missing refresh token'}), 400
+    if not isinstance(refresh_token, str):
+        return jsonify({'error': 'refresh_token must be a string'}), 400
+    
+    new_refresh_token = auth.new_refresh_token()
+    expires_at = time.time() + app.config['REFRESH_TOKEN_TTL']
+    user = run_write(lambda conn: auth.rotate_refresh_token(conn, refresh_token, new_refresh_token, expires_at))
+    if user is None:
+        return jsonify({'error': 'Invalid refresh token'}), 401
+    
+    return jsonify({
+        'token': create_access_token(user[0], user[1]),
+        'refresh_token': new_refresh_token,
+        'expires_in': app.config['ACCESS_TOKEN_TTL']
+    })
+
+@app.route('/api/auth/logout', methods=['POST'])
+def logout():
+    # The body is optional: the access token alone can be revoked
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    refresh_token = data.get('refresh_token')
+    if refresh_token is not None and not isinstance(refresh_token, str):
+        return jsonify({'error': 'refresh_token must be a string'}), 400
+    
+    claims = None
+    token = request.headers.get('Authorization', '')
+    if token.startswith('Bearer '):
+        token = token[7:]
+    if token:
+        try:
+            claims = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
+        except jwt.InvalidTokenError:
+            claims = None
+    
+    def revoke(conn):
+        if claims and claims.get('jti'):
+            auth.revoke_access_token(conn, claims['jti'], claims['exp'])
+        if refresh_token:
+            auth.revoke_refresh_tokens(conn, token=refresh_token)
+    
+    run_write(revoke)
+    if claims and claims.get('jti'):
+        revocations.add(claims['jti'], claims['exp'])
+        token_cache.invalidate(token)
+    
+    return jsonify({'message': 'Logged out successfully'})
+
+def result_key(endpoint, version, kind, text, user_id):
+    scope = None if app.config['RESULT_CACHE_SHARED'] else user_id
+    return resultcache.cache_key(endpoint, version, kind, text, scope)
+
+def lookup_result(key):
+    # Cache-Control: no-cache on the request skips the lookup but the fresh
+    # result is still stored
+    if request.cache_control.no_cache:
+        return None
+    return result_cache.get(key)
+
+def cached_result(endpoint, version, kind, text, user_id, compute):
+    """Return (result, cache tier or None, timings) for a normalized input."""
+    key = result_key(endpoint, version, kind, text, user_id)
+    started = time.perf_counter()
+    cached = lookup_result(key)
+    if cached is not None:
+        return cached[0], cached[1], {'cache': (time.perf_counter() - started) * 1000}
+    result, timings = compute()
+    result_cache.put(key, result)
+    return result, None, timings
+
+def set_cache_status(response, tier):
+    response.headers['X-Cache'] = 'HIT' if tier else 'MISS'
+    if tier:
+        response.headers['X-Cache-Tier'] = tier
+    return response
+
 # AI Engine routes
+def analysis_text(text):
+    """Validate and normalize one text for analysis.
+
+    Returns (text, None) or (None, (error, status)).
+    """
+    if not isinstance(text, str) or not text.strip():
+        return None, ('Text is required', 400)
+    if len(text) > app.config['ANALYSIS_MAX_CHARS']:
+        return None, (f"Text exceeds {app.config['ANALYSIS_MAX_CHARS']} characters", 413)
+    return resultcache.normalize(text), None
+
 @app.route('/api/ai/analyze', methods=['POST'])
 @token_required
 def ai_analyze(current_user_id):
     try:
-        data = request.get_json()
-        text = data.get('text', '')
-        
-        # Simulate AI analysis
-        analysis = {
-            'sentiment': 'positive' if 'good' in text.lower() else 'neutral',
-            'keywords': text.split()[:5],
-            'summary': f"Analysis of {len(text.split())} words",
-            'confidence': 0.85,
-            'recommendations': [
-                'Consider automation opportunities',
-                'Optimize workflow efficiency',
-                'Implement knowledge base integration'
-            ]
-        }
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
+        text, problem = analysis_text(data.get('text', ''))
+        if problem:
+            return jsonify({'error': problem[0]}), problem[1]
         
-        return jsonify({
+        result, tier, timings = cached_result(
+            'analyze', f'{analysis_engine.name}:{analysis_engine.version}', 'text', text, current_user_id,
+            lambda: analysis_engine.analyze(text)
+        )
+        
+        response = jsonify({
             'status': 'success',
-            'analysis': analysis,
+            'analysis': result,
+            'engine': {'name': analysis_engine.name, 'version': analysis_engine.version},
+            'timings_ms': {stage: round(ms, 3) for stage, ms in timings.items()},
             'processed_at': datetime.now().isoformat()
         })
+        response.headers['Server-Timing'] = ', '.join(f'{stage};dur={ms:.3f}' for stage, ms in timings.items())
+        return set_cache_status(response, tier)
         
     except Exception as e:
         logger.error(f"AI analysis error: {str(e)}")
         return jsonify({'error': 'Analysis failed'}), 500
 
+@app.route('/api/ai/analyze/batch', methods=['POST'])
+@token_required
+def ai_analyze_batch(current_user_id):
+    try:
+        data = request.get_json(silent=True)
+        texts = data.get('texts') if isinstance(data, dict) else None
+        
+        if not isinstance(texts, list) or not texts:
+            return jsonify({'error': 'texts must be a non-empty list'}), 400
+        if not all(isinstance(text, str) for text in texts):
+            return jsonify({'error': 'texts must be a list of strings'}), 400
+        if len(texts) > app.config['ANALYSIS_MAX_BATCH']:
+            return jsonify({'error': f"At most {app.config['ANALYSIS_MAX_BATCH']} texts per batch"}), 413
+        
+        # Each item is checked and normalized as /api/ai/analyze would; an
+        # empty or oversized text gets its own error instead of failing the
+        # whole batch
+        errors = {}
+        normalized = {}
+        for i, text in enumerate(texts):
+            text, problem = analysis_text(text)
+            if problem:
+                errors[i] = problem[0]
+            else:
+                normalized[i] = text
+        valid = list(normalized)
+        
+        analyses, timings = analysis_engine.analyze_batch(list(normalized.values()))
+        results = [{'index': i, 'error': error} for i, error in errors.items()]
+        results += [{'index': i, 'analysis': result} for i, result in zip(valid, analyses)]
+        results.sort(key=lambda item: item['index'])
+        
+        response = jsonify({
+            'status': 'success',
+            'results': results,
+            'engine': {'name': analysis_engine.name, 'version': analysis_engine.version},
+            'timings_ms': {stage: round(ms, 3) for stage, ms in timings.items()},
+            'processed_at': datetime.now().isoformat()
+        })
+        response.headers['Server-Timing'] = ', '.join(f'{stage};dur={ms:.3f}' for stage, ms in timings.items())
+        return response
+        
+    except Exception as e:
+        logger.error(f"AI batch analysis error: {str(e)}")
+        return jsonify({'error': 'Analysis failed'}), 500
+
 @app.route('/api/ai/generate', methods=['POST'])
 @token_required
 def ai_generate(current_user_id):
@@ -242,39 +616,155 @@ def ai_generate(current_user_id):
         prompt = data.get('prompt', '')
         task_type = data.get('type', 'general')
         
-        # Simulate AI generation
-        generated_content = {
-            'email': f"Subject: Automated Response\n\nDear Recipient,\n\nBased on your request: {prompt}\n\nBest regards,\nARIA Enhanced",
-            'report': f"# Automated Report\n\n## Summary\n{prompt}\n\n## Analysis\nGenerated insights and recommendations.",
-            'task': f"Task: {prompt}\nPriority: Medium\nEstimated Time: 30 minutes",
-            'general': f"Generated response for: {prompt}"
-        }
+        if not isinstance(prompt, str) or not isinstance(task_type, str):
+            return jsonify({'error': 'prompt and type must be strings'}), 400
         
-        return jsonify({
+        prompt = resultcache.normalize(prompt)
+        stream_format = request.accept_mimetypes.best_match(GENERATION_FORMATS, default='application/json')
+        if stream_format != 'application/json':
+            return stream_generation(prompt, task_type, stream_format, current_user_id)
+        
+        content, tier, timings = cached_result(
+            'generate', generation.VERSION, task_type, prompt, current_user_id,
+            lambda: (generation.generate(prompt, task_type), {})
+        )
+        
+        response = jsonify({
             'status': 'success',
-            'content': generated_content.get(task_type, generated_content['general']),
+            'content': content,
             'type': task_type,
             'generated_at': datetime.now().isoformat()
         })
+        return set_cache_status(response, tier)
         
     except Exception as e:
         logger.error(f"AI generation error: {str(e)}")
         return jsonify({'error': 'Generation failed'}), 500
 
+def job_input(kind, data):
+    """Validate a job's input the way the matching synchronous route does.
+
+    Returns (payload, None) or (None, (error, status)).
+    """
+    if kind == 'analyze':
+        text, problem = analysis_text(data.get('text', ''))
+        return ({'text': text}, None) if problem is None else (None, problem)
+    prompt = data.get('prompt', '')
+    task_type = data.get('type', 'general')
+    if not isinstance(prompt, str) or not isinstance(task_type, str):
+        return None, ('prompt and type must be strings', 400)
+    return {'prompt': resultcache.normalize(prompt), 'type': task_type}, None
+
+@app.route('/api/ai/jobs', methods=['POST'])
+@token_required
+def create_ai_job(current_user_id):
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    kind = data.get('kind')
+    if kind not in jobs.KINDS:
+        return jsonify({'error': f"kind must be one of {', '.join(jobs.KINDS)}"}), 400
+    job_data = data.get('input', {})
+    if not isinstance(job_data, dict):
+        return jsonify({'error': 'input must be a JSON object'}), 400
+    payload, invalid = job_input(kind, job_data)
+    if invalid:
+        return jsonify({'error': invalid[0]}), invalid[1]
+    try:
+        priority = jobs.parse_priority(data.get('priority', 'normal'))
+        webhook_url = data.get('webhook_url')
+        if webhook_url is not None:
+            jobs.check_webhook_url(str(webhook_url), app.config['JOB_WEBHOOK_HOSTS'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        job_id = run_write(lambda conn: jobs.submit(
+            conn, current_user_id, kind, payload, priority, webhook_url,
+            max_pending=app.config['JOB_MAX_PENDING_PER_USER']
+        ))
+    except jobs.QueueFull:
+        return jsonify({'error': 'Too many pending jobs, wait for some to finish'}), 429, {'Retry-After': '5'}
+    
+    response = jsonify({'job_id': job_id, 'status': 'queued', 'priority': priority})
+    response.status_code = 202
+    response.headers['Location'] = f'/api/ai/jobs/{job_id}'
+    return response
+
+@app.route('/api/ai/jobs/<int:job_id>', methods=['GET'])
+@token_required
+def get_ai_job(current_user_id, job_id):
+    job = jobs.get(get_db(), current_user_id, job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    response = jsonify(job)
+    if job['status'] not in jobs.FINISHED:
+        response.headers['Retry-After'] = '1'
+    return response
+
+# JSON unless the client asks for a stream: Server-Sent Events for
+# browsers, NDJSON for scripts
+GENERATION_FORMATS = ['application/json', 'text/event-stream', 'application/x-ndjson']
+
+def encode_event(stream_format, event, payload):
+    if stream_format == 'application/x-ndjson':
+        return json.dumps({'event': event, **payload}) + '\n'
+    data = json.dumps(payload)
+    if event == 'chunk':
+        return f'data: {data}\n\n'
+    return f'event: {event}\ndata: {data}\n\n'
+
+def stream_generation(prompt, task_type, stream_format, user_id):
+    """Send generated text as it is produced instead of after the last chunk.
+
+    A finished stream is stored in the result cache; a cached result is
+    sent as a single chunk.
+    """
+    key = result_key('generate', generation.VERSION, task_type, prompt, user_id)
+    cached = lookup_result(key)
+    
+    def chunks():
+        if cached is not None:
+            yield cached[0]
+            return
+        parts = []
+        for chunk in generation.stream(prompt, task_type):
+            parts.append(chunk)
+            yield chunk
+        result_cache.put(key, ''.join(parts))
+    
+    def events():
+        try:
+            for chunk in chunks():
+                yield encode_event(stream_format, 'chunk', {'text': chunk})
+        except Exception as e:
+            # Headers are long gone, so the failure is reported in-band
+            logger.error(f"AI generation stream error: {str(e)}")
+            yield encode_event(stream_format, 'error', {'error': 'Generation failed'})
+            return
+        yield encode_event(stream_format, 'done', {
+            'status': 'success',
+            'type': task_type,
+            'generated_at': datetime.now().isoformat()
+        })
+    
+    response = Response(stream_with_context(events()), mimetype=stream_format)
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop nginx-style proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return set_cache_status(response, cached[1] if cached else None)
+
 # Task management routes
 @app.route('/api/tasks', methods=['GET', 'POST'])
 @token_required
+@conditional_get('tasks')
 def tasks(current_user_id):
-    conn = sqlite3.connect(app.config['DATABASE'])
-    cursor = conn.cursor()
-    
     if request.method == 'GET':
-        cursor.execute(
-            'SELECT id, title, description, status, priority, created_at FROM tasks WHERE user_id = ? ORDER BY created_at DESC',
-            (current_user_id,)
+        rows, next_cursor = fetch_page(
+            queries.TASKS_PAGE, (current_user_id,)
         )
         tasks = []
-        for row in cursor.fetchall():
+        for row in rows:
             tasks.append({
                 'id': row[0],
                 'title': row[1],
@@ -283,8 +773,7 @@ def tasks(current_user_id):
                 'priority': row[4],
                 'created_at': row[5]
             })
-        conn.close()
-        return jsonify({'tasks': tasks})
+        return jsonify({'tasks': tasks, 'next_cursor': next_cursor})
     
     elif request.method == 'POST':
         data = request.get_json()
@@ -292,13 +781,10 @@ def tasks(current_user_id):
         description = data.get('description', '')
         priority = data.get('priority', 'medium')
         
-        cursor.execute(
+        task_id = run_write(lambda conn: conn.execute(
             'INSERT INTO tasks (user_id, title, description, priority) VALUES (?, ?, ?, ?)',
             (current_user_id, title, description, priority)
-        )
-        task_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        ).lastrowid)
         
         return jsonify({
             'message': 'Task created successfully',
@@ -308,88 +794,157 @@ def tasks(current_user_id):
 @app.route('/api/tasks/<int:task_id>', methods=['PUT', 'DELETE'])
 @token_required
 def task_detail(current_user_id, task_id):
-    conn = sqlite3.connect(app.config['DATABASE'])
-    cursor = conn.cursor()
-    
     if request.method == 'PUT':
         data = request.get_json()
         status = data.get('status')
         
-        cursor.execute(
+        run_write(lambda conn: conn.execute(
             'UPDATE tasks SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ? AND user_id = ?',
             (status, task_id, current_user_id)
-        )
-        conn.commit()
-        conn.close()
+        ))
         
         return jsonify({'message': 'Task updated successfully'})
     
     elif request.method == 'DELETE':
-        cursor.execute('DELETE FROM tasks WHERE id = ? AND user_id = ?', (task_id, current_user_id))
-        conn.commit()
-        conn.close()
+        run_write(lambda conn: conn.execute(
+            'DELETE FROM tasks WHERE id = ? AND user_id = ?', (task_id, current_user_id)
+        ))
         
         return jsonify({'message': 'Task deleted successfully'})
 
 # Knowledge base routes
 @app.route('/api/knowledge', methods=['GET', 'POST'])
 @token_required
+@conditional_get('knowledge')
 def knowledge_base(current_user_id):
-    conn = sqlite3.connect(app.config['DATABASE'])
-    cursor = conn.cursor()
-    
     if request.method == 'GET':
-        cursor.execute(
-            'SELECT id, title, content, category, tags, created_at FROM knowledge_base WHERE user_id = ? ORDER BY created_at DESC',
-            (current_user_id,)
-        )
+        tag = request.args.get('tag', '').strip()
+        if tag:
+            rows, next_cursor = fetch_page(
+                queries.KNOWLEDGE_TAG_PAGE, (current_user_id, tag), key=queries.KNOWLEDGE_TAG_KEY
+            )
+        else:
+            rows, next_cursor = fetch_page(
+                queries.KNOWLEDGE_PAGE, (current_user_id,)
+            )
+        tags_by_id = tagging.tags_for(get_db(), [row[0] for row in rows])
         knowledge = []
-        for row in cursor.fetchall():
+        for row in rows:
             knowledge.append({
                 'id': row[0],
                 'title': row[1],
                 'content': row[2],
                 'category': row[3],
-                'tags': row[4].split(',') if row[4] else [],
-                'created_at': row[5]
+                'tags': tags_by_id[row[0]],
+                'created_at': row[4]
             })
-        conn.close()
-        return jsonify({'knowledge': knowledge})
+        return jsonify({'knowledge': knowledge, 'next_cursor': next_cursor})
     
     elif request.method == 'POST':
-        data = request.get_json()
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
         title = data.get('title')
         content = data.get('content')
         category = data.get('category', 'general')
-        tags = ','.join(data.get('tags', []))
+        tag_values = data.get('tags') or []
         
-        cursor.execute(
-            'INSERT INTO knowledge_base (user_id, title, content, category, tags) VALUES (?, ?, ?, ?, ?)',
-            (current_user_id, title, content, category, tags)
-        )
-        knowledge_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        if not title or not content:
+            return jsonify({'error': 'Title and content are required'}), 400
+        if not all(isinstance(value, str) for value in (title, content, category)):
+            return jsonify({'error': 'title, content and category must be strings'}), 400
+        if not isinstance(tag_values, list) or not all(isinstance(tag, str) for tag in tag_values):
+            return jsonify({'error': 'tags must be a list of strings'}), 400
+        tag_names = tagging.normalize_tags(tag_values)
+        # The joined column is kept only as the FTS/embedding source text
+        tags = ','.join(tag_names)
+        
+        vector = semantic.embed(semantic.entry_text(title, content, tags))
+        
+        def create_entry(conn):
+            knowledge_id = conn.execute(
+                'INSERT INTO knowledge_base (user_id, title, content, category, tags) VALUES (?, ?, ?, ?, ?)',
+                (current_user_id, title, content, category, tags)
+            ).lastrowid
+            tagging.save_tags(conn, knowledge_id, current_user_id, tag_names)
+            search.index_entry(conn, knowledge_id, current_user_id, title, content, tags)
+            semantic.store_embedding(conn, knowledge_id, current_user_id, vector)
+            return knowledge_id
+        
+        knowledge_id = run_write(create_entry)
+        semantic_index.add(current_user_id, knowledge_id, vector)
         
         return jsonify({
             'message': 'Knowledge entry created successfully',
             'knowledge_id': knowledge_id
         }), 201
 
+@app.route('/api/knowledge/tags')
+@token_required
+def knowledge_tags(current_user_id):
+    limit = max(1, min(request.args.get('limit', 100, type=int), 500))
+    return jsonify({'tags': tagging.tag_cloud(get_db(), current_user_id, limit)})
+
+@app.route('/api/knowledge/search')
+@token_required
+def knowledge_search(current_user_id):
+    query = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    if not query:
+        return jsonify({'error': 'Missing search query'}), 400
+
+    results = search.search_knowledge(get_db(), current_user_id, query, limit)
+    return jsonify({'query': query, 'results': results})
+
+def similarity_results(matches):
+    if not matches:
+        return []
+    scores = dict(matches)
+    placeholders = ','.join('?' * len(scores))
+    rows = get_db().execute(
+        f'SELECT id, title, category, created_at FROM knowledge_base WHERE id IN ({placeholders})',
+        list(scores)
+    ).fetchall()
+    results = [{
+        'id': row[0],
+        'title': row[1],
+        'category': row[2],
+        'created_at': row[3],
+        'similarity': round(scores[row[0]], 4)
+    } for row in rows]
+    return sorted(results, key=lambda r: r['similarity'], reverse=True)
+
+@app.route('/api/knowledge/similar/<int:knowledge_id>')
+@token_required
+def knowledge_similar(current_user_id, knowledge_id):
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    matches = semantic_index.similar_to(get_db(), current_user_id, knowledge_id, limit)
+    if matches is None:
+        return jsonify({'error': 'Knowledge entry not found'}), 404
+    return jsonify({'knowledge_id': knowledge_id, 'results': similarity_results(matches)})
+
+@app.route('/api/knowledge/semantic')
+@token_required
+def knowledge_semantic(current_user_id):
+    query = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    if not query:
+        return jsonify({'error': 'Missing search query'}), 400
+
+    matches = semantic_index.query(get_db(), current_user_id, semantic.embed(query), limit)
+    return jsonify({'query': query, 'results': similarity_results(matches)})
+
 # Integration routes
 @app.route('/api/integrations', methods=['GET', 'POST'])
 @token_required
+@conditional_get('integrations')
 def integrations(current_user_id):
-    conn = sqlite3.connect(app.config['DATABASE'])
-    cursor = conn.cursor()
-    
     if request.method == 'GET':
-        cursor.execute(
-            'SELECT id, name, type, is_active, created_at FROM integrations WHERE user_id = ?',
-            (current_user_id,)
+        rows, next_cursor = fetch_page(
+            queries.INTEGRATIONS_PAGE, (current_user_id,)
         )
         integrations = []
-        for row in cursor.fetchall():
+        for row in rows:
             integrations.append({
                 'id': row[0],
                 'name': row[1],
@@ -397,8 +952,7 @@ def integrations(current_user_id):
                 'is_active': bool(row[3]),
                 'created_at': row[4]
             })
-        conn.close()
-        return jsonify({'integrations': integrations})
+        return jsonify({'integrations': integrations, 'next_cursor': next_cursor})
     
     elif request.method == 'POST':
         data = request.get_json()
@@ -406,47 +960,50 @@ def integrations(current_user_id):
         integration_type = data.get('type')
         config = json.dumps(data.get('config', {}))
         
-        cursor.execute(
+        integration_id = run_write(lambda conn: conn.execute(
             'INSERT INTO integrations (user_id, name, type, config) VALUES (?, ?, ?, ?)',
             (current_user_id, name, integration_type, config)
-        )
-        integration_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        ).lastrowid)
         
         return jsonify({
             'message': 'Integration created successfully',
             'integration_id': integration_id
         }), 201
 
+# Delta sync: rows changed since the client's watermark, from change_log
+@app.route('/api/sync')
+@token_required
+def sync_changes(current_user_id):
+    since = request.args.get('since')
+    conn = get_db()
+    if since is None:
+        # No watermark yet: hand out the current head to sync forward from
+        return jsonify({'watermark': sync.head(conn, current_user_id)})
+    try:
+        since = int(since)
+        limit = min(int(request.args.get('limit', sync.DEFAULT_SYNC_LIMIT)), sync.MAX_SYNC_LIMIT)
+    except ValueError:
+        return jsonify({'error': 'since and limit must be integers'}), 400
+    if since < 0 or limit < 1:
+        return jsonify({'error': 'since and limit must be positive'}), 400
+    return jsonify(sync.changes_since(conn, current_user_id, since, limit))
+
 # Dashboard data
 @app.route('/api/dashboard')
 @token_required
+@conditional_get('tasks', 'knowledge', 'integrations')
 def dashboard(current_user_id):
-    conn = sqlite3.connect(app.config['DATABASE'])
-    cursor = conn.cursor()
-    
-    # Get task counts
-    cursor.execute('SELECT status, COUNT(*) FROM tasks WHERE user_id = ? GROUP BY status', (current_user_id,))
-    task_stats = dict(cursor.fetchall())
-    
-    # Get knowledge count
-    cursor.execute('SELECT COUNT(*) FROM knowledge_base WHERE user_id = ?', (current_user_id,))
-    knowledge_count = cursor.fetchone()[0]
-    
-    # Get integration count
-    cursor.execute('SELECT COUNT(*) FROM integrations WHERE user_id = ? AND is_active = 1', (current_user_id,))
-    active_integrations = cursor.fetchone()[0]
-    
-    conn.close()
+    # Counters are kept current by triggers on tasks, knowledge_base and
+    # integrations (see migrations.py), so this is a primary-key lookup.
+    row = get_db().execute(queries.USER_STATS, (current_user_id,)).fetchone() or (0, 0, 0, 0, 0)
     
     return jsonify({
         'stats': {
-            'total_tasks': sum(task_stats.values()),
-            'pending_tasks': task_stats.get('pending', 0),
-            'completed_tasks': task_stats.get('completed', 0),
-            'knowledge_entries': knowledge_count,
-            'active_integrations': active_integrations
+            'total_tasks': row[0],
+            'pending_tasks': row[1],
+            'completed_tasks': row[2],
+            'knowledge_entries': row[3],
+            'active_integrations': row[4]
         },
         'recent_activity': [
             {'type': 'task', 'message': 'New task created', 'timestamp': datetime.now().isoformat()},
@@ -455,10 +1012,49 @@ def dashboard(current_user_id):
         ]
     })
 
+@app.route('/api/metrics')
+def metrics():
+    expected = app.config['METRICS_TOKEN']
+    if not expected:
+        return jsonify({'error': 'Not found'}), 404
+    supplied = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(supplied.encode(), f'Bearer {expected}'.encode()):
+        return jsonify({'message': 'Token is invalid'}), 401
+    return jsonify({
+        'db_pool': database.get_pool(app).stats(),
+        'db_writer': database.get_writer(app).stats(),
+        'token_cache': token_cache.stats(),
+        'revocations': revocations.stats(),
+        'password_hashing': hashing_pool.stats(),
+        'rate_limit': rate_limiter.stats(),
+        'analysis': analysis_engine.stats(),
+        'result_cache': result_cache.stats(),
+        'jobs': jobs.counts(get_db())
+    })
+
+@app.errorhandler(InvalidCursor)
+def handle_invalid_cursor(e):
+    return jsonify({'error': str(e)}), 400
+
+@app.errorhandler(passwords.HashingBusy)
+def handle_hashing_busy(e):
+    logger.warning("Password hashing saturated, shedding auth request")
+    return jsonify({'error': 'Too many sign-in attempts in progress, please retry'}), 503, {'Retry-After': '2'}
+
+@app.errorhandler(ratelimit.RateLimited)
+def handle_rate_limited(e):
+    logger.warning(f"Rate limited {request.path} from {request.remote_addr}")
+    return jsonify({'error': 'Too many attempts, please try again later'}), 429, {'Retry-After': str(max(1, int(e.retry_after + 0.999)))}
+
+@app.errorhandler(PoolTimeout)
+def handle_pool_timeout(e):
+    logger.warning(f"Database pool exhausted: {str(e)}")
+    return jsonify({'error': 'Service busy, please retry'}), 503, {'Retry-After': '1'}
+
 # Static file serving
 @app.route('/<path:filename>')
 def serve_static(filename):
-    return send_from_directory(app.static_folder, filename)
+    return assets.set_cache_headers(compression.send_static(app.static_folder, filename), filename)
 
 if __name__ == '__main__':
     init_db()
@@ -0,0 +1,42 @@
+import os
+
+from a2wsgi import WSGIMiddleware
+
+from app import app as flask_app
+
+# ASGI entry point, selected with SERVER_MODE=asgi:
+#
+#     gunicorn -k uvicorn.workers.UvicornWorker asgi:app
+#
+# uvicorn's event loop owns the sockets. Views still run synchronously on a
+# bounded thread pool: SQLite has no non-blocking I/O, so they keep using
+# the connection pool and write queue, and ASGI_THREADS defaults to the
+# pool size so threads never queue on connections. A view's thread is free
+# as soon as its body is produced, so a client reading a stream slowly
+# holds a coroutine rather than a thread.
+#
+# The gthread default already parks idle connections without a thread, and
+# `flask bench connections` finds this mode no faster on one core (a2wsgi
+# adds a hop per request), so it stays opt-in.
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', flask_app.config['DB_POOL_SIZE']))
+
+
+def closing(wsgi_app):
+    """Call the response body's close() once it has been sent.
+
+    a2wsgi iterates the body but never closes it, which PEP 3333 requires:
+    without it Response.call_on_close callbacks never run and file bodies
+    stay open until garbage collection. Being a generator, this also calls
+    ``wsgi_app`` on the executor thread that sends the body.
+    """
+    def app(environ, start_response):
+        body = wsgi_app(environ, start_response)
+        try:
+            yield from body
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+    return app
+
+
+app = WSGIMiddleware(closing(flask_app), workers=ASGI_THREADS)
@@ -0,0 +1,105 @@
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+
+from flask import make_response, request
+
+MANIFEST = 'asset-manifest.json'
+
+# Files named like main.0123456789.js are content-addressed and never change
+HASHED_NAME = re.compile(r'\.[0-9a-f]{10}\.\w+$')
+
+FINGERPRINTED = ('css/*.css', 'js/*.js')
+
+
+def fingerprint(root, patterns=FINGERPRINTED):
+    """Copy each asset to name.<hash>.ext and write the manifest mapping them.
+
+    Older hashed copies of the same asset are removed, so repeated builds
+    leave exactly one fingerprinted file per source file.
+    """
+    manifest = {}
+    for pattern in patterns:
+        for path in sorted(glob.glob(os.path.join(root, pattern))):
+            if HASHED_NAME.search(path):
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            stem, ext = os.path.splitext(path)
+            hashed = f'{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}'
+            for stale in glob.glob(f'{glob.escape(stem)}.*{ext}'):
+                if stale != hashed and HASHED_NAME.search(stale):
+                    os.remove(stale)
+            with open(hashed, 'wb') as f:
+                f.write(data)
+            manifest[os.path.relpath(path, root)] = os.path.relpath(hashed, root)
+
+    with open(os.path.join(root, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+class IndexPage:
+    """index.html with asset references rewritten to their hashed names.
+
+    Built once per process and again only when the manifest changes; without
+    a manifest (no build step) the page is served as written.
+    """
+
+    def __init__(self, root, max_age=60):
+        self.root = root
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._key = None
+        self._body = None
+
+    def _version(self):
+        try:
+            manifest = os.stat(os.path.join(self.root, MANIFEST)).st_mtime_ns
+        except FileNotFoundError:
+            manifest = None
+        return manifest, os.stat(os.path.join(self.root, 'index.html')).st_mtime_ns
+
+    def _build(self):
+        with open(os.path.join(self.root, 'index.html'), encoding='utf-8') as f:
+            html = f.read()
+        try:
+            with open(os.path.join(self.root, MANIFEST)) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            manifest = {}
+        for source, hashed in manifest.items():
+            for quote in ('"', "'"):
+                html = html.replace(f'{quote}{source}{quote}', f'{quote}{hashed}{quote}')
+                html = html.replace(f'{quote}/{source}{quote}', f'{quote}/{hashed}{quote}')
+        return html.encode('utf-8')
+
+    def body(self):
+        key = self._version()
+        if key != self._key:
+            with self._lock:
+                if key != self._key:
+                    self._body = self._build()
+                    self._key = key
+        return self._body
+
+    def response(self):
+        response = make_response(self.body())
+        response.mimetype = 'text/html'
+        response.add_etag()
+        # Short-lived so a deploy is picked up quickly; revalidation is a 304
+        response.cache_control.public = True
+        response.cache_control.max_age = self.max_age
+        return response.make_conditional(request)
+
+
+def set_cache_headers(response, filename):
+    if HASHED_NAME.search(filename):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = 365 * 86400
+        response.cache_control.immutable = True
+    return response
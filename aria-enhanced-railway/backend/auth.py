@@ -0,0 +1,226 @@
+import hashlib
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def token_digest(token):
+    return hashlib.sha256(token.encode()).digest()
+
+
+class TokenCache:
+    """Bounded LRU of verified JWT claims, each kept until the token's exp.
+
+    Keys are SHA-256 digests so raw bearer tokens never sit in memory.
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.metrics = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get(self, token):
+        key = token_digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.metrics['misses'] += 1
+                return None
+            expires_at, claims = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.metrics['expired'] += 1
+                self.metrics['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.metrics['hits'] += 1
+            return claims
+
+    def put(self, token, claims):
+        expires_at = claims.get('exp')
+        if expires_at is None:
+            return
+        key = token_digest(token)
+        with self._lock:
+            self._entries[key] = (expires_at, claims)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.metrics['evictions'] += 1
+
+    def invalidate(self, token):
+        with self._lock:
+            if self._entries.pop(token_digest(token), None) is not None:
+                self.metrics['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self.metrics['invalidations'] += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.metrics['hits'] + self.metrics['misses']
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hit_rate': round(self.metrics['hits'] / lookups, 4) if lookups else 0,
+                **self.metrics,
+            }
+
+
+class RevocationList:
+    """In-process mirror of the revoked_tokens table for O(1) jti checks.
+
+    Each worker tails the table by id at most every ``sync_interval``
+    seconds, so a logout in one worker is honoured by the others within
+    that window. Revocations made by this worker apply immediately.
+    """
+
+    def __init__(self, sync_interval=2.0):
+        self.sync_interval = sync_interval
+        self._revoked = {}
+        self._last_id = 0
+        self._last_sync = 0.0
+        self._lock = threading.Lock()
+
+    def _sync(self, get_conn):
+        now = time.time()
+        if now - self._last_sync < self.sync_interval:
+            return
+        with self._lock:
+            if now - self._last_sync < self.sync_interval:
+                return
+            rows = get_conn().execute(
+                'SELECT id, jti, expires_at FROM revoked_tokens WHERE id > ? ORDER BY id',
+                (self._last_id,)
+            ).fetchall()
+            for row_id, jti, expires_at in rows:
+                self._revoked[jti] = expires_at
+                self._last_id = row_id
+            # Expired tokens fail verification anyway; stop remembering them
+            self._revoked = {jti: exp for jti, exp in self._revoked.items() if exp > now}
+            self._last_sync = now
+
+    def is_revoked(self, jti, get_conn):
+        # get_conn is only called when a sync is due, keeping the hot path
+        # free of database access
+        if jti is None:
+            return False
+        self._sync(get_conn)
+        return jti in self._revoked
+
+    def add(self, jti, expires_at):
+        with self._lock:
+            self._revoked[jti] = expires_at
+
+    def stats(self):
+        return {'revoked': len(self._revoked), 'last_id': self._last_id}
+
+
+class UserExists(Exception):
+    pass
+
+
+LOGIN_QUERY = ('SELECT id, username, email, password_hash FROM users '
+               'WHERE lower(username) = lower(?) OR lower(email) = lower(?)')
+
+
+def case_insensitive_unique(conn):
+    """Whether the lower(username) and lower(email) indexes are UNIQUE.
+
+    They are everywhere except on a database upgraded with case clashes
+    (see migrations._users_lookup_indexes). That is settled by the
+    migration, so callers check once at startup.
+    """
+    unique = {row[1]: row[2] for row in conn.execute('PRAGMA index_list(users)')}
+    return all(unique.get(f'idx_users_{column}_lower') for column in ('username', 'email'))
+
+
+def create_user(conn, username, email, password_hash, check_case=False):
+    """Insert a user unless the name or email is taken in any letter case.
+
+    The UNIQUE case-insensitive indexes reject a clash on their own, so
+    this is a single INSERT. ``check_case`` adds a lookup first, for
+    databases where those indexes are plain; it must then run inside a
+    write transaction, where no other sign-up can slip in between.
+    """
+    if check_case and conn.execute(
+        'SELECT 1 FROM users WHERE lower(username) = lower(?) OR lower(email) = lower(?) LIMIT 1',
+        (username, email)
+    ).fetchone():
+        raise UserExists(username)
+    try:
+        return conn.execute(
+            'INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
+            (username, email, password_hash)
+        ).lastrowid
+    except sqlite3.IntegrityError as e:
+        raise UserExists(str(e)) from e
+
+
+def find_login_user(conn, identifier):
+    """The (id, username, email, password_hash) row ``identifier`` names.
+
+    Matching ignores case, but accounts created before sign-up did may
+    differ only by case: an exact-case match then wins, and a name that
+    still matches several accounts signs into none of them.
+    """
+    rows = conn.execute(LOGIN_QUERY, (identifier, identifier)).fetchall()
+    if len(rows) > 1:
+        rows = [row for row in rows if identifier in (row[1], row[2])]
+    return rows[0] if len(rows) == 1 else None
+
+
+def revoke_access_token(conn, jti, expires_at):
+    conn.execute('INSERT OR IGNORE INTO revoked_tokens (jti, expires_at) VALUES (?, ?)', (jti, expires_at))
+    conn.execute('DELETE FROM revoked_tokens WHERE expires_at < ?', (time.time(),))
+
+
+def new_refresh_token():
+    return secrets.token_urlsafe(32)
+
+
+def store_refresh_token(conn, token, user_id, expires_at):
+    conn.execute(
+        'INSERT INTO refresh_tokens (token_hash, user_id, expires_at) VALUES (?, ?, ?)',
+        (token_digest(token).hex(), user_id, expires_at)
+    )
+
+
+def rotate_refresh_token(conn, token, new_token, expires_at):
+    """Swap a live refresh token for a new one; return (user_id, username) or None."""
+    now = time.time()
+    row = conn.execute(
+        'SELECT rt.user_id, u.username, rt.expires_at, rt.revoked_at FROM refresh_tokens rt '
+        'JOIN users u ON u.id = rt.user_id WHERE rt.token_hash = ?',
+        (token_digest(token).hex(),)
+    ).fetchone()
+    if row is None or row[2] <= now:
+        return None
+    if row[3] is not None:
+        # A rotated token came back: assume it leaked and end every session
+        revoke_refresh_tokens(conn, user_id=row[0])
+        return None
+
+    revoke_refresh_tokens(conn, token=token)
+    store_refresh_token(conn, new_token, row[0], expires_at)
+    return row[0], row[1]
+
+
+def revoke_refresh_tokens(conn, token=None, user_id=None):
+    now = time.time()
+    if token is not None:
+        conn.execute(
+            'UPDATE refresh_tokens SET revoked_at = ? WHERE token_hash = ? AND revoked_at IS NULL',
+            (now, token_digest(token).hex())
+        )
+    if user_id is not None:
+        conn.execute(
+            'UPDATE refresh_tokens SET revoked_at = ? WHERE user_id = ? AND revoked_at IS NULL',
+            (now, user_id)
+        )
+    conn.execute('DELETE FROM refresh_tokens WHERE expires_at < ?', (now,))
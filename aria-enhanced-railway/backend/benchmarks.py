@@ -0,0 +1,586 @@
+import asyncio
+import itertools
+import json
+import os
+import random
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+import jwt
+from flask import current_app
+from flask.cli import AppGroup
+
+import analysis
+import auth
+import database
+import generation
+import migrations
+import passwords
+import search
+
+bench = AppGroup('bench', help='Micro-benchmarks run against a throwaway database.')
+
+WORDS = (
+    'account agenda analysis api budget calendar campaign client contract customer dashboard '
+    'deadline deploy design email estimate feedback forecast invoice launch lead meeting '
+    'metrics migration onboarding pipeline pricing product project proposal quarter release '
+    'report revenue roadmap sales schedule security server sprint strategy support survey '
+    'team template ticket training update vendor workflow'
+).split()
+
+
+def _timings(fn, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        'p50': statistics.median(samples),
+        'p95': samples[int(len(samples) * 0.95) - 1],
+        'max': samples[-1],
+    }
+
+
+def _report(label, timings):
+    click.echo(f"{label:<28} p50={timings['p50']:.2f}ms p95={timings['p95']:.2f}ms max={timings['max']:.2f}ms")
+
+
+def _scratch_db():
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = OFF')
+    migrations.migrate(conn)
+    return path, conn
+
+
+class Corpus:
+    """Synthetic text with a Zipf-distributed vocabulary, like natural language."""
+
+    def __init__(self, rng, size=20000):
+        syllables = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'vo', 'ze', 'pa', 'do', 'gu']
+        generated = (''.join(parts) for n in (2, 3, 4) for parts in itertools.product(syllables, repeat=n))
+        self.vocabulary = (WORDS + list(generated))[:size]
+        self.cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(self.vocabulary) + 1)))
+        self.rng = rng
+
+    def words(self, count):
+        return self.rng.choices(self.vocabulary, cum_weights=self.cum_weights, k=count)
+
+    def sentence(self, length):
+        return ' '.join(self.words(length))
+
+
+@bench.command('search')
+@click.option('--entries', default=1000000, show_default=True, help='Knowledge entries to index.')
+@click.option('--users', default=1000, show_default=True, help='Users the entries are spread over.')
+@click.option('--runs', default=200, show_default=True, help='Queries per scenario.')
+def bench_search(entries, users, runs):
+    """Knowledge full-text search latency."""
+    rng = random.Random(42)
+    corpus = Corpus(rng)
+    path, conn = _scratch_db()
+    try:
+        click.echo(f'Indexing {entries} entries for {users} users...')
+        started = time.perf_counter()
+        conn.execute('BEGIN')
+        conn.executemany(
+            'INSERT INTO users (id, username, email, password_hash) VALUES (?, ?, ?, ?)',
+            ((i, f'user{i}', f'user{i}@example.com', '-') for i in range(1, users + 1))
+        )
+        conn.executemany(
+            'INSERT INTO knowledge_base (user_id, title, content, category, tags) VALUES (?, ?, ?, ?, ?)',
+            ((rng.randint(1, users), corpus.sentence(5), corpus.sentence(80), 'general',
+              ','.join(corpus.words(2))) for _ in range(entries))
+        )
+        search.backfill_index(conn)
+        conn.execute('COMMIT')
+        conn.execute("INSERT INTO knowledge_fts (knowledge_fts) VALUES ('optimize')")
+        click.echo(f'Indexed in {time.perf_counter() - started:.1f}s')
+
+        queries = [corpus.sentence(2) for _ in range(runs)]
+        prefixes = [word[:4] for word in corpus.words(runs)]
+        _report('two-term query', _timings(
+            lambda: search.search_knowledge(conn, rng.randint(1, users), queries[rng.randrange(runs)]), runs))
+        _report('prefix query', _timings(
+            lambda: search.search_knowledge(conn, rng.randint(1, users), prefixes[rng.randrange(runs)]), runs))
+    finally:
+        conn.close()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+def _hash_ms(method, runs=3):
+    policy = passwords.PasswordPolicy(method)
+    return _timings(lambda: policy.hash('benchmark-password'), runs)['p50']
+
+
+@bench.command('password-hash')
+@click.option('--target-ms', default=250, show_default=True, help='Desired time per hash on this host.')
+@click.option('--algorithm', type=click.Choice(['pbkdf2', 'scrypt']), default='pbkdf2', show_default=True)
+def bench_password_hash(target_ms, algorithm):
+    """Pick hashing parameters that cost about TARGET_MS per hash."""
+    current = current_app.config['PASSWORD_HASH_METHOD']
+    _report(f'current ({current})', _timings(lambda: passwords.PasswordPolicy(current).hash('x'), 3))
+
+    if algorithm == 'pbkdf2':
+        # Cost is linear in iterations: measure once, scale, then confirm
+        probe = 100000
+        elapsed = _hash_ms(f'pbkdf2:sha256:{probe}')
+        iterations = max(100000, int(probe * target_ms / elapsed) // 10000 * 10000)
+        method = f'pbkdf2:sha256:{iterations}'
+    else:
+        # scrypt cost doubles with N; stop at the last N under the target
+        n = 2 ** 14
+        while n < 2 ** 20 and _hash_ms(f'scrypt:{n * 2}:8:1') <= target_ms:
+            n *= 2
+        method = f'scrypt:{n}:8:1'
+
+    _report(f'chosen ({method})', _timings(lambda: passwords.PasswordPolicy(method).hash('x'), 3))
+    click.echo(f'PASSWORD_HASH_METHOD={method}')
+
+
+def _documents(rng, count, words):
+    """Paragraphs of Zipf text with sentence breaks and some sentiment words."""
+    corpus = Corpus(rng)
+    opinion = ['good', 'great', 'excellent', 'not good', 'bad', 'delayed', 'broken', 'very happy', 'failed']
+    documents = []
+    for _ in range(count):
+        sentences = []
+        remaining = words
+        while remaining > 0:
+            length = min(remaining, rng.randint(8, 20))
+            sentences.append(' '.join(corpus.words(length - 1) + [rng.choice(opinion)]).capitalize() + '.')
+            remaining -= length
+        documents.append(' '.join(sentences))
+    return documents
+
+
+@bench.command('analyze')
+@click.option('--docs', default=2000, show_default=True, help='Documents to analyze.')
+@click.option('--words', default=200, show_default=True, help='Words per document.')
+def bench_analyze(docs, words):
+    """Analysis engine throughput in documents per second."""
+    started = time.perf_counter()
+    engine = analysis.create_engine(current_app.config['ANALYSIS_ENGINE'])
+    click.echo(f"{engine.name} v{engine.version} loaded in {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    documents = _documents(random.Random(42), docs, words)
+    started = time.perf_counter()
+    for document in documents:
+        engine.analyze(document)
+    elapsed = time.perf_counter() - started
+
+    click.echo(f"{docs / elapsed:8.0f} docs/s ({docs * words / elapsed:,.0f} words/s)")
+    for stage, ms in engine.stats()['avg_ms'].items():
+        click.echo(f"  {stage:<10} {ms:.3f}ms/doc")
+
+
+@bench.command('analyze-batch')
+@click.option('--docs', default=500, show_default=True, help='Documents per batch.')
+@click.option('--words', default=200, show_default=True, help='Words per document.')
+@click.option('--rounds', default=3, show_default=True, help='Times each scenario is repeated; the best is kept.')
+def bench_analyze_batch(docs, words, rounds):
+    """N single /api/ai/analyze calls against one /api/ai/analyze/batch call."""
+    engine = analysis.create_engine(current_app.config['ANALYSIS_ENGINE'])
+    documents = _documents(random.Random(42), docs, words)
+
+    singles = [engine.analyze(document)[0] for document in documents]
+    batched, _ = engine.analyze_batch(documents)
+    mismatched = sum(a != b for a, b in zip(singles, batched))
+    click.echo(f"batch results identical to single calls: {mismatched == 0} ({mismatched} differ)")
+
+    # No jti, so the revocation check never needs the database
+    token = jwt.encode({'user_id': 0, 'exp': time.time() + 3600}, current_app.config['SECRET_KEY'], algorithm='HS256')
+    # no-cache so repeated rounds run the engine instead of hitting the result cache
+    headers = {'Authorization': f'Bearer {token}', 'Cache-Control': 'no-cache'}
+    client = current_app.test_client()
+
+    def engine_single():
+        for document in documents:
+            engine.analyze(document)
+
+    def http_single():
+        for document in documents:
+            assert client.post('/api/ai/analyze', json={'text': document}, headers=headers).status_code == 200
+
+    def http_batch():
+        assert client.post('/api/ai/analyze/batch', json={'texts': documents}, headers=headers).status_code == 200
+
+    scenarios = (
+        ('engine single', engine_single),
+        ('engine batch', lambda: engine.analyze_batch(documents)),
+        ('http single', http_single),
+        ('http batch', http_batch),
+    )
+    rates = {}
+    for label, run in scenarios:
+        elapsed = float('inf')
+        for _ in range(rounds):
+            started = time.perf_counter()
+            run()
+            elapsed = min(elapsed, time.perf_counter() - started)
+        rates[label] = docs / elapsed
+        click.echo(f"{label:<14} {rates[label]:8.0f} docs/s ({elapsed * 1000:.0f}ms for {docs})")
+    click.echo(f"speedup: engine {rates['engine batch'] / rates['engine single']:.1f}x, "
+               f"http {rates['http batch'] / rates['http single']:.1f}x")
+
+
+@bench.command('generate-stream')
+@click.option('--words', default=500, show_default=True, help='Prompt length in words.')
+@click.option('--pace-ms', default=2.0, show_default=True, help='Simulated model latency per chunk.')
+@click.option('--runs', default=10, show_default=True, help='Requests per format.')
+def bench_generate_stream(words, pace_ms, runs):
+    """Time to first byte and to last byte of /api/ai/generate per response format."""
+    prompt = Corpus(random.Random(42)).sentence(words)
+    token = jwt.encode({'user_id': 0, 'exp': time.time() + 3600}, current_app.config['SECRET_KEY'], algorithm='HS256')
+    client = current_app.test_client()
+    stream = generation.stream
+
+    def paced(prompt, kind):
+        for chunk in stream(prompt, kind):
+            if pace_ms:
+                time.sleep(pace_ms / 1000)
+            yield chunk
+
+    # The template backend is instant; pacing stands in for a real model
+    generation.stream = paced
+    try:
+        for accept in ('application/json', 'text/event-stream', 'application/x-ndjson'):
+            first, last = [], []
+            for _ in range(runs):
+                started = time.perf_counter()
+                # Accept-Encoding as a browser sends it, so compression is
+                # part of what is measured
+                response = client.post(
+                    '/api/ai/generate', json={'prompt': prompt, 'type': 'report'}, buffered=False,
+                    headers={'Authorization': f'Bearer {token}', 'Accept': accept, 'Cache-Control': 'no-cache',
+                             'Accept-Encoding': 'br, gzip'}
+                )
+                chunks = iter(response.response)
+                for chunk in chunks:
+                    if chunk:
+                        first.append((time.perf_counter() - started) * 1000)
+                        break
+                for chunk in chunks:
+                    pass
+                last.append((time.perf_counter() - started) * 1000)
+                response.close()
+            click.echo(f"{accept:<22} ttfb p50={statistics.median(first):8.2f}ms "
+                       f"total p50={statistics.median(last):8.2f}ms")
+    finally:
+        generation.stream = stream
+
+
+@bench.command('register')
+@click.option('--users', default=10000, show_default=True, help='Sign-ups to attempt.')
+@click.option('--threads', default=32, show_default=True, help='Concurrent request threads.')
+@click.option('--duplicates', default=0.05, show_default=True, help='Share of sign-ups reusing a name in another case.')
+def bench_register(users, threads, duplicates):
+    """Concurrent sign-up through the pool and write queue (hashing excluded).
+
+    See ``bench register-http`` for the whole request path.
+    """
+    rng = random.Random(42)
+    fresh = [f'user{i}' for i in range(int(users * (1 - duplicates)))]
+    attempts = fresh + [rng.choice(fresh).upper() for _ in range(users - len(fresh))]
+    rng.shuffle(attempts)
+    pragmas = database.build_pragmas(current_app.config)
+    password_hash = passwords.PasswordPolicy().hash('benchmark-password')
+
+    def check_then_insert(pool, writer, name):
+        with pool.connection() as conn:
+            if conn.execute('SELECT id FROM users WHERE lower(username) = lower(?) OR lower(email) = lower(?)',
+                            (name, f'{name}@example.com')).fetchone():
+                return 'exists'
+        try:
+            writer.submit(lambda conn: conn.execute(
+                'INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
+                (name, f'{name}@example.com', password_hash)
+            ))
+        except sqlite3.IntegrityError:
+            # Lost the race between SELECT and INSERT: a 500 in the old handler
+            return 'error'
+        return 'created'
+
+    def insert_only(pool, writer, name):
+        try:
+            writer.submit(lambda conn: auth.create_user(conn, name, f'{name}@example.com', password_hash))
+        except auth.UserExists:
+            return 'exists'
+        return 'created'
+
+    for label, strategy in (('select+insert', check_then_insert), ('insert', insert_only)):
+        path, conn = _scratch_db()
+        pool = database.ConnectionPool(path, size=threads, pragmas=pragmas)
+        writer = database.WriteQueue(path, pragmas=pragmas)
+        samples = []
+
+        def attempt(name):
+            started = time.perf_counter()
+            outcome = strategy(pool, writer, name)
+            samples.append((time.perf_counter() - started) * 1000)
+            return outcome
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            outcomes = list(executor.map(attempt, attempts))
+        elapsed = time.perf_counter() - started
+
+        samples.sort()
+        stored = conn.execute('SELECT COUNT(*), COUNT(DISTINCT lower(username)) FROM users').fetchone()
+        click.echo(
+            f"{label:<14} {len(attempts) / elapsed:8.0f} signups/s "
+            f"p50={statistics.median(samples):.2f}ms p95={samples[int(len(samples) * 0.95) - 1]:.2f}ms "
+            f"created={outcomes.count('created')} exists={outcomes.count('exists')} "
+            f"errors={outcomes.count('error')} stored={stored[0]} distinct={stored[1]} "
+            f"batch={writer.stats()['avg_batch_size']}"
+        )
+        conn.close()
+        os.remove(path)
+
+
+def _start_server(port, workdir, mode='wsgi', backlog=2048):
+    """gunicorn with gunicorn.conf.py on a throwaway database in ``workdir``.
+
+    Rate limits and the job runner are off; the log goes to
+    ``workdir/gunicorn.log``.
+    """
+    backend = os.path.dirname(os.path.abspath(__file__))
+    env = {**os.environ, 'SERVER_MODE': mode, 'RATE_LIMIT_ENABLED': '0', 'JOB_RUNNER': 'external'}
+    command = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(backend, 'gunicorn.conf.py'),
+               '--bind', f'127.0.0.1:{port}', '--pythonpath', backend, '--chdir', workdir,
+               '--backlog', str(backlog)]
+    with open(os.path.join(workdir, 'gunicorn.log'), 'wb') as log:
+        return subprocess.Popen(command, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise click.ClickException(f'server exited with status {process.returncode}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise click.ClickException('server did not start listening')
+
+
+async def _open_connections(port, request, connections, timeout):
+    """Send ``request`` on ``connections`` sockets opened at once.
+
+    Returns (ms to the status line, ms to the end of the body, body) per
+    connection, or None where it failed or was not a 200.
+    """
+    start = asyncio.Event()
+
+    async def client():
+        await start.wait()
+        started = time.perf_counter()
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+            writer.write(request)
+            await writer.drain()
+            status = await asyncio.wait_for(reader.readline(), timeout)
+            first = (time.perf_counter() - started) * 1000
+            body = await asyncio.wait_for(reader.read(), timeout)
+            writer.close()
+        except (OSError, asyncio.TimeoutError):
+            return None
+        if b' 200 ' not in status:
+            return None
+        return first, (time.perf_counter() - started) * 1000, body
+
+    tasks = [asyncio.create_task(client()) for _ in range(connections)]
+    await asyncio.sleep(0)
+    start.set()
+    return await asyncio.gather(*tasks)
+
+
+async def _behind_idle_connections(port, request, idle, requests, timeout):
+    """Send ``request`` ``requests`` times in turn, with ``idle`` silent connections open."""
+    opened = [await asyncio.open_connection('127.0.0.1', port) for _ in range(idle)]
+    try:
+        return [(await _open_connections(port, request, 1, timeout))[0] for _ in range(requests)]
+    finally:
+        for _, writer in opened:
+            writer.close()
+
+
+def _http_request(method, path, headers=(), body=b''):
+    lines = [f'{method} {path} HTTP/1.1', 'Host: localhost', 'Connection: close', *headers]
+    if body:
+        lines.append(f'Content-Length: {len(body)}')
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode() + body
+
+
+def _percentile(samples, fraction):
+    return samples[max(0, int(len(samples) * fraction) - 1)]
+
+
+@bench.command('register-http')
+@click.option('--users', default=10000, show_default=True, help='Sign-ups to attempt.')
+@click.option('--threads', default=16, show_default=True, help='Concurrent HTTP clients.')
+@click.option('--duplicates', default=0.05, show_default=True, help='Share of sign-ups reusing a name in another case.')
+def bench_register_http(users, threads, duplicates):
+    """End-to-end sign-up over HTTP, password hashing included.
+
+    Runs a real gunicorn with gunicorn.conf.py (rate limits and the job
+    runner off) against a throwaway database. Clients retry a 503 after its
+    Retry-After, as the frontend does. Every name must end up stored once.
+    """
+    rng = random.Random(42)
+    fresh = [f'user{i}' for i in range(int(users * (1 - duplicates)))]
+    attempts = fresh + [rng.choice(fresh).upper() for _ in range(users - len(fresh))]
+    rng.shuffle(attempts)
+
+    port = _free_port()
+    workdir = tempfile.mkdtemp()
+    process = _start_server(port, workdir)
+    samples, outcomes, retries = [], [], []
+
+    def sign_up(name):
+        body = json.dumps({'username': name, 'email': f'{name}@example.com', 'password': 'benchmark-password'})
+        request = urllib.request.Request(f'http://127.0.0.1:{port}/api/auth/register', data=body.encode(),
+                                         headers={'Content-Type': 'application/json'})
+        started = time.perf_counter()
+        while True:
+            try:
+                with urllib.request.urlopen(request, timeout=60) as response:
+                    status = response.status
+            except urllib.error.HTTPError as e:
+                status = e.code
+                if status == 503:
+                    retries.append(name)
+                    time.sleep(float(e.headers.get('Retry-After', 1)))
+                    continue
+            except OSError as e:
+                status = type(e).__name__
+            break
+        samples.append((time.perf_counter() - started) * 1000)
+        outcomes.append(status)
+
+    try:
+        _wait_for_port(port, process)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(sign_up, attempts))
+        elapsed = time.perf_counter() - started
+    finally:
+        process.terminate()
+        process.wait()
+
+    conn = sqlite3.connect(os.path.join(workdir, 'aria_enhanced.db'))
+    stored = conn.execute('SELECT COUNT(*), COUNT(DISTINCT lower(username)) FROM users').fetchone()
+    conn.close()
+    samples.sort()
+    created = outcomes.count(201)
+    errors = Counter(status for status in outcomes if status not in (201, 409))
+    click.echo(
+        f"{len(attempts) / elapsed:8.1f} signups/s p50={statistics.median(samples):.1f}ms "
+        f"p95={samples[int(len(samples) * 0.95) - 1]:.1f}ms created={created} exists={outcomes.count(409)} "
+        f"errors={sum(errors.values())} retried_503={len(retries)} stored={stored[0]} distinct={stored[1]} expected={len(fresh)}"
+    )
+    if errors:
+        click.echo(f"errors by status: {dict(errors)}; server log in {os.path.join(workdir, 'gunicorn.log')}")
+    if errors or created != len(fresh) or stored[0] != len(fresh) or stored[1] != len(fresh):
+        raise click.ClickException('sign-ups were lost, duplicated or failed')
+
+
+@bench.command('connections')
+@click.option('--connections', default=1000, show_default=True, help='Simultaneous client connections.')
+@click.option('--path', default='/api/health', show_default=True, help='Endpoint every client requests.')
+@click.option('--streams', default=200, show_default=True, help='Simultaneous /api/ai/generate event streams.')
+@click.option('--idle', default=200, show_default=True, help='Idle connections held open while requesting path.')
+@click.option('--mode', type=click.Choice(['wsgi', 'asgi', 'both']), default='both', show_default=True)
+@click.option('--timeout', default=10.0, show_default=True, help='Per-connection timeout in seconds.')
+def bench_connections(connections, path, streams, idle, mode, timeout):
+    """Latency with many connections open at once, per server mode.
+
+    Each mode runs as a real gunicorn with gunicorn.conf.py against a
+    throwaway database:
+    - ``connections`` GETs of ``path`` at once
+    - ``streams`` generate requests streamed as server-sent events at once,
+      which in asgi mode run through stream_with_context under a2wsgi; a
+      stream only counts if it ends with its done event
+    - 20 GETs of ``path`` in turn while ``idle`` connections that never
+      send a request are held open
+    """
+    prompt = Corpus(random.Random(42)).sentence(200)
+    for name in (['wsgi', 'asgi'] if mode == 'both' else [mode]):
+        port = _free_port()
+        workdir = tempfile.mkdtemp()
+        process = _start_server(port, workdir, name, backlog=2 * max(connections, streams))
+        try:
+            _wait_for_port(port, process)
+            started = time.perf_counter()
+            results = asyncio.run(_open_connections(port, _http_request('GET', path), connections, timeout))
+            elapsed = time.perf_counter() - started
+
+            body = json.dumps({'username': 'bench', 'email': 'bench@example.com', 'password': 'benchmark-password'})
+            request = urllib.request.Request(f'http://127.0.0.1:{port}/api/auth/register', data=body.encode(),
+                                             headers={'Content-Type': 'application/json'})
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                token = json.load(response)['token']
+            generate = _http_request('POST', '/api/ai/generate', [
+                f'Authorization: Bearer {token}', 'Content-Type: application/json', 'Accept: text/event-stream',
+                'Accept-Encoding: br, gzip', 'Cache-Control: no-cache',
+            ], json.dumps({'prompt': prompt, 'type': 'report'}).encode())
+            streamed = asyncio.run(_open_connections(port, generate, streams, timeout))
+            behind_idle = asyncio.run(_behind_idle_connections(port, _http_request('GET', path), idle, 20, timeout))
+        finally:
+            process.terminate()
+            process.wait()
+
+        samples = sorted(r[0] for r in results if r is not None)
+        if samples:
+            click.echo(
+                f"{name:<6} {path:<22} ok={len(samples)}/{connections} {len(samples) / elapsed:8.0f} req/s "
+                f"p50={statistics.median(samples):.1f}ms p95={_percentile(samples, 0.95):.1f}ms "
+                f"max={samples[-1]:.1f}ms"
+            )
+        else:
+            click.echo(f'{name:<6} {path:<22} all {connections} connections failed')
+
+        served = sorted(r[0] for r in behind_idle if r is not None)
+        label = f'{idle} idle + {path}'
+        if served:
+            click.echo(f"{name:<6} {label:<22} ok={len(served)}/20 p50={statistics.median(served):.1f}ms "
+                       f"max={served[-1]:.1f}ms")
+        else:
+            click.echo(f'{name:<6} {label:<22} all 20 requests failed')
+
+        done = [r for r in streamed if r is not None and b'event: done' in r[2]]
+        if not done:
+            click.echo(f'{name:<6} {"generate stream":<22} all {streams} streams failed')
+            continue
+        first = sorted(r[0] for r in done)
+        last = sorted(r[1] for r in done)
+        events = statistics.median(r[2].count(b'data: ') for r in done)
+        click.echo(
+            f"{name:<6} {'generate stream':<22} ok={len(done)}/{streams} events={events:.0f} "
+            f"first p50={statistics.median(first):.1f}ms p95={_percentile(first, 0.95):.1f}ms "
+            f"last p50={statistics.median(last):.1f}ms p95={_percentile(last, 0.95):.1f}ms"
+        )
@@ -0,0 +1,197 @@
+import mimetypes
+import os
+import time
+import zlib
+
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # optional: without it everything is served as gzip
+    brotli = None
+
+# Event streams (text/event-stream, application/x-ndjson) are left out on
+# purpose: gzip and brotli hold small writes back until enough input has
+# built up, so a compressed stream would reach the client all at once
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/javascript',
+    'text/css', 'text/html', 'text/javascript', 'text/plain',
+    'image/svg+xml',
+}
+
+SIDECARS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def negotiate(accept_encodings):
+    """Pick the best encoding the client accepts: brotli, then gzip, else None."""
+    if brotli is not None and accept_encodings.quality('br') > 0:
+        return 'br'
+    if accept_encodings.quality('gzip') > 0:
+        return 'gzip'
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding, config):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._brotli = brotli.Compressor(quality=config['COMPRESS_BROTLI_QUALITY'])
+        else:
+            # wbits=31 writes a gzip header and trailer rather than raw zlib
+            self._zlib = zlib.compressobj(config['COMPRESS_GZIP_LEVEL'], zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        if self.encoding == 'br':
+            return self._brotli.process(data)
+        return self._zlib.compress(data)
+
+    def flush(self):
+        # Emit everything buffered so far so streamed events are not held back
+        if self.encoding == 'br':
+            return self._brotli.flush()
+        return self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+def _compress_stream(chunks, compressor, flush_bytes=65536, flush_after=0.02):
+    # Flushing costs ratio, so compressed output is flushed once flush_bytes
+    # of input or flush_after seconds have gone by since the last flush. A
+    # generator cannot say that its next chunk will be late, so a producer
+    # that may pause is compressed with flush_bytes=0: every chunk is flushed
+    pending = 0
+    last_flush = time.monotonic()
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            data = compressor.compress(chunk)
+            pending += len(chunk)
+            now = time.monotonic()
+            if pending >= flush_bytes or now - last_flush >= flush_after:
+                data += compressor.flush()
+                pending = 0
+                last_flush = now
+            if data:
+                yield data
+        yield compressor.finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def compress_response(response, config):
+    response.vary.add('Accept-Encoding')
+    if (response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or response.direct_passthrough
+            or response.mimetype not in config['COMPRESS_MIMETYPES']):
+        return response
+
+    encoding = negotiate(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        # Generated bodies are compressed chunk by chunk instead of being
+        # buffered in full, and each chunk is sent as soon as it is produced
+        response.response = _compress_stream(response.response, _Compressor(encoding, config), flush_bytes=0)
+        response.headers.pop('Content-Length', None)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    data = response.get_data()
+    if len(data) < config['COMPRESS_MIN_SIZE']:
+        return response
+    if len(data) >= config['COMPRESS_STREAM_MIN_SIZE']:
+        # A large rendered body (a big JSON list) goes out in compressed
+        # pieces as they are produced, rather than waiting for the whole
+        # compressed copy and holding both in memory
+        response.response = _compress_stream(_slices(data, 16384), _Compressor(encoding, config))
+        response.headers.pop('Content-Length', None)
+        response.headers['Content-Encoding'] = encoding
+        _weaken_etag(response)
+        return response
+    compressor = _Compressor(encoding, config)
+    compressed = compressor.compress(data) + compressor.finish()
+    if len(compressed) >= len(data):
+        return response
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    _weaken_etag(response)
+    return response
+
+
+def _slices(data, size):
+    view = memoryview(data)
+    for start in range(0, len(data), size):
+        yield view[start:start + size]
+
+
+def _weaken_etag(response):
+    # The bytes differ from the identity representation, so a strong ETag
+    # would be wrong; a weak one still matches If-None-Match
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+
+def send_static(directory, filename):
+    """send_from_directory, preferring a precompressed .br/.gz sidecar."""
+    accepted = request.accept_encodings
+    for encoding, suffix in SIDECARS:
+        if encoding == 'br' and accepted.quality('br') <= 0:
+            continue
+        if encoding == 'gzip' and accepted.quality('gzip') <= 0:
+            continue
+        if os.path.isfile(os.path.join(directory, filename + suffix)):
+            mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            response = send_from_directory(directory, filename + suffix, mimetype=mimetype)
+            response.headers['Content-Encoding'] = encoding
+            response.vary.add('Accept-Encoding')
+            return response
+    response = send_from_directory(directory, filename)
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def precompress_directory(root, min_size=500):
+    """Write .gz (and .br when available) next to each compressible file.
+
+    Runs at build time with maximum settings, since the cost is paid once.
+    Returns the paths written.
+    """
+    written = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if name.endswith(('.gz', '.br')):
+                continue
+            if mimetypes.guess_type(name)[0] not in COMPRESSIBLE_TYPES:
+                continue
+            path = os.path.join(dirpath, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            if len(data) < min_size:
+                continue
+            # Level 9 with wbits=31 gives byte-identical output on every build
+            outputs = [('.gz', zlib.compress(data, 9, wbits=31))]
+            if brotli is not None:
+                outputs.append(('.br', brotli.compress(data, quality=11)))
+            for suffix, compressed in outputs:
+                if len(compressed) < len(data):
+                    with open(path + suffix, 'wb') as f:
+                        f.write(compressed)
+                    written.append(path + suffix)
+    return written
+
+
+def init_app(app):
+    app.config.setdefault('COMPRESS_MIN_SIZE', int(os.environ.get('COMPRESS_MIN_SIZE', 500)))
+    app.config.setdefault('COMPRESS_STREAM_MIN_SIZE', int(os.environ.get('COMPRESS_STREAM_MIN_SIZE', 256 * 1024)))
+    app.config.setdefault('COMPRESS_GZIP_LEVEL', int(os.environ.get('COMPRESS_GZIP_LEVEL', 6)))
+    app.config.setdefault('COMPRESS_BROTLI_QUALITY', int(os.environ.get('COMPRESS_BROTLI_QUALITY', 4)))
+    app.config.setdefault('COMPRESS_MIMETYPES', COMPRESSIBLE_TYPES)
+    app.after_request(lambda response: compress_response(response, app.config))
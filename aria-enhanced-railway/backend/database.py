@@ -0,0 +1,302 @@
+import os
+import queue
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from flask import current_app, g
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+def build_pragmas(config):
+    return {
+        'journal_mode': 'WAL',
+        'synchronous': config['DB_SYNCHRONOUS'],
+        'cache_size': -int(config['DB_CACHE_SIZE_KB']),
+        'mmap_size': int(config['DB_MMAP_SIZE']),
+        'busy_timeout': int(config['DB_BUSY_TIMEOUT_MS']),
+        'temp_store': 'MEMORY',
+    }
+
+
+def configure_connection(conn, pragmas):
+    for name, value in (pragmas or {}).items():
+        conn.execute(f'PRAGMA {name} = {value}')
+    return conn
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections shared by the threads of one process."""
+
+    def __init__(self, database, size=8, timeout=5.0, health_check_interval=30.0, pragmas=None):
+        self.database = database
+        self.pragmas = pragmas
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # Connections must never cross a fork (gunicorn preload), so every
+        # process lazily builds its own pool.
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._last_used = {}
+        self.metrics = {'hits': 0, 'misses': 0, 'waits': 0, 'wait_time': 0.0,
+                        'timeouts': 0, 'discarded': 0}
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database, check_same_thread=False)
+        self.metrics['misses'] += 1
+        return configure_connection(conn, self.pragmas)
+
+    def _healthy(self, conn):
+        if time.monotonic() - self._last_used.get(id(conn), 0) < self.health_check_interval:
+            return True
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        self._last_used.pop(id(conn), None)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._created -= 1
+            self.metrics['discarded'] += 1
+
+    def acquire(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+                self.metrics['hits'] += 1
+            except queue.Empty:
+                with self._lock:
+                    can_create = self._created < self.size
+                    if can_create:
+                        self._created += 1
+                if can_create:
+                    try:
+                        return self._connect()
+                    except sqlite3.Error:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+
+                started = time.monotonic()
+                self.metrics['waits'] += 1
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    self.metrics['timeouts'] += 1
+                    raise PoolTimeout(f'No database connection available after {self.timeout}s')
+                finally:
+                    self.metrics['wait_time'] += time.monotonic() - started
+
+            if self._healthy(conn):
+                return conn
+            self._discard(conn)
+
+    def release(self, conn):
+        if self._pid != os.getpid():
+            conn.close()
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        self._last_used[id(conn)] = time.monotonic()
+        self._idle.put(conn)
+
+    def close(self):
+        """Close idle connections, e.g. in the gunicorn master before forking."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': self.size,
+                'open': self._created,
+                'idle': self._idle.qsize(),
+                **self.metrics,
+            }
+
+
+class WriteQueue:
+    """Serializes writes through one connection per process and group-commits them.
+
+    Each job is a callable taking the writer connection. Jobs that arrive
+    while a transaction is in flight are batched into the next one, each
+    under its own savepoint so a failing job does not roll back its peers.
+    """
+
+    def __init__(self, database, pragmas=None, max_batch=64, timeout=10.0):
+        self.database = database
+        self.pragmas = pragmas
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._pid = None
+        self.metrics = {'jobs': 0, 'batches': 0, 'failed_jobs': 0, 'failed_batches': 0}
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def submit(self, fn):
+        self._ensure_started()
+        future = Future()
+        self._queue.put((fn, future))
+        return future.result(timeout=self.timeout)
+
+    def _run(self):
+        conn = sqlite3.connect(self.database, isolation_level=None, check_same_thread=False)
+        configure_connection(conn, self.pragmas)
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._commit_batch(conn, batch)
+
+    def _commit_batch(self, conn, batch):
+        results = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for fn, future in batch:
+                conn.execute('SAVEPOINT job')
+                try:
+                    results.append((future, fn(conn), None))
+                    conn.execute('RELEASE job')
+                except Exception as e:
+                    conn.execute('ROLLBACK TO job')
+                    conn.execute('RELEASE job')
+                    results.append((future, None, e))
+            conn.execute('COMMIT')
+        except Exception as e:
+            logger.error(f"Write batch failed: {str(e)}")
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            self.metrics['failed_batches'] += 1
+            results = [(future, None, e) for _, future in batch]
+
+        self.metrics['batches'] += 1
+        for future, result, error in results:
+            self.metrics['jobs'] += 1
+            if error is not None:
+                self.metrics['failed_jobs'] += 1
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def stats(self):
+        batches = self.metrics['batches']
+        return {
+            **self.metrics,
+            'pending': self._queue.qsize() if self._pid == os.getpid() else 0,
+            'avg_batch_size': round(self.metrics['jobs'] / batches, 2) if batches else 0,
+        }
+
+
+def init_app(app):
+    app.config.setdefault('DB_POOL_SIZE', int(os.environ.get('DB_POOL_SIZE', 8)))
+    app.config.setdefault('DB_POOL_TIMEOUT', float(os.environ.get('DB_POOL_TIMEOUT', 5)))
+    app.config.setdefault('DB_SYNCHRONOUS', os.environ.get('DB_SYNCHRONOUS', 'NORMAL'))
+    app.config.setdefault('DB_CACHE_SIZE_KB', int(os.environ.get('DB_CACHE_SIZE_KB', 16384)))
+    app.config.setdefault('DB_MMAP_SIZE', int(os.environ.get('DB_MMAP_SIZE', 256 * 1024 * 1024)))
+    app.config.setdefault('DB_BUSY_TIMEOUT_MS', int(os.environ.get('DB_BUSY_TIMEOUT_MS', 5000)))
+    app.config.setdefault('DB_WRITE_QUEUE', os.environ.get('DB_WRITE_QUEUE', '1') == '1')
+    app.config.setdefault('DB_WRITE_BATCH', int(os.environ.get('DB_WRITE_BATCH', 64)))
+
+    pragmas = build_pragmas(app.config)
+    app.extensions['db_pool'] = ConnectionPool(
+        app.config['DATABASE'],
+        size=app.config['DB_POOL_SIZE'],
+        timeout=app.config['DB_POOL_TIMEOUT'],
+        pragmas=pragmas,
+    )
+    app.extensions['db_writer'] = WriteQueue(
+        app.config['DATABASE'],
+        pragmas=pragmas,
+        max_batch=app.config['DB_WRITE_BATCH'],
+    )
+    app.teardown_appcontext(close_db)
+
+
+def get_pool(app):
+    return app.extensions['db_pool']
+
+
+def get_writer(app):
+    return app.extensions['db_writer']
+
+
+def run_write(fn):
+    """Run ``fn(conn)`` inside a write transaction and return its result."""
+    if current_app.config['DB_WRITE_QUEUE']:
+        return get_writer(current_app).submit(fn)
+
+    conn = get_db()
+    try:
+        result = fn(conn)
+        conn.commit()
+        return result
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def get_db():
+    # One pooled connection per app context, returned in close_db()
+    if 'db' not in g:
+        g.db = get_pool(current_app).acquire()
+    return g.db
+
+
+def close_db(exception=None):
+    conn = g.pop('db', None)
+    if conn is not None:
+        get_pool(current_app).release(conn)
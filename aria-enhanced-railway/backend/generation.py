@@ -0,0 +1,31 @@
+import re
+
+# Bump when the templates change so cached generations are not reused
+VERSION = '1'
+
+TEMPLATES = {
+    'email': "Subject: Automated Response\n\nDear Recipient,\n\nBased on your request: {prompt}\n\nBest regards,\nARIA Enhanced",
+    'report': "# Automated Report\n\n## Summary\n{prompt}\n\n## Analysis\nGenerated insights and recommendations.",
+    'task': "Task: {prompt}\nPriority: Medium\nEstimated Time: 30 minutes",
+    'general': "Generated response for: {prompt}",
+}
+
+
+# A word with the whitespace after it, the unit a model would emit
+_CHUNK_RE = re.compile(r'\s*\S+\s*|\s+')
+
+
+def stream(prompt, kind):
+    """Yield the content for ``prompt`` chunk by chunk as it is produced.
+
+    Unknown kinds fall back to 'general'.
+    """
+    template = TEMPLATES.get(kind, TEMPLATES['general'])
+    for part in re.split(r'(\{prompt\})', template):
+        text = prompt if part == '{prompt}' else part
+        for match in _CHUNK_RE.finditer(text):
+            yield match.group()
+
+
+def generate(prompt, kind):
+    return ''.join(stream(prompt, kind))
@@ -0,0 +1,126 @@
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+# Loaded automatically by `gunicorn` from the backend directory; every
+# setting can still be overridden with an environment variable or flag.
+
+SERVER_MODE = os.environ.get('SERVER_MODE', 'wsgi')
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# SQLite allows one writer at a time, so extra processes mostly add
+# read capacity; cap the usual 2 * cores + 1 to keep memory in check
+cores = multiprocessing.cpu_count()
+workers = int(os.environ.get('WEB_CONCURRENCY', min(2 * cores + 1, 8)))
+
+if SERVER_MODE == 'asgi':
+    wsgi_app = 'asgi:app'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'app:app'
+    # gthread without dropped requests when max_requests recycles a worker
+    worker_class = 'gunicorn_workers.ThreadWorker'
+    # Threads cover requests waiting on SQLite or the hashing pool: about 4
+    # per core across all workers, which also makes up for the worker cap
+    # on big machines.
+    threads = int(os.environ.get('GUNICORN_THREADS', max(2, -(-4 * cores // workers))))
+
+# Import app.py once in the master so workers share its pages copy-on-write.
+# Database pools, the write queue and the hashing pool rebuild themselves
+# per process after the fork.
+preload_app = True
+
+# Railway's proxy reuses upstream connections
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+
+# Recycle workers to bound slow growth in the per-process caches
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+# Heartbeat files on tmpfs, not the container's overlay filesystem
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+# The background AI job runner lives beside the web workers unless it is
+# deployed as its own service (JOB_RUNNER=external). A thread in the master
+# restarts it if it exits, backing off while it keeps failing.
+JOB_RUNNER = os.environ.get('JOB_RUNNER', 'embedded')
+job_runner = None
+job_runner_stopping = threading.Event()
+job_runner_supervisor = None
+
+
+def on_starting(server):
+    # Apply migrations once before any worker exists, then drop the master's
+    # connections so none are inherited across the fork
+    import app
+    app.init_db()
+    app.database.get_pool(app.app).close()
+
+
+def _start_job_runner(server):
+    global job_runner
+    # A session of its own, so the pool processes it spawns can be swept up
+    # with it if it is killed before it can stop them
+    job_runner = subprocess.Popen([sys.executable, '-m', 'flask', '--app', 'app', 'run-jobs'],
+                                  start_new_session=True)
+    server.log.info(f"Started job runner (pid {job_runner.pid})")
+    return time.monotonic()
+
+
+def _supervise_job_runner(server):
+    started = _start_job_runner(server)
+    delay = 1
+    while not job_runner_stopping.wait(1):
+        if job_runner.poll() is None:
+            continue
+        # A runner that stayed up a while gets a fresh backoff
+        if time.monotonic() - started > 60:
+            delay = 1
+        server.log.error(f"Job runner exited with status {job_runner.returncode}; restarting in {delay}s")
+        _kill_job_runner_group()
+        if job_runner_stopping.wait(delay):
+            return
+        started = _start_job_runner(server)
+        delay = min(delay * 2, 60)
+
+
+def _kill_job_runner_group():
+    try:
+        os.killpg(job_runner.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def when_ready(server):
+    global job_runner_supervisor
+    if JOB_RUNNER == 'embedded':
+        job_runner_supervisor = threading.Thread(
+            target=_supervise_job_runner, args=(server,), name='job-runner-supervisor', daemon=True
+        )
+        job_runner_supervisor.start()
+
+
+def on_exit(server):
+    job_runner_stopping.set()
+    if job_runner_supervisor is not None:
+        job_runner_supervisor.join(timeout=5)
+    # SIGTERM lets the runner put unfinished jobs back in the queue
+    if job_runner is not None and job_runner.poll() is None:
+        job_runner.terminate()
+        try:
+            job_runner.wait(timeout=graceful_timeout)
+        except subprocess.TimeoutExpired:
+            pass
+    if job_runner is not None:
+        _kill_job_runner_group()
@@ -0,0 +1,352 @@
+import hashlib
+import hmac
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import analysis
+import generation
+
+logger = logging.getLogger(__name__)
+
+KINDS = ('analyze', 'generate')
+PRIORITIES = {'low': 0, 'normal': 5, 'high': 9}
+FINISHED = ('succeeded', 'failed')
+
+GET_QUERY = ('SELECT id, kind, priority, status, result, error, attempts, created_at, started_at, finished_at '
+             'FROM ai_jobs WHERE id = ? AND user_id = ?')
+PENDING_QUERY = "SELECT COUNT(*) FROM ai_jobs WHERE user_id = ? AND status IN ('queued', 'running')"
+QUEUED_QUERY = ("SELECT id, user_id, kind, payload, webhook_url FROM ai_jobs WHERE status = 'queued' "
+                'ORDER BY priority DESC, id')
+
+
+class QueueFull(Exception):
+    pass
+
+
+def parse_priority(value):
+    """'low'/'normal'/'high' or an integer 0-9; higher runs first."""
+    if isinstance(value, str) and value in PRIORITIES:
+        return PRIORITIES[value]
+    if isinstance(value, int) and not isinstance(value, bool) and 0 <= value <= 9:
+        return value
+    raise ValueError("priority must be 'low', 'normal', 'high' or 0-9")
+
+
+def check_webhook_url(url, allowed_hosts):
+    parsed = urllib.parse.urlsplit(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        raise ValueError('webhook_url must be an http(s) URL')
+    # Only hosts the operator listed, so jobs cannot be used to reach
+    # internal services from the server
+    if parsed.hostname.lower() not in allowed_hosts:
+        raise ValueError('webhook_url host is not allowed')
+
+
+def submit(conn, user_id, kind, payload, priority=PRIORITIES['normal'], webhook_url=None, max_pending=None):
+    if max_pending is not None:
+        pending = conn.execute(PENDING_QUERY, (user_id,)).fetchone()[0]
+        if pending >= max_pending:
+            raise QueueFull(f'{pending} jobs already pending')
+    return conn.execute(
+        'INSERT INTO ai_jobs (user_id, kind, payload, priority, webhook_url) VALUES (?, ?, ?, ?, ?)',
+        (user_id, kind, json.dumps(payload), priority, webhook_url)
+    ).lastrowid
+
+
+def get(conn, user_id, job_id):
+    row = conn.execute(GET_QUERY, (job_id, user_id)).fetchone()
+    if row is None:
+        return None
+    return {
+        'job_id': row[0], 'kind': row[1], 'priority': row[2], 'status': row[3],
+        'result': json.loads(row[4]) if row[4] else None, 'error': row[5], 'attempts': row[6],
+        'created_at': row[7], 'started_at': row[8], 'finished_at': row[9],
+    }
+
+
+def claim(conn, worker, slots, max_running_per_user, lease_seconds):
+    """Mark up to ``slots`` queued jobs as running for ``worker``.
+
+    Highest priority first, oldest first within a priority, skipping users
+    who already have ``max_running_per_user`` jobs running anywhere. Must
+    run inside a write transaction so two runners never claim the same job.
+    """
+    running = dict(conn.execute(
+        "SELECT user_id, COUNT(*) FROM ai_jobs WHERE status = 'running' GROUP BY user_id"
+    ).fetchall())
+    claimed = []
+    for job_id, user_id, kind, payload, webhook_url in conn.execute(QUEUED_QUERY):
+        if running.get(user_id, 0) >= max_running_per_user:
+            continue
+        running[user_id] = running.get(user_id, 0) + 1
+        claimed.append({'id': job_id, 'user_id': user_id, 'kind': kind,
+                        'payload': json.loads(payload), 'webhook_url': webhook_url})
+        if len(claimed) == slots:
+            break
+    lease_until = time.time() + lease_seconds
+    for job in claimed:
+        conn.execute(
+            "UPDATE ai_jobs SET status = 'running', worker = ?, lease_until = ?, attempts = attempts + 1, "
+            "started_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (worker, lease_until, job['id'])
+        )
+    return claimed
+
+
+def finish(conn, job_id, worker, result=None, error=None):
+    # A job whose lease expired may have been handed to another runner;
+    # only the current holder records the outcome
+    return conn.execute(
+        'UPDATE ai_jobs SET status = ?, result = ?, error = ?, lease_until = NULL, '
+        "finished_at = CURRENT_TIMESTAMP WHERE id = ? AND worker = ? AND status = 'running'",
+        ('failed' if error else 'succeeded', json.dumps(result) if error is None else None, error, job_id, worker)
+    ).rowcount == 1
+
+
+def renew(conn, worker, job_ids, lease_seconds):
+    """Extend the lease on jobs ``worker`` is still running."""
+    conn.execute(
+        f"UPDATE ai_jobs SET lease_until = ? WHERE worker = ? AND status = 'running' "
+        f"AND id IN ({','.join('?' * len(job_ids))})",
+        (time.time() + lease_seconds, worker, *job_ids)
+    )
+
+
+def release(conn, worker):
+    """Put a stopping runner's unfinished jobs back in the queue."""
+    return conn.execute(
+        "UPDATE ai_jobs SET status = 'queued', worker = NULL, lease_until = NULL, attempts = attempts - 1 "
+        "WHERE worker = ? AND status = 'running'", (worker,)
+    ).rowcount
+
+
+def requeue(conn, worker, max_attempts):
+    """Return a job that took its process down to the queue.
+
+    Unlike ``release`` the run counts as an attempt, so a job that keeps
+    crashing fails after ``max_attempts`` instead of breaking the pool
+    forever.
+    """
+    conn.execute(
+        "UPDATE ai_jobs SET status = 'failed', error = 'Job did not complete', lease_until = NULL, "
+        "finished_at = CURRENT_TIMESTAMP WHERE worker = ? AND status = 'running' AND attempts >= ?",
+        (worker, max_attempts)
+    )
+    return conn.execute(
+        "UPDATE ai_jobs SET status = 'queued', worker = NULL, lease_until = NULL "
+        "WHERE worker = ? AND status = 'running'", (worker,)
+    ).rowcount
+
+
+def requeue_expired(conn, max_attempts):
+    """Recover jobs from runners that died holding them."""
+    now = time.time()
+    conn.execute(
+        "UPDATE ai_jobs SET status = 'failed', error = 'Job did not complete', lease_until = NULL, "
+        "finished_at = CURRENT_TIMESTAMP WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+        (now, max_attempts)
+    )
+    return conn.execute(
+        "UPDATE ai_jobs SET status = 'queued', worker = NULL, lease_until = NULL "
+        "WHERE status = 'running' AND lease_until < ?", (now,)
+    ).rowcount
+
+
+def prune(conn, days):
+    return conn.execute(
+        "DELETE FROM ai_jobs WHERE status IN ('succeeded', 'failed') AND finished_at < datetime('now', ?)",
+        (f'-{days} days',)
+    ).rowcount
+
+
+def counts(conn):
+    return dict(conn.execute('SELECT status, COUNT(*) FROM ai_jobs GROUP BY status').fetchall())
+
+
+# Job execution, inside the pool's processes. The engine is built once per
+# process by the pool initializer.
+_engine = None
+
+
+def _init_process(engine_name):
+    global _engine
+    _engine = analysis.create_engine(engine_name)
+
+
+def execute(kind, payload):
+    if kind == 'analyze':
+        result, timings = _engine.analyze(payload['text'])
+        return {
+            'analysis': result,
+            'engine': {'name': _engine.name, 'version': _engine.version},
+            'timings_ms': {stage: round(ms, 3) for stage, ms in timings.items()},
+        }
+    if kind == 'generate':
+        return {'content': generation.generate(payload['prompt'], payload['type']), 'type': payload['type']}
+    raise ValueError(f'Unknown job kind {kind!r}')
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # A redirect could point a checked webhook host at an internal address
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+_webhook_opener = urllib.request.build_opener(_NoRedirect)
+
+
+class JobRunner:
+    """Claims queued jobs from SQLite and runs them on a process pool.
+
+    ``write`` is ``database.run_write``: claims and results go through the
+    shared write queue, so this process is one more writer among the web
+    workers. Leases on running jobs are renewed every third of
+    ``lease_seconds``, so only a runner that stops responding loses them.
+
+    A failing iteration (say, a write timing out while the database is
+    busy) is logged and retried with backoff. If a pool process dies, the
+    pool is rebuilt and the jobs it held go back to the queue. Webhooks
+    are delivered from a small thread pool so a slow receiver never holds
+    up the queue.
+    """
+
+    def __init__(self, write, processes=None, engine='lexicon', max_running_per_user=2,
+                 lease_seconds=120, max_attempts=3, poll_interval=0.5, retention_days=7,
+                 webhook_secret=None):
+        self.write = write
+        self.processes = processes or os.cpu_count() or 1
+        self.engine = engine
+        self.max_running_per_user = max_running_per_user
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.retention_days = retention_days
+        self.webhook_secret = webhook_secret
+        self.worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = threading.Event()
+
+    def _new_pool(self):
+        # spawn, not fork: this process already runs the write queue thread
+        return ProcessPoolExecutor(
+            max_workers=self.processes, mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_process, initargs=(self.engine,)
+        )
+
+    def run(self):
+        pool = self._new_pool()
+        webhooks = ThreadPoolExecutor(max_workers=4, thread_name_prefix='job-webhook')
+        in_flight = {}
+        next_maintenance = 0
+        next_renewal = 0
+        failures = 0
+        # After a crash with several jobs running, the culprit is unknown:
+        # the next ``isolate`` jobs run one at a time to single it out
+        isolate = 0
+        logger.info(f"Job runner {self.worker} started with {self.processes} processes")
+        try:
+            while not self.stopping.is_set():
+                try:
+                    if time.monotonic() >= next_maintenance:
+                        self._maintain()
+                        next_maintenance = time.monotonic() + min(self.lease_seconds / 2, 60)
+
+                    slots = self.processes - len(in_flight)
+                    if isolate:
+                        slots = 0 if in_flight else 1
+                    if slots:
+                        for job in self.write(lambda conn: claim(
+                            conn, self.worker, slots, self.max_running_per_user, self.lease_seconds
+                        )):
+                            in_flight[pool.submit(execute, job['kind'], job['payload'])] = job
+                            isolate = max(isolate - 1, 0)
+
+                    if not in_flight:
+                        failures = 0
+                        self.stopping.wait(self.poll_interval)
+                        continue
+                    if time.monotonic() >= next_renewal:
+                        # Heartbeat well inside the lease so a long job is never
+                        # reclaimed and run a second time while it is still going
+                        ids = [job['id'] for job in in_flight.values()]
+                        self.write(lambda conn: renew(conn, self.worker, ids, self.lease_seconds))
+                        next_renewal = time.monotonic() + self.lease_seconds / 3
+                    done, _ = wait(in_flight, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        if isinstance(future.exception(), BrokenProcessPool):
+                            raise future.exception()
+                        self._record(in_flight.pop(future), future, webhooks)
+                    failures = 0
+                except BrokenProcessPool:
+                    # A process died (e.g. OOM-killed) and took the pool with
+                    # it. A job running alone is the culprit and is charged
+                    # the attempt; jobs running together all go back as if
+                    # never started, then run one at a time
+                    running = len(in_flight)
+                    logger.error(f"Job process pool broke with {running} jobs running; rebuilding it")
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    in_flight.clear()
+                    pool = self._new_pool()
+                    try:
+                        if running == 1:
+                            requeued = self.write(lambda conn: requeue(conn, self.worker, self.max_attempts))
+                        else:
+                            requeued = self.write(lambda conn: release(conn, self.worker))
+                            isolate = running
+                        logger.warning(f"Returned {requeued} interrupted jobs to the queue")
+                    except Exception as e:
+                        # Their leases are no longer renewed, so _maintain
+                        # requeues them once the leases run out
+                        logger.error(f"Could not requeue interrupted jobs: {str(e)}")
+                except Exception as e:
+                    failures += 1
+                    delay = min(self.poll_interval * 2 ** failures, 30)
+                    logger.error(f"Job runner iteration failed, retrying in {delay:.1f}s: {str(e)}")
+                    self.stopping.wait(delay)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+            released = self.write(lambda conn: release(conn, self.worker))
+            webhooks.shutdown(wait=True)
+            logger.info(f"Job runner {self.worker} stopped, {released} jobs returned to the queue")
+
+    def stop(self, *_):
+        self.stopping.set()
+
+    def _maintain(self):
+        requeued = self.write(lambda conn: requeue_expired(conn, self.max_attempts))
+        if requeued:
+            logger.warning(f"Requeued {requeued} jobs whose runner stopped responding")
+        self.write(lambda conn: prune(conn, self.retention_days))
+
+    def _record(self, job, future, webhooks):
+        try:
+            result, error = future.result(), None
+        except Exception as e:
+            logger.error(f"Job {job['id']} failed: {str(e)}")
+            result, error = None, 'Job failed'
+        if not self.write(lambda conn: finish(conn, job['id'], self.worker, result, error)):
+            return
+        if job['webhook_url']:
+            body = {'job_id': job['id'], 'status': 'failed' if error else 'succeeded',
+                    'result': result, 'error': error}
+            webhooks.submit(self._deliver, job['webhook_url'], body)
+
+    def _deliver(self, url, body):
+        data = json.dumps(body).encode()
+        headers = {'Content-Type': 'application/json'}
+        if self.webhook_secret:
+            signature = hmac.new(self.webhook_secret.encode(), data, hashlib.sha256).hexdigest()
+            headers['X-Aria-Signature'] = f'sha256={signature}'
+        try:
+            with _webhook_opener.open(urllib.request.Request(url, data=data, headers=headers), timeout=5):
+                pass
+        except Exception as e:
+            logger.warning(f"Webhook for job {body['job_id']} failed: {str(e)}")
@@ -0,0 +1,551 @@
+import logging
+
+import auth
+import jobs
+import queries
+import search
+import semantic
+import sync
+import tagging
+
+logger = logging.getLogger(__name__)
+
+
+def _users_lookup_indexes(conn):
+    # Existing rows may already clash by case; index those columns without
+    # UNIQUE rather than fail the deploy. The app then has auth.create_user
+    # check for clashes itself (see auth.case_insensitive_unique) and
+    # auth.find_login_user refuses ambiguous names, so the clash cannot
+    # spread or sign anyone into the wrong account
+    for column in ('username', 'email'):
+        clash = conn.execute(
+            f'SELECT lower({column}) FROM users GROUP BY lower({column}) HAVING COUNT(*) > 1 LIMIT 1'
+        ).fetchone()
+        if clash:
+            logger.warning(f"users.{column} has case-insensitive duplicates (e.g. {clash[0]!r}); "
+                           f"idx_users_{column}_lower created without UNIQUE")
+        unique = '' if clash else 'UNIQUE '
+        conn.execute(f'CREATE {unique}INDEX IF NOT EXISTS idx_users_{column}_lower ON users (lower({column}))')
+
+
+# Ordered up-migrations: (version, name, steps). A step is either a SQL
+# statement or a callable taking the connection, for data backfills.
+MIGRATIONS = [
+    (1, 'initial_schema', [
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_active BOOLEAN DEFAULT TRUE
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            description TEXT,
+            status TEXT DEFAULT 'pending',
+            priority TEXT DEFAULT 'medium',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS knowledge_base (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            content TEXT NOT NULL,
+            category TEXT DEFAULT 'general',
+            tags TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS integrations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            type TEXT NOT NULL,
+            config TEXT,
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''',
+    ]),
+    (2, 'user_scoped_indexes', [
+        'CREATE INDEX IF NOT EXISTS idx_tasks_user_created ON tasks (user_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_tasks_user_status ON tasks (user_id, status)',
+        'CREATE INDEX IF NOT EXISTS idx_knowledge_user_created ON knowledge_base (user_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_integrations_user_created ON integrations (user_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_integrations_user_active ON integrations (user_id, is_active)',
+    ]),
+    (3, 'user_stats_counters', [
+        '''
+        CREATE TABLE IF NOT EXISTS user_stats (
+            user_id INTEGER PRIMARY KEY,
+            total_tasks INTEGER NOT NULL DEFAULT 0,
+            pending_tasks INTEGER NOT NULL DEFAULT 0,
+            completed_tasks INTEGER NOT NULL DEFAULT 0,
+            knowledge_entries INTEGER NOT NULL DEFAULT 0,
+            active_integrations INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''',
+        '''
+        INSERT OR REPLACE INTO user_stats
+            (user_id, total_tasks, pending_tasks, completed_tasks, knowledge_entries, active_integrations)
+        SELECT u.id,
+            (SELECT COUNT(*) FROM tasks WHERE user_id = u.id),
+            (SELECT COUNT(*) FROM tasks WHERE user_id = u.id AND status = 'pending'),
+            (SELECT COUNT(*) FROM tasks WHERE user_id = u.id AND status = 'completed'),
+            (SELECT COUNT(*) FROM knowledge_base WHERE user_id = u.id),
+            (SELECT COUNT(*) FROM integrations WHERE user_id = u.id AND is_active = 1)
+        FROM users u
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_users_stats_insert AFTER INSERT ON users BEGIN
+            INSERT OR IGNORE INTO user_stats (user_id) VALUES (NEW.id);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_tasks_stats_insert AFTER INSERT ON tasks BEGIN
+            INSERT OR IGNORE INTO user_stats (user_id) VALUES (NEW.user_id);
+            UPDATE user_stats SET
+                total_tasks = total_tasks + 1,
+                pending_tasks = pending_tasks + (NEW.status IS 'pending'),
+                completed_tasks = completed_tasks + (NEW.status IS 'completed')
+            WHERE user_id = NEW.user_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_tasks_stats_update AFTER UPDATE OF status ON tasks BEGIN
+            UPDATE user_stats SET
+                pending_tasks = pending_tasks + (NEW.status IS 'pending') - (OLD.status IS 'pending'),
+                completed_tasks = completed_tasks + (NEW.status IS 'completed') - (OLD.status IS 'completed')
+            WHERE user_id = NEW.user_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_tasks_stats_delete AFTER DELETE ON tasks BEGIN
+            UPDATE user_stats SET
+                total_tasks = total_tasks - 1,
+                pending_tasks = pending_tasks - (OLD.status IS 'pending'),
+                completed_tasks = completed_tasks - (OLD.status IS 'completed')
+            WHERE user_id = OLD.user_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_knowledge_stats_insert AFTER INSERT ON knowledge_base BEGIN
+            INSERT OR IGNORE INTO user_stats (user_id) VALUES (NEW.user_id);
+            UPDATE user_stats SET knowledge_entries = knowledge_entries + 1 WHERE user_id = NEW.user_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_knowledge_stats_delete AFTER DELETE ON knowledge_base BEGIN
+            UPDATE user_stats SET knowledge_entries = knowledge_entries - 1 WHERE user_id = OLD.user_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_integrations_stats_insert AFTER INSERT ON integrations BEGIN
+            INSERT OR IGNORE INTO user_stats (user_id) VALUES (NEW.user_id);
+            UPDATE user_stats SET active_integrations = active_integrations + (NEW.is_active IS 1)
+            WHERE user_id = NEW.user_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_integrations_stats_update AFTER UPDATE OF is_active ON integrations BEGIN
+            UPDATE user_stats SET
+                active_integrations = active_integrations + (NEW.is_active IS 1) - (OLD.is_active IS 1)
+            WHERE user_id = NEW.user_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_integrations_stats_delete AFTER DELETE ON integrations BEGIN
+            UPDATE user_stats SET active_integrations = active_integrations - (OLD.is_active IS 1)
+            WHERE user_id = OLD.user_id;
+        END
+        ''',
+    ]),
+    (4, 'knowledge_fts', [
+        # The owner column holds a per-user token so a search can AND it with
+        # the user's terms and let FTS5 skip other users' rows in the doclists.
+        '''
+        CREATE VIEW IF NOT EXISTS knowledge_fts_source AS
+        SELECT id, title, content, tags, 'u' || user_id AS owner FROM knowledge_base
+        ''',
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS knowledge_fts USING fts5(
+            title, content, tags, owner,
+            content='knowledge_fts_source', content_rowid='id',
+            tokenize='porter unicode61', prefix='2 3'
+        )
+        ''',
+        "INSERT INTO knowledge_fts (knowledge_fts) VALUES ('rebuild')",
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_knowledge_fts_insert AFTER INSERT ON knowledge_base BEGIN
+            INSERT INTO knowledge_fts (rowid, title, content, tags, owner)
+            VALUES (NEW.id, NEW.title, NEW.content, NEW.tags, 'u' || NEW.user_id);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_knowledge_fts_delete AFTER DELETE ON knowledge_base BEGIN
+            INSERT INTO knowledge_fts (knowledge_fts, rowid, title, content, tags, owner)
+            VALUES ('delete', OLD.id, OLD.title, OLD.content, OLD.tags, 'u' || OLD.user_id);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_knowledge_fts_update
+        AFTER UPDATE OF title, content, tags, user_id ON knowledge_base BEGIN
+            INSERT INTO knowledge_fts (knowledge_fts, rowid, title, content, tags, owner)
+            VALUES ('delete', OLD.id, OLD.title, OLD.content, OLD.tags, 'u' || OLD.user_id);
+            INSERT INTO knowledge_fts (rowid, title, content, tags, owner)
+            VALUES (NEW.id, NEW.title, NEW.content, NEW.tags, 'u' || NEW.user_id);
+        END
+        ''',
+    ]),
+    (5, 'knowledge_embeddings', [
+        '''
+        CREATE TABLE IF NOT EXISTS knowledge_embeddings (
+            knowledge_id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            vector BLOB NOT NULL,
+            FOREIGN KEY (knowledge_id) REFERENCES knowledge_base (id)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_embeddings_user ON knowledge_embeddings (user_id, knowledge_id)',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_knowledge_embeddings_delete AFTER DELETE ON knowledge_base BEGIN
+            DELETE FROM knowledge_embeddings WHERE knowledge_id = OLD.id;
+        END
+        ''',
+        semantic.backfill_embeddings,
+    ]),
+    (6, 'normalized_tags', [
+        '''
+        CREATE TABLE IF NOT EXISTS tags (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE COLLATE NOCASE
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS knowledge_tags (
+            knowledge_id INTEGER NOT NULL,
+            tag_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            created_at TIMESTAMP NOT NULL,
+            UNIQUE (knowledge_id, tag_id),
+            FOREIGN KEY (knowledge_id) REFERENCES knowledge_base (id),
+            FOREIGN KEY (tag_id) REFERENCES tags (id)
+        )
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_knowledge_tags_user_tag
+        ON knowledge_tags (user_id, tag_id, created_at, knowledge_id)
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_knowledge_tags_delete AFTER DELETE ON knowledge_base BEGIN
+            DELETE FROM knowledge_tags WHERE knowledge_id = OLD.id;
+        END
+        ''',
+        tagging.backfill_tags,
+    ]),
+    (7, 'token_revocation', [
+        '''
+        CREATE TABLE IF NOT EXISTS refresh_tokens (
+            token_hash TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            expires_at REAL NOT NULL,
+            revoked_at REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_refresh_tokens_user ON refresh_tokens (user_id, revoked_at)',
+        'CREATE INDEX IF NOT EXISTS idx_refresh_tokens_expires ON refresh_tokens (expires_at)',
+        # AUTOINCREMENT so ids are never reused: workers tail this table by id
+        '''
+        CREATE TABLE IF NOT EXISTS revoked_tokens (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            jti TEXT NOT NULL UNIQUE,
+            expires_at REAL NOT NULL
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires ON revoked_tokens (expires_at)',
+    ]),
+    (8, 'case_insensitive_users', [
+        _users_lookup_indexes,
+    ]),
+    # Bumped by triggers on every write so conditional GETs can be answered
+    # from one primary-key lookup
+    (9, 'collection_versions', [
+        '''
+        CREATE TABLE IF NOT EXISTS collection_versions (
+            user_id INTEGER NOT NULL,
+            collection TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            PRIMARY KEY (user_id, collection)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_tasks_version_insert AFTER INSERT ON tasks BEGIN
+            INSERT INTO collection_versions (user_id, collection, version) VALUES (NEW.user_id, 'tasks', 1)
+            ON CONFLICT (user_id, collection) DO UPDATE SET version = version + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_tasks_version_update AFTER UPDATE ON tasks BEGIN
+            INSERT INTO collection_versions (user_id, collection, version) VALUES (NEW.user_id, 'tasks', 1)
+            ON CONFLICT (user_id, collection) DO UPDATE SET version = version + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_tasks_version_delete AFTER DELETE ON tasks BEGIN
+            INSERT INTO collection_versions (user_id, collection, version) VALUES (OLD.user_id, 'tasks', 1)
+            ON CONFLICT (user_id, collection) DO UPDATE SET version = version + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_knowledge_base_version_insert AFTER INSERT ON knowledge_base BEGIN
+            INSERT INTO collection_versions (user_id, collection, version) VALUES (NEW.user_id, 'knowledge', 1)
+            ON CONFLICT (user_id, collection) DO UPDATE SET version = version + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_knowledge_base_version_update AFTER UPDATE ON knowledge_base BEGIN
+            INSERT INTO collection_versions (user_id, collection, version) VALUES (NEW.user_id, 'knowledge', 1)
+            ON CONFLICT (user_id, collection) DO UPDATE SET version = version + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_knowledge_base_version_delete AFTER DELETE ON knowledge_base BEGIN
+            INSERT INTO collection_versions (user_id, collection, version) VALUES (OLD.user_id, 'knowledge', 1)
+            ON CONFLICT (user_id, collection) DO UPDATE SET version = version + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_integrations_version_insert AFTER INSERT ON integrations BEGIN
+            INSERT INTO collection_versions (user_id, collection, version) VALUES (NEW.user_id, 'integrations', 1)
+            ON CONFLICT (user_id, collection) DO UPDATE SET version = version + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_integrations_version_update AFTER UPDATE ON integrations BEGIN
+            INSERT INTO collection_versions (user_id, collection, version) VALUES (NEW.user_id, 'integrations', 1)
+            ON CONFLICT (user_id, collection) DO UPDATE SET version = version + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_integrations_version_delete AFTER DELETE ON integrations BEGIN
+            INSERT INTO collection_versions (user_id, collection, version) VALUES (OLD.user_id, 'integrations', 1)
+            ON CONFLICT (user_id, collection) DO UPDATE SET version = version + 1;
+        END
+        ''',
+    ]),
+    # One entry per row for /api/sync; REPLACE gives a rewritten row a new,
+    # higher id, so the log never holds more than one entry per row
+    (10, 'change_log', [
+        '''
+        CREATE TABLE IF NOT EXISTS change_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            collection TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            deleted INTEGER NOT NULL DEFAULT 0,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (collection, row_id)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_change_log_user ON change_log (user_id, id)',
+        'CREATE INDEX IF NOT EXISTS idx_change_log_tombstones ON change_log (deleted, changed_at)',
+        'CREATE TABLE IF NOT EXISTS change_log_horizon (pruned_through INTEGER NOT NULL)',
+        'INSERT INTO change_log_horizon (pruned_through) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM change_log_horizon)',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_tasks_changes_insert AFTER INSERT ON tasks BEGIN
+            INSERT OR REPLACE INTO change_log (user_id, collection, row_id, deleted)
+            VALUES (NEW.user_id, 'tasks', NEW.id, 0);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_tasks_changes_update AFTER UPDATE ON tasks BEGIN
+            INSERT OR REPLACE INTO change_log (user_id, collection, row_id, deleted)
+            VALUES (NEW.user_id, 'tasks', NEW.id, 0);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_tasks_changes_delete AFTER DELETE ON tasks BEGIN
+            INSERT OR REPLACE INTO change_log (user_id, collection, row_id, deleted)
+            VALUES (OLD.user_id, 'tasks', OLD.id, 1);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_knowledge_base_changes_insert AFTER INSERT ON knowledge_base BEGIN
+            INSERT OR REPLACE INTO change_log (user_id, collection, row_id, deleted)
+            VALUES (NEW.user_id, 'knowledge', NEW.id, 0);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_knowledge_base_changes_update AFTER UPDATE ON knowledge_base BEGIN
+            INSERT OR REPLACE INTO change_log (user_id, collection, row_id, deleted)
+            VALUES (NEW.user_id, 'knowledge', NEW.id, 0);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_knowledge_base_changes_delete AFTER DELETE ON knowledge_base BEGIN
+            INSERT OR REPLACE INTO change_log (user_id, collection, row_id, deleted)
+            VALUES (OLD.user_id, 'knowledge', OLD.id, 1);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_integrations_changes_insert AFTER INSERT ON integrations BEGIN
+            INSERT OR REPLACE INTO change_log (user_id, collection, row_id, deleted)
+            VALUES (NEW.user_id, 'integrations', NEW.id, 0);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_integrations_changes_update AFTER UPDATE ON integrations BEGIN
+            INSERT OR REPLACE INTO change_log (user_id, collection, row_id, deleted)
+            VALUES (NEW.user_id, 'integrations', NEW.id, 0);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_integrations_changes_delete AFTER DELETE ON integrations BEGIN
+            INSERT OR REPLACE INTO change_log (user_id, collection, row_id, deleted)
+            VALUES (OLD.user_id, 'integrations', OLD.id, 1);
+        END
+        ''',
+        "INSERT OR IGNORE INTO change_log (user_id, collection, row_id) "
+        "SELECT user_id, 'tasks', id FROM tasks ORDER BY created_at, id",
+        "INSERT OR IGNORE INTO change_log (user_id, collection, row_id) "
+        "SELECT user_id, 'knowledge', id FROM knowledge_base ORDER BY created_at, id",
+        "INSERT OR IGNORE INTO change_log (user_id, collection, row_id) "
+        "SELECT user_id, 'integrations', id FROM integrations ORDER BY created_at, id",
+    ]),
+    # Background analyze/generate jobs; a runner holds a job only until
+    # lease_until, after which another runner may pick it up again
+    (11, 'ai_jobs', [
+        '''
+        CREATE TABLE IF NOT EXISTS ai_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            priority INTEGER NOT NULL DEFAULT 5,
+            status TEXT NOT NULL DEFAULT 'queued',
+            result TEXT,
+            error TEXT,
+            webhook_url TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            worker TEXT,
+            lease_until REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_ai_jobs_queue ON ai_jobs (status, priority DESC, id)',
+        'CREATE INDEX IF NOT EXISTS idx_ai_jobs_user ON ai_jobs (user_id, status)',
+    ]),
+    # Replaces the shared index of migration 4, whose doclists and bm25
+    # counts spanned every user, with per-user namespaced terms (see
+    # search.namespace). The index stores its own copy of the namespaced
+    # text and search.index_entry keeps it current.
+    (12, 'knowledge_fts_per_user', [
+        'DROP TRIGGER IF EXISTS trg_knowledge_fts_insert',
+        'DROP TRIGGER IF EXISTS trg_knowledge_fts_update',
+        'DROP TRIGGER IF EXISTS trg_knowledge_fts_delete',
+        'DROP TABLE IF EXISTS knowledge_fts',
+        'DROP VIEW IF EXISTS knowledge_fts_source',
+        '''
+        CREATE VIRTUAL TABLE knowledge_fts USING fts5(
+            title, content, tags, tokenize='porter unicode61'
+        )
+        ''',
+        search.backfill_index,
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_knowledge_fts_delete AFTER DELETE ON knowledge_base BEGIN
+            DELETE FROM knowledge_fts WHERE rowid = OLD.id;
+        END
+        ''',
+    ]),
+]
+
+# Queries on the request path that must be served by an index. Checked by
+# `flask check-query-plans` after every schema change.
+# Generated from the statements the code runs, so a plan checked here is the
+# plan production gets. Keyset listings are checked on a later page, with
+# the cursor seek that deep scrolling relies on.
+HOT_QUERIES = {
+    'auth.login': (auth.LOGIN_QUERY, ('x', 'x')),
+    'tasks.page': (queries.keyset(queries.TASKS_PAGE), (1, '9999', 0, 51)),
+    'knowledge.page': (queries.keyset(queries.KNOWLEDGE_PAGE), (1, '9999', 0, 51)),
+    'integrations.page': (queries.keyset(queries.INTEGRATIONS_PAGE), (1, '9999', 0, 51)),
+    'knowledge.tag_page': (queries.keyset(queries.KNOWLEDGE_TAG_PAGE, queries.KNOWLEDGE_TAG_KEY),
+                           (1, 'x', '9999', 0, 51)),
+    'knowledge.tag_cloud': (tagging.TAG_CLOUD_QUERY, (1, 100)),
+    'collection.versions': (queries.COLLECTION_VERSIONS, (1,)),
+    'sync.changes': (sync.CHANGES_QUERY, (1, 0, 501)),
+    'jobs.get': (jobs.GET_QUERY, (1, 1)),
+    'jobs.queued_for_user': (jobs.PENDING_QUERY, (1,)),
+    'jobs.next': (jobs.QUEUED_QUERY, ()),
+    'dashboard.stats': (queries.USER_STATS, (1,)),
+}
+
+
+def current_version(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+
+def migrate(conn):
+    """Apply every pending migration in a single write transaction."""
+    # BEGIN IMMEDIATE so workers starting together apply each migration once
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        version = current_version(conn)
+        for target, name, steps in MIGRATIONS:
+            if target <= version:
+                continue
+            logger.info(f"Applying migration {target}: {name}")
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute('INSERT INTO schema_version (version, name) VALUES (?, ?)', (target, name))
+            version = target
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    return version
+
+
+def unindexed_queries(conn):
+    """Return {name: plan} for hot queries that scan a table or sort rows in a temp b-tree.
+
+    Ordering the output of a GROUP BY is allowed: it sorts one row per group.
+    """
+    failures = {}
+    for name, (sql, params) in HOT_QUERIES.items():
+        plan = [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+        sorts_rows = any('TEMP B-TREE FOR GROUP BY' in step or
+                         ('TEMP B-TREE FOR ORDER BY' in step and 'GROUP BY' not in sql)
+                         for step in plan)
+        if sorts_rows or any(step.startswith('SCAN') and 'INDEX' not in step for step in plan):
+            failures[name] = plan
+    return failures
@@ -0,0 +1,139 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HashingBusy(Exception):
+    pass
+
+
+# werkzeug's defaults, spelled out so stored hashes can be compared exactly
+DEFAULT_PARAMETERS = {
+    'pbkdf2': 'pbkdf2:sha256:600000',
+    'pbkdf2:sha256': 'pbkdf2:sha256:600000',
+    'pbkdf2:sha512': 'pbkdf2:sha512:600000',
+    'scrypt': 'scrypt:32768:8:1',
+}
+
+
+class PasswordPolicy:
+    """The algorithm and cost new hashes are created with.
+
+    ``method`` uses werkzeug's syntax, e.g. ``pbkdf2:sha256:600000`` or
+    ``scrypt:32768:8:1``. Stored hashes whose method prefix differs are
+    considered outdated and get re-hashed on the next successful login.
+    """
+
+    def __init__(self, method='pbkdf2:sha256:600000', salt_length=16):
+        self.method = DEFAULT_PARAMETERS.get(method, method)
+        self.salt_length = salt_length
+
+    def hash(self, password):
+        return generate_password_hash(password, method=self.method, salt_length=self.salt_length)
+
+    def needs_rehash(self, password_hash):
+        return password_hash.split('$', 1)[0] != self.method
+
+
+class HashingPool:
+    """Runs password hashing on a dedicated executor behind an admission limit.
+
+    hashlib's pbkdf2/scrypt release the GIL while they run, so a thread pool
+    sized to the cores hashes in parallel without pickling or spawning.
+
+    At most ``workers + max_queue`` hashes may be in flight per web worker;
+    beyond that callers get HashingBusy straight away instead of queueing
+    behind a login burst, and so does a caller whose hash is not done
+    after ``timeout`` seconds. ``workers=0`` hashes inline on the calling
+    thread but keeps the same admission control.
+    """
+
+    def __init__(self, workers=None, max_queue=None, timeout=10.0, policy=None):
+        self.policy = policy or PasswordPolicy()
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_queue = max_queue if max_queue is not None else 2 * max(self.workers, 1)
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(self.workers, 1) + self.max_queue)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._in_flight = 0
+        self.metrics = {'completed': 0, 'rejected': 0, 'failed': 0, 'timed_out': 0,
+                        'total_ms': 0.0, 'max_ms': 0.0, 'max_in_flight': 0}
+
+    def _get_executor(self):
+        # Executor threads do not survive fork, so each process builds its own
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix='password-hash'
+                    )
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            self.metrics['rejected'] += 1
+            raise HashingBusy('Password hashing queue is full')
+
+        with self._lock:
+            self._in_flight += 1
+            self.metrics['max_in_flight'] = max(self.metrics['max_in_flight'], self._in_flight)
+        started = time.perf_counter()
+        if self.workers == 0:
+            failed = True
+            try:
+                result = fn(*args)
+                failed = False
+                return result
+            finally:
+                self._finish(started, failed)
+
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._finish(started, True)
+            raise
+        # The slot belongs to the hash, not the caller: a caller that gives
+        # up after ``timeout`` must not free it while the hash still runs
+        future.add_done_callback(
+            lambda done: self._finish(started, done.cancelled() or done.exception() is not None)
+        )
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # Same answer as a full queue: the caller gets a 503 and retries
+            self.metrics['timed_out'] += 1
+            raise HashingBusy(f'Password hashing took longer than {self.timeout}s') from None
+
+    def _finish(self, started, failed):
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._in_flight -= 1
+            self.metrics['failed' if failed else 'completed'] += 1
+            self.metrics['total_ms'] += elapsed
+            self.metrics['max_ms'] = max(self.metrics['max_ms'], elapsed)
+        self._slots.release()
+
+    def hash(self, password):
+        return self._run(self.policy.hash, password)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def stats(self):
+        with self._lock:
+            completed = self.metrics['completed']
+            return {
+                'method': self.policy.method,
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'in_flight': self._in_flight,
+                'queued': max(0, self._in_flight - max(self.workers, 1)),
+                'avg_ms': round(self.metrics['total_ms'] / completed, 2) if completed else 0,
+                **{k: round(v, 2) if isinstance(v, float) else v for k, v in self.metrics.items()},
+            }
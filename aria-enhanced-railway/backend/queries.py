@@ -0,0 +1,37 @@
+# SQL run by the list and lookup views in app.py. It lives here rather than
+# inline so migrations.HOT_QUERIES can check the plans of the exact
+# statements the views execute.
+
+# Listings are a SELECT ... WHERE whose columns start with id and end with
+# created_at; keyset() adds the seek and the order on the page key.
+PAGE_KEY = ('created_at', 'id')
+
+TASKS_PAGE = 'SELECT id, title, description, status, priority, created_at FROM tasks WHERE user_id = ?'
+
+KNOWLEDGE_PAGE = 'SELECT id, title, content, category, created_at FROM knowledge_base WHERE user_id = ?'
+
+# Pages on the link table's copy of created_at (see tagging.save_tags)
+KNOWLEDGE_TAG_PAGE = (
+    'SELECT kb.id, kb.title, kb.content, kb.category, kb.created_at '
+    'FROM knowledge_tags kt JOIN knowledge_base kb ON kb.id = kt.knowledge_id '
+    'WHERE kt.user_id = ? AND kt.tag_id = (SELECT id FROM tags WHERE name = ?)'
+)
+KNOWLEDGE_TAG_KEY = ('kt.created_at', 'kt.knowledge_id')
+
+INTEGRATIONS_PAGE = 'SELECT id, name, type, is_active, created_at FROM integrations WHERE user_id = ?'
+
+COLLECTION_VERSIONS = 'SELECT collection, version FROM collection_versions WHERE user_id = ?'
+
+USER_STATS = ('SELECT total_tasks, pending_tasks, completed_tasks, knowledge_entries, active_integrations '
+              'FROM user_stats WHERE user_id = ?')
+
+
+def keyset(query, key=PAGE_KEY, after_cursor=True):
+    """``query`` ordered newest first on ``key``, seeking past a cursor.
+
+    Parameters are the query's own, then the cursor's two values when
+    ``after_cursor``, then the limit.
+    """
+    if after_cursor:
+        query += f' AND ({key[0]}, {key[1]}) < (?, ?)'
+    return query + f' ORDER BY {key[0]} DESC, {key[1]} DESC LIMIT ?'
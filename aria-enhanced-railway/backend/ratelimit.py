@@ -0,0 +1,136 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f'Rate limit exceeded, retry in {retry_after:.0f}s')
+        self.retry_after = retry_after
+
+
+def parse_limit(value):
+    """'10/60' -> (10, 60.0): a burst of 10, refilled evenly over 60 seconds."""
+    capacity, period = str(value).split('/', 1)
+    return int(capacity), float(period)
+
+
+class RateLimiter:
+    """Token buckets shared by every worker through a small SQLite file.
+
+    Buckets live in their own database with synchronous=OFF: losing the
+    last few decrements on a crash is harmless, and limiter traffic never
+    contends with the main write queue.
+
+    Each worker also remembers when a rejected key can next succeed. Other
+    workers can only drain that bucket further, so until then repeated
+    attempts are refused from memory without touching SQLite at all.
+    """
+
+    CLEANUP_EVERY = 1000
+
+    def __init__(self, database, enabled=True, max_blocked=50000):
+        self.database = database
+        self.enabled = enabled
+        self.max_blocked = max_blocked
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._blocked = {}
+        self._calls = 0
+        self.metrics = {'allowed': 0, 'rejected': 0, 'rejected_local': 0}
+
+    def _connection(self):
+        # sqlite3 connections must not be shared across fork
+        if self._pid != os.getpid():
+            conn = sqlite3.connect(self.database, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute('PRAGMA busy_timeout=2000')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS buckets ('
+                'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL'
+                ') WITHOUT ROWID'
+            )
+            self._conn = conn
+            self._pid = os.getpid()
+            self._blocked = {}
+        return self._conn
+
+    def _reject_locally(self, key, now):
+        until = self._blocked.get(key)
+        if until is None:
+            return
+        if until > now:
+            self.metrics['rejected_local'] += 1
+            raise RateLimited(until - now)
+        del self._blocked[key]
+
+    def _block(self, key, until):
+        if len(self._blocked) >= self.max_blocked:
+            now = time.time()
+            self._blocked = {k: v for k, v in self._blocked.items() if v > now}
+        self._blocked[key] = until
+        self.metrics['rejected'] += 1
+
+    def _refill(self, row, capacity, period, now):
+        if row is None:
+            return float(capacity)
+        tokens, updated_at = row
+        return min(capacity, tokens + (now - updated_at) * capacity / period)
+
+    def hit(self, key, limit, cost=1):
+        """Take ``cost`` tokens from ``key``'s bucket or raise RateLimited."""
+        if not self.enabled:
+            return
+        capacity, period = limit
+        now = time.time()
+        with self._lock:
+            self._reject_locally(key, now)
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute('SELECT tokens, updated_at FROM buckets WHERE key = ?', (key,)).fetchone()
+                tokens = self._refill(row, capacity, period, now)
+                if tokens < cost:
+                    conn.execute('COMMIT')
+                    retry_after = (cost - tokens) * period / capacity
+                    self._block(key, now + retry_after)
+                    raise RateLimited(retry_after)
+                conn.execute(
+                    'INSERT OR REPLACE INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?)',
+                    (key, tokens - cost, now)
+                )
+                self._calls += 1
+                if self._calls % self.CLEANUP_EVERY == 0:
+                    # Anything idle for a day has long since refilled
+                    conn.execute('DELETE FROM buckets WHERE updated_at < ?', (now - 86400,))
+                conn.execute('COMMIT')
+            except RateLimited:
+                raise
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                raise
+            self.metrics['allowed'] += 1
+
+    def check(self, key, limit):
+        """Raise RateLimited if ``key`` has no tokens left, without spending one."""
+        if not self.enabled:
+            return
+        capacity, period = limit
+        now = time.time()
+        with self._lock:
+            self._reject_locally(key, now)
+            row = self._connection().execute(
+                'SELECT tokens, updated_at FROM buckets WHERE key = ?', (key,)
+            ).fetchone()
+            tokens = self._refill(row, capacity, period, now)
+            if tokens < 1:
+                retry_after = (1 - tokens) * period / capacity
+                self._block(key, now + retry_after)
+                raise RateLimited(retry_after)
+
+    def stats(self):
+        return {'enabled': self.enabled, 'blocked_keys': len(self._blocked), **self.metrics}
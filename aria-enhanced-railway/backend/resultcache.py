@@ -0,0 +1,212 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(text):
+    """Inputs that differ only in line endings or outer whitespace share a key.
+
+    Routes run the engine on the normalized text too, so a cached result is
+    exactly what a fresh run would produce.
+    """
+    return text.replace('\r\n', '\n').replace('\r', '\n').strip()
+
+
+def cache_key(endpoint, version, kind, text, scope=None):
+    payload = json.dumps([endpoint, version, kind, scope, text], ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).digest()
+
+
+class ResultCache:
+    """Two-tier cache of AI results addressed by a hash of their inputs.
+
+    A per-process LRU answers repeats in microseconds; behind it a SQLite
+    file shared by every worker keeps results across restarts. Both tiers
+    are bounded by the size of the stored JSON and entries expire after
+    ``ttl`` seconds. The file runs with synchronous=OFF: a crash can only
+    lose cached results, which are recomputed on the next miss.
+
+    The memory tier and the file have separate locks, so memory hits never
+    wait behind a slow disk. A SQLite error (locked, disk full, corrupt
+    file) is logged and treated as a miss or a skipped store: the cache
+    must never fail a request it could have computed.
+    """
+
+    CLEANUP_EVERY = 200
+
+    def __init__(self, database, ttl=86400, memory_bytes=32 * 1024 * 1024,
+                 disk_bytes=256 * 1024 * 1024, enabled=True):
+        self.database = database
+        self.ttl = ttl
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+        self._pid = None
+        self._conn = None
+        self._conn_pid = None
+        self._stores = 0
+        self.metrics = {
+            'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0,
+            'expired': 0, 'memory_evictions': 0, 'disk_evictions': 0, 'disk_errors': 0,
+        }
+
+    def _memory(self):
+        # Called with _lock held. Each process starts with an empty LRU.
+        if self._pid != os.getpid():
+            self._entries = OrderedDict()
+            self._size = 0
+            self._pid = os.getpid()
+        return self._entries
+
+    def _connection(self):
+        # Called with _disk_lock held. sqlite3 connections must not be
+        # shared across fork
+        if self._conn_pid != os.getpid():
+            conn = sqlite3.connect(self.database, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute('PRAGMA busy_timeout=2000')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS results ('
+                'key BLOB PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, '
+                'expires_at REAL NOT NULL, accessed_at REAL NOT NULL'
+                ') WITHOUT ROWID'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_results_accessed ON results(accessed_at)')
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def _disk_failed(self, action, error):
+        # Reconnect next time, in case the file was replaced or repaired
+        logger.warning(f"Result cache {action} failed, continuing without the disk tier: {str(error)}")
+        self.metrics['disk_errors'] += 1
+        if self._conn_pid == os.getpid():
+            try:
+                self._conn.close()
+            except sqlite3.Error:
+                pass
+        self._conn_pid = None
+
+    def _remember(self, key, expires_at, value, size):
+        # Called with _lock held
+        entries = self._memory()
+        old = entries.pop(key, None)
+        if old is not None:
+            self._size -= old[2]
+        if size > self.memory_bytes:
+            return
+        entries[key] = (expires_at, value, size)
+        self._size += size
+        while self._size > self.memory_bytes:
+            _, (_, _, evicted) = entries.popitem(last=False)
+            self._size -= evicted
+            self.metrics['memory_evictions'] += 1
+
+    def get(self, key):
+        """Return ``(value, tier)`` with tier 'memory' or 'disk', or None."""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entries = self._memory()
+            entry = entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    entries.move_to_end(key)
+                    self.metrics['memory_hits'] += 1
+                    return entry[1], 'memory'
+                del entries[key]
+                self._size -= entry[2]
+                self.metrics['expired'] += 1
+
+        with self._disk_lock:
+            try:
+                conn = self._connection()
+                row = conn.execute('SELECT value, size, expires_at FROM results WHERE key = ?', (key,)).fetchone()
+                if row is not None and row[2] > now:
+                    conn.execute('UPDATE results SET accessed_at = ? WHERE key = ?', (now, key))
+            except sqlite3.Error as e:
+                self._disk_failed('read', e)
+                row = None
+        if row is None or row[2] <= now:
+            self.metrics['misses'] += 1
+            return None
+        value = json.loads(row[0])
+        with self._lock:
+            self._remember(key, row[2], value, row[1])
+        self.metrics['disk_hits'] += 1
+        return value, 'disk'
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        encoded = json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+        size = len(encoded)
+        now = time.time()
+        expires_at = now + self.ttl
+        with self._lock:
+            self._remember(key, expires_at, value, size)
+            self.metrics['stores'] += 1
+            self._stores += 1
+            trim = self._stores % self.CLEANUP_EVERY == 0
+        with self._disk_lock:
+            try:
+                conn = self._connection()
+                conn.execute(
+                    'INSERT OR REPLACE INTO results (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)',
+                    (key, encoded, size, expires_at, now)
+                )
+                if trim:
+                    self._trim(conn, now)
+            except sqlite3.Error as e:
+                self._disk_failed('write', e)
+
+    def _trim(self, conn, now):
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM results WHERE expires_at <= ?', (now,))
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+            if total > self.disk_bytes:
+                # Least recently read first, down to 90% so the next few
+                # stores do not trigger another pass
+                excess = total - int(self.disk_bytes * 0.9)
+                cutoff = None
+                for accessed_at, size in conn.execute('SELECT accessed_at, size FROM results ORDER BY accessed_at'):
+                    excess -= size
+                    cutoff = accessed_at
+                    if excess <= 0:
+                        break
+                evicted = conn.execute('DELETE FROM results WHERE accessed_at <= ?', (cutoff,)).rowcount
+                self.metrics['disk_evictions'] += evicted
+            conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+
+    def clear(self):
+        with self._lock:
+            self._memory().clear()
+            self._size = 0
+        with self._disk_lock:
+            self._connection().execute('DELETE FROM results')
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'memory_entries': len(self._entries),
+            'memory_bytes': self._size,
+            **self.metrics,
+        }
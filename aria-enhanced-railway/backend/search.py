@@ -0,0 +1,122 @@
+import html
+import re
+
+import tagging
+
+# Column weights for bm25(): title, content, tags
+BM25_WEIGHTS = (10.0, 1.0, 5.0)
+
+# Letters and digits: what the unicode61 tokenizer keeps as token characters
+_TERM_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+# FTS5 wraps matches in these control characters; the text around them is
+# HTML-escaped before they become <mark> tags
+_MARK_START, _MARK_END = '\x02', '\x03'
+
+INDEX_QUERY = 'INSERT INTO knowledge_fts (rowid, title, content, tags) VALUES (?, ?, ?, ?)'
+
+
+def namespace(user_id):
+    """Prefix that puts every indexed token in its owner's own vocabulary.
+
+    FTS5 keeps one doclist per term for the whole table, so a plain term
+    like "meeting" would be walked (and counted by bm25) across every
+    user's entries. As "u42xmeeting" a search only reads its own user's
+    doclists and prefix ranges, so its cost follows that user's entries,
+    not the corpus. 'x' ends the prefix: "u1x..." never starts "u12x...".
+    """
+    return f'u{int(user_id)}x'
+
+
+def _namespaced(text, prefix):
+    if not text:
+        return text
+    return _TERM_RE.sub(lambda m: prefix + m.group(), text)
+
+
+def _strip_namespace(text, prefix):
+    # Only at the start of a token, so a word that itself begins with the
+    # prefix keeps its own copy
+    return re.sub(rf'(?<![^\W_]){re.escape(prefix)}', '', text)
+
+
+def _fts_row(knowledge_id, user_id, title, content, tags):
+    prefix = namespace(user_id)
+    return knowledge_id, _namespaced(title, prefix), _namespaced(content, prefix), _namespaced(tags, prefix)
+
+
+def index_entry(conn, knowledge_id, user_id, title, content, tags):
+    """Add or replace an entry in knowledge_fts.
+
+    The index keeps its own namespaced copy of the text, which no trigger
+    can produce, so every write to knowledge_base's title, content or tags
+    must call this. Deletes are handled by a trigger.
+    """
+    conn.execute('DELETE FROM knowledge_fts WHERE rowid = ?', (knowledge_id,))
+    conn.execute(INDEX_QUERY, _fts_row(knowledge_id, user_id, title, content, tags))
+
+
+def backfill_index(conn):
+    rows = conn.execute('SELECT id, user_id, title, content, tags FROM knowledge_base')
+    conn.executemany(INDEX_QUERY, (_fts_row(*row) for row in rows))
+
+
+def _marked_html(text, prefix):
+    """Escape user-authored text, keeping only the match highlights as markup.
+
+    A stray control character in the entry itself can at worst add a <mark>.
+    """
+    if text is None:
+        return None
+    escaped = html.escape(_strip_namespace(text, prefix))
+    return escaped.replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+
+
+def build_match_query(text, user_id):
+    """Turn free text into a safe FTS5 MATCH expression scoped to one user.
+
+    Every term is quoted so user input can never be parsed as FTS5 syntax,
+    and the last term becomes a prefix query for search-as-you-type. Terms
+    carry the user's namespace, so they only match the user's own entries.
+    """
+    prefix = namespace(user_id)
+    terms = _TERM_RE.findall(text or '')
+    if not terms:
+        return None
+    quoted = [f'"{prefix}{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def search_knowledge(conn, user_id, text, limit=20):
+    match = build_match_query(text, user_id)
+    if match is None:
+        return []
+
+    # ORDER BY rank lets FTS5 sort on its own, so highlight() and snippet()
+    # only run for the rows returned. The user_id check is a second guard;
+    # the namespace already confines the match to the user's entries.
+    rows = conn.execute('''
+        SELECT kb.id,
+               highlight(knowledge_fts, 0, char(2), char(3)),
+               snippet(knowledge_fts, 1, char(2), char(3), '…', 16),
+               kb.category, kb.created_at, rank
+        FROM knowledge_fts
+        JOIN knowledge_base kb ON kb.id = knowledge_fts.rowid
+        WHERE knowledge_fts MATCH ? AND rank MATCH ? AND kb.user_id = ?
+        ORDER BY rank
+        LIMIT ?
+    ''', (match, f"bm25({', '.join(map(str, BM25_WEIGHTS))})", user_id, limit)).fetchall()
+
+    prefix = namespace(user_id)
+    tags_by_id = tagging.tags_for(conn, [row[0] for row in rows])
+    return [{
+        'id': row[0],
+        'title': _marked_html(row[1], prefix),
+        'snippet': _marked_html(row[2], prefix),
+        'category': row[3],
+        'tags': tags_by_id[row[0]],
+        'created_at': row[4],
+        # bm25() is lower-is-better; flip it so clients can sort descending
+        'score': round(-row[5], 4)
+    } for row in rows]
@@ -0,0 +1,200 @@
+import hashlib
+import math
+import re
+import threading
+from collections import OrderedDict, Counter
+
+import numpy as np
+
+# Stored vectors depend on this; changing it requires re-embedding.
+EMBEDDING_DIM = 512
+
+# Users with more vectors than this get an IVF index instead of a flat scan
+IVF_THRESHOLD = 20000
+IVF_PROBES = 8
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _features(text):
+    tokens = [t for t in _TOKEN_RE.findall(text.lower()) if len(t) > 1]
+    features = Counter(tokens)
+    # Adjacent pairs give the hashed space some notion of phrase
+    features.update(f'{a} {b}' for a, b in zip(tokens, tokens[1:]))
+    return features
+
+
+def _bucket(feature):
+    digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+    value = int.from_bytes(digest, 'little')
+    return value % EMBEDDING_DIM, 1.0 if value >> 63 else -1.0
+
+
+def embed(text):
+    """Hashing-trick embedding with sublinear TF, L2-normalised float32."""
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    for feature, count in _features(text or '').items():
+        index, sign = _bucket(feature)
+        vector[index] += sign * (1.0 + math.log(count))
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+def entry_text(title, content, tags):
+    return ' '.join(part for part in (title, content, tags) if part)
+
+
+def store_embedding(conn, knowledge_id, user_id, vector):
+    conn.execute(
+        'INSERT OR REPLACE INTO knowledge_embeddings (knowledge_id, user_id, vector) VALUES (?, ?, ?)',
+        (knowledge_id, user_id, vector.astype(np.float32).tobytes())
+    )
+
+
+def backfill_embeddings(conn):
+    rows = conn.execute('SELECT id, user_id, title, content, tags FROM knowledge_base').fetchall()
+    for knowledge_id, user_id, title, content, tags in rows:
+        store_embedding(conn, knowledge_id, user_id, embed(entry_text(title, content, tags)))
+
+
+class _UserMatrix:
+    """One user's vectors, appendable without copying on every insert.
+
+    Readers take a single snapshot of ``_state`` so a concurrent append can
+    never hand them ids and vectors of different lengths.
+    """
+
+    def __init__(self, ids, vectors):
+        self._ids = np.array(ids, dtype=np.int64)
+        self._vectors = np.array(vectors, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+        self._count = len(self._ids)
+        self._centroids = None
+        self._assignments = np.zeros(len(self._ids), dtype=np.int64)
+        if self._count > IVF_THRESHOLD:
+            self._build_ivf()
+        self._publish()
+
+    def _publish(self):
+        n = self._count
+        self._state = (self._ids[:n], self._vectors[:n], self._centroids, self._assignments[:n])
+
+    def _build_ivf(self, iterations=5):
+        # A few rounds of spherical k-means are enough for coarse partitioning
+        vectors = self._vectors[:self._count]
+        nlist = int(math.sqrt(self._count))
+        rng = np.random.default_rng(0)
+        centroids = vectors[rng.choice(self._count, nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = vectors[assignments == c]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[c] = centroid / (np.linalg.norm(centroid) or 1.0)
+        self._centroids = centroids
+        self._assignments[:self._count] = np.argmax(vectors @ centroids.T, axis=1)
+
+    def add(self, knowledge_id, vector):
+        if self._count == len(self._ids):
+            capacity = max(16, 2 * self._count)
+            self._ids = np.resize(self._ids, capacity)
+            self._assignments = np.resize(self._assignments, capacity)
+            vectors = np.empty((capacity, EMBEDDING_DIM), dtype=np.float32)
+            vectors[:self._count] = self._vectors[:self._count]
+            self._vectors = vectors
+
+        n = self._count
+        self._ids[n] = knowledge_id
+        self._vectors[n] = vector
+        if self._centroids is not None:
+            self._assignments[n] = np.argmax(self._centroids @ vector)
+        self._count += 1
+        if self._centroids is None and self._count > IVF_THRESHOLD:
+            self._build_ivf()
+        self._publish()
+
+    def top_k(self, query, k, exclude=None):
+        ids, vectors, centroids, assignments = self._state
+        if centroids is not None:
+            probes = np.argsort(centroids @ query)[-IVF_PROBES:]
+            candidates = np.flatnonzero(np.isin(assignments, probes))
+        else:
+            candidates = np.arange(len(ids))
+        if exclude is not None:
+            candidates = candidates[ids[candidates] != exclude]
+        if not len(candidates):
+            return []
+
+        scores = vectors[candidates] @ query
+        k = min(k, len(candidates))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(int(ids[candidates[i]]), float(scores[i])) for i in best if scores[i] > 0]
+
+
+class SemanticIndex:
+    """Per-process LRU of per-user embedding matrices.
+
+    A cached matrix is reused while the user's (count, max id) in
+    knowledge_embeddings is unchanged, so rows written by other workers are
+    picked up on the next query without any cross-process signalling.
+    """
+
+    def __init__(self, max_users=256):
+        self.max_users = max_users
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _signature(self, conn, user_id):
+        return conn.execute(
+            'SELECT COUNT(*), MAX(knowledge_id) FROM knowledge_embeddings WHERE user_id = ?',
+            (user_id,)
+        ).fetchone()
+
+    def _matrix(self, conn, user_id):
+        signature = self._signature(conn, user_id)
+        with self._lock:
+            cached = self._cache.get(user_id)
+            if cached and cached[0] == signature:
+                self._cache.move_to_end(user_id)
+                return cached[1]
+
+        rows = conn.execute(
+            'SELECT knowledge_id, vector FROM knowledge_embeddings WHERE user_id = ? ORDER BY knowledge_id',
+            (user_id,)
+        ).fetchall()
+        ids = [row[0] for row in rows]
+        vectors = np.frombuffer(b''.join(row[1] for row in rows), dtype=np.float32)
+        matrix = _UserMatrix(ids, vectors)
+
+        with self._lock:
+            self._cache[user_id] = (signature, matrix)
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > self.max_users:
+                self._cache.popitem(last=False)
+        return matrix
+
+    def add(self, user_id, knowledge_id, vector):
+        # Extend a warm matrix in place rather than reloading it on next query
+        with self._lock:
+            cached = self._cache.get(user_id)
+            if cached is None:
+                return
+            count, max_id = cached[0]
+            cached[1].add(knowledge_id, vector)
+            self._cache[user_id] = ((count + 1, max(max_id or 0, knowledge_id)), cached[1])
+
+    def query(self, conn, user_id, vector, k=10, exclude=None):
+        return self._matrix(conn, user_id).top_k(vector, k, exclude)
+
+    def similar_to(self, conn, user_id, knowledge_id, k=10):
+        row = conn.execute(
+            'SELECT vector FROM knowledge_embeddings WHERE knowledge_id = ? AND user_id = ?',
+            (knowledge_id, user_id)
+        ).fetchone()
+        if row is None:
+            return None
+        vector = np.frombuffer(row[0], dtype=np.float32)
+        return self.query(conn, user_id, vector, k, exclude=knowledge_id)
@@ -0,0 +1,105 @@
+import tagging
+
+DEFAULT_SYNC_LIMIT = 500
+MAX_SYNC_LIMIT = 2000
+
+COLLECTIONS = ('tasks', 'knowledge', 'integrations')
+
+CHANGES_QUERY = ('SELECT id, collection, row_id, deleted FROM change_log '
+                 'WHERE user_id = ? AND id > ? ORDER BY id LIMIT ?')
+
+
+def _tasks(conn, ids):
+    rows = conn.execute(
+        f'SELECT id, title, description, status, priority, created_at FROM tasks '
+        f'WHERE id IN ({",".join("?" * len(ids))})', ids
+    )
+    return [{'id': r[0], 'title': r[1], 'description': r[2], 'status': r[3],
+             'priority': r[4], 'created_at': r[5]} for r in rows]
+
+
+def _knowledge(conn, ids):
+    rows = conn.execute(
+        f'SELECT id, title, content, category, created_at FROM knowledge_base '
+        f'WHERE id IN ({",".join("?" * len(ids))})', ids
+    ).fetchall()
+    tags_by_id = tagging.tags_for(conn, [r[0] for r in rows])
+    return [{'id': r[0], 'title': r[1], 'content': r[2], 'category': r[3],
+             'tags': tags_by_id[r[0]], 'created_at': r[4]} for r in rows]
+
+
+def _integrations(conn, ids):
+    rows = conn.execute(
+        f'SELECT id, name, type, is_active, created_at FROM integrations '
+        f'WHERE id IN ({",".join("?" * len(ids))})', ids
+    )
+    return [{'id': r[0], 'name': r[1], 'type': r[2], 'is_active': bool(r[3]),
+             'created_at': r[4]} for r in rows]
+
+
+LOADERS = {'tasks': _tasks, 'knowledge': _knowledge, 'integrations': _integrations}
+
+
+def head(conn, user_id):
+    # Never below the horizon: a user whose only entries were pruned
+    # tombstones would otherwise be told to reset on every sync
+    row = conn.execute('SELECT MAX(id) FROM change_log WHERE user_id = ?', (user_id,)).fetchone()
+    return max(row[0] or 0, horizon(conn))
+
+
+def horizon(conn):
+    """Highest change id whose tombstone may have been pruned."""
+    row = conn.execute('SELECT pruned_through FROM change_log_horizon').fetchone()
+    return row[0] if row else 0
+
+
+def changes_since(conn, user_id, since, limit=DEFAULT_SYNC_LIMIT):
+    """Rows changed after watermark ``since``, grouped per collection.
+
+    The change log holds one entry per row, re-numbered on every write, so
+    a row touched many times is sent once with its current contents.
+    """
+    if since < horizon(conn):
+        # Deletions the client has not seen may be gone; it must reload
+        return {'reset': True, 'watermark': head(conn, user_id), 'has_more': False}
+
+    entries = conn.execute(CHANGES_QUERY, (user_id, since, limit + 1)).fetchall()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    upserted = {name: [] for name in COLLECTIONS}
+    deleted = {name: [] for name in COLLECTIONS}
+    for _, collection, row_id, is_deleted in entries:
+        (deleted if is_deleted else upserted)[collection].append(row_id)
+
+    changes = {}
+    for name in COLLECTIONS:
+        # A row deleted after its entry was read simply drops out here; its
+        # tombstone sits past this batch's watermark
+        rows = LOADERS[name](conn, upserted[name]) if upserted[name] else []
+        changes[name] = {'upserted': rows, 'deleted': deleted[name]}
+
+    return {
+        'changes': changes,
+        'watermark': entries[-1][0] if entries else since,
+        'has_more': has_more,
+    }
+
+
+def prune_tombstones(conn, days):
+    """Drop tombstones older than ``days``.
+
+    Clients whose watermark predates the newest pruned tombstone are told
+    to reload instead of silently keeping deleted rows.
+    """
+    pruned = conn.execute(
+        "SELECT MAX(id) FROM change_log WHERE deleted = 1 AND changed_at < datetime('now', ?)",
+        (f'-{days} days',)
+    ).fetchone()[0]
+    if pruned is None:
+        return 0
+    count = conn.execute(
+        'DELETE FROM change_log WHERE deleted = 1 AND id <= ?', (pruned,)
+    ).rowcount
+    conn.execute('UPDATE change_log_horizon SET pruned_through = MAX(pruned_through, ?)', (pruned,))
+    return count
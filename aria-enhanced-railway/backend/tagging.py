@@ -0,0 +1,61 @@
+MAX_TAG_LENGTH = 64
+
+TAG_CLOUD_QUERY = ('SELECT t.name, COUNT(*) AS uses FROM knowledge_tags kt JOIN tags t ON t.id = kt.tag_id '
+                   'WHERE kt.user_id = ? GROUP BY kt.tag_id ORDER BY uses DESC, t.name LIMIT ?')
+
+
+def normalize_tags(values):
+    """Strip, drop empties and de-duplicate case-insensitively, keeping order."""
+    seen = set()
+    tags = []
+    for value in values or []:
+        name = str(value).strip()[:MAX_TAG_LENGTH]
+        if name and name.lower() not in seen:
+            seen.add(name.lower())
+            tags.append(name)
+    return tags
+
+
+def save_tags(conn, knowledge_id, user_id, names):
+    # created_at is copied onto the link row so tag-filtered listings can
+    # page on the (user_id, tag_id, created_at) index without touching
+    # knowledge_base until the final rows are known.
+    created_at = conn.execute(
+        'SELECT created_at FROM knowledge_base WHERE id = ?', (knowledge_id,)
+    ).fetchone()[0]
+    for name in names:
+        conn.execute('INSERT OR IGNORE INTO tags (name) VALUES (?)', (name,))
+        conn.execute(
+            'INSERT OR IGNORE INTO knowledge_tags (knowledge_id, tag_id, user_id, created_at) '
+            'SELECT ?, id, ?, ? FROM tags WHERE name = ?',
+            (knowledge_id, user_id, created_at, name)
+        )
+
+
+def tags_for(conn, knowledge_ids):
+    """Map each knowledge id to its tag names with one query."""
+    result = {knowledge_id: [] for knowledge_id in knowledge_ids}
+    if not result:
+        return result
+    placeholders = ','.join('?' * len(result))
+    rows = conn.execute(
+        f'SELECT kt.knowledge_id, t.name FROM knowledge_tags kt JOIN tags t ON t.id = kt.tag_id '
+        f'WHERE kt.knowledge_id IN ({placeholders}) ORDER BY kt.rowid',
+        list(result)
+    )
+    for knowledge_id, name in rows:
+        result[knowledge_id].append(name)
+    return result
+
+
+def tag_cloud(conn, user_id, limit=100):
+    rows = conn.execute(TAG_CLOUD_QUERY, (user_id, limit)).fetchall()
+    return [{'name': row[0], 'count': row[1]} for row in rows]
+
+
+def backfill_tags(conn):
+    rows = conn.execute(
+        "SELECT id, user_id, tags FROM knowledge_base WHERE tags IS NOT NULL AND tags != ''"
+    ).fetchall()
+    for knowledge_id, user_id, tags in rows:
+        save_tags(conn, knowledge_id, user_id, normalize_tags(tags.split(',')))
@@ -0,0 +1,57 @@
+import itertools
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+
+_usernames = (f'user{i}' for i in itertools.count(1))
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    # app.py reads its config and opens its databases relative to the
+    # working directory when it is imported, so both point at a scratch dir
+    root = tmp_path_factory.mktemp('app')
+    cwd = os.getcwd()
+    os.chdir(root)
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv('RATE_LIMIT_DATABASE', str(root / 'ratelimit.db'))
+        patch.setenv('RESULT_CACHE_DATABASE', str(root / 'resultcache.db'))
+        patch.setenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+        import app
+    app.rate_limiter.enabled = False
+    yield app
+    os.chdir(cwd)
+
+
+def use_database(app, path):
+    """Point the app's connection pool and write queue at ``path``."""
+    pragmas = database.build_pragmas(app.app.config)
+    app.app.config['DATABASE'] = str(path)
+    app.app.extensions['db_pool'] = database.ConnectionPool(str(path), pragmas=pragmas)
+    app.app.extensions['db_writer'] = database.WriteQueue(str(path), pragmas=pragmas)
+
+
+@pytest.fixture(scope='module')
+def client(app_module, tmp_path_factory):
+    """A test client on a freshly migrated database of its own."""
+    use_database(app_module, tmp_path_factory.mktemp('db') / 'aria_enhanced.db')
+    app_module.init_db()
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def signup(client):
+    """Register a new user and return their Authorization headers."""
+    def signup():
+        username = next(_usernames)
+        response = client.post('/api/auth/register', json={
+            'username': username, 'email': f'{username}@example.com', 'password': 'test-password'
+        })
+        assert response.status_code == 201
+        return {'Authorization': f"Bearer {response.get_json()['token']}"}
+    return signup
@@ -0,0 +1,97 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+import generation
+
+pytest.importorskip('a2wsgi')
+
+
+def call(app, method, path, headers=(), body=b'', on_body=None):
+    """Drive one HTTP request through an ASGI app; returns (status, headers, body)."""
+    messages = []
+
+    async def receive():
+        if not messages:
+            messages.append(None)
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        await asyncio.sleep(60)
+        return {'type': 'http.disconnect'}
+
+    sent = {'status': None, 'headers': [], 'body': b''}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            sent['status'] = message['status']
+            sent['headers'] = message['headers']
+        elif message['body']:
+            sent['body'] += message['body']
+            if on_body:
+                on_body(message['body'])
+
+    if body:
+        headers = [*headers, ('Content-Length', str(len(body)))]
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+        'headers': [(name.lower().encode(), value.encode()) for name, value in headers],
+        'client': ('127.0.0.1', 1234), 'server': ('127.0.0.1', 80),
+    }
+    asyncio.run(app(scope, receive, send))
+    return sent['status'], dict(sent['headers']), sent['body']
+
+
+@pytest.fixture
+def asgi_app(client):
+    import asgi
+    return asgi.app
+
+
+def test_stream_is_sent_while_generating(asgi_app, signup, monkeypatch):
+    first_sent = threading.Event()
+    progress = {'first_before_finish': None}
+
+    def stream(prompt, kind):
+        yield 'one '
+        # Only continues once the first chunk has reached the client
+        progress['first_before_finish'] = first_sent.wait(5)
+        yield 'two'
+
+    monkeypatch.setattr(generation, 'stream', stream)
+    token = signup()['Authorization']
+    status, headers, body = call(
+        asgi_app, 'POST', '/api/ai/generate',
+        headers=[('Authorization', token), ('Accept', 'application/x-ndjson'), ('Accept-Encoding', 'gzip'),
+                 ('Content-Type', 'application/json'), ('Cache-Control', 'no-cache')],
+        body=json.dumps({'prompt': 'asgi stream', 'type': 'general'}).encode(),
+        on_body=lambda chunk: first_sent.set(),
+    )
+    assert status == 200
+    assert b'content-encoding' not in headers
+    assert progress['first_before_finish'] is True
+    events = [json.loads(line) for line in body.splitlines()]
+    assert [event.get('text') for event in events[:-1]] == ['one ', 'two']
+
+
+def test_body_is_closed():
+    import asgi
+    closed = []
+
+    class Body(list):
+        def close(self):
+            closed.append(True)
+
+    def wsgi_app(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return Body([b'hello'])
+
+    status, _, body = call(asgi.WSGIMiddleware(asgi.closing(wsgi_app)), 'GET', '/')
+    assert (status, body, closed) == (200, b'hello', [True])
+
+
+def test_regular_requests(asgi_app, signup):
+    status, _, body = call(asgi_app, 'GET', '/api/tasks', headers=[('Authorization', signup()['Authorization'])])
+    assert status == 200
+    assert json.loads(body) == {'tasks': [], 'next_cursor': None}
@@ -0,0 +1,53 @@
+import sqlite3
+
+import pytest
+
+import migrations
+from conftest import use_database
+from passwords import PasswordPolicy
+
+PASSWORD = 'shared-password'
+
+
+@pytest.fixture(scope='module')
+def client(app_module, tmp_path_factory):
+    # A database from before migration 8, holding two names that differ
+    # only by case, upgraded to the current schema
+    path = tmp_path_factory.mktemp('upgrade') / 'aria_enhanced.db'
+    conn = sqlite3.connect(path, isolation_level=None)
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(migrations, 'MIGRATIONS', [m for m in migrations.MIGRATIONS if m[0] < 8])
+        migrations.migrate(conn)
+    password_hash = PasswordPolicy('pbkdf2:sha256:1000').hash(PASSWORD)
+    for username in ('Carol', 'carol'):
+        conn.execute('INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
+                     (username, f'{username}@example.com', password_hash))
+    conn.close()
+
+    use_database(app_module, path)
+    app_module.init_db()
+    return app_module.app.test_client()
+
+
+def login(client, username):
+    return client.post('/api/auth/login', json={'username': username, 'password': PASSWORD})
+
+
+def test_exact_case_match_signs_into_that_account(client):
+    assert login(client, 'carol').get_json()['user']['username'] == 'carol'
+    assert login(client, 'Carol').get_json()['user']['username'] == 'Carol'
+
+
+def test_ambiguous_case_folded_name_is_refused(client):
+    assert login(client, 'CAROL').status_code == 401
+
+
+def test_register_rejects_new_case_duplicates(client):
+    response = client.post('/api/auth/register', json={
+        'username': 'CAROL', 'email': 'other@example.com', 'password': 'another-password'
+    })
+    assert response.status_code == 409
+
+
+def test_upgraded_database_keeps_the_sign_up_case_check(app_module, client):
+    assert app_module.app.config['USERS_CHECK_CASE'] is True
@@ -0,0 +1,35 @@
+import gzip
+import zlib
+
+import compression
+
+CONFIG = {'COMPRESS_GZIP_LEVEL': 6, 'COMPRESS_BROTLI_QUALITY': 4}
+
+
+def test_streamed_chunks_are_decodable_before_the_next_is_produced():
+    produced = []
+
+    def events():
+        for event in (b'data: one\n\n', b'data: two\n\n'):
+            produced.append(event)
+            yield event
+
+    decoder = zlib.decompressobj(31)
+    stream = compression._compress_stream(events(), compression._Compressor('gzip', CONFIG), flush_bytes=0)
+    assert decoder.decompress(next(stream)) == b'data: one\n\n'
+    assert len(produced) == 1
+    assert decoder.decompress(b''.join(stream)) == b'data: two\n\n'
+
+
+def test_large_json_body_is_sent_compressed_in_pieces(app_module):
+    app = app_module.app
+    with app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+        body = app.json.dumps({'items': [{'id': i, 'title': f'row {i}'} for i in range(20000)]}).encode()
+        assert len(body) >= app.config['COMPRESS_STREAM_MIN_SIZE']
+        response = compression.compress_response(app.response_class(body, mimetype='application/json'),
+                                                 app.config)
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Content-Length' not in response.headers
+        pieces = list(response.response)
+    assert len(pieces) > 2
+    assert gzip.decompress(b''.join(pieces)) == body
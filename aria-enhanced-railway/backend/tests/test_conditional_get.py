@@ -0,0 +1,73 @@
+import pytest
+
+
+def get(client, url, headers, etag=None, **query):
+    if etag:
+        headers = {**headers, 'If-None-Match': etag}
+    return client.get(url, query_string=query, headers=headers)
+
+
+def test_etag_and_cache_headers(client, signup):
+    response = get(client, '/api/tasks', signup())
+    assert response.status_code == 200
+    assert response.headers['ETag']
+    assert response.cache_control.private and response.cache_control.no_cache
+    assert 'Authorization' in response.vary
+
+
+@pytest.mark.parametrize('url', ['/api/tasks', '/api/knowledge', '/api/integrations', '/api/dashboard'])
+def test_unchanged_collection_is_304(client, signup, url):
+    headers = signup()
+    etag = get(client, url, headers).headers['ETag']
+    for candidate in (etag, f'W/{etag}', f'"other", {etag}'):
+        response = get(client, url, headers, candidate)
+        assert response.status_code == 304
+        assert response.data == b''
+        assert response.headers['ETag'] == etag
+
+
+def test_writes_change_the_etag(client, signup):
+    headers = signup()
+    etags = [get(client, '/api/tasks', headers).headers['ETag']]
+    task_id = client.post('/api/tasks', json={'title': 'versioned'}, headers=headers).get_json()['task_id']
+    etags.append(get(client, '/api/tasks', headers).headers['ETag'])
+    client.put(f'/api/tasks/{task_id}', json={'status': 'completed'}, headers=headers)
+    etags.append(get(client, '/api/tasks', headers).headers['ETag'])
+    client.delete(f'/api/tasks/{task_id}', headers=headers)
+    etags.append(get(client, '/api/tasks', headers).headers['ETag'])
+    assert len(set(etags)) == 4
+
+    response = get(client, '/api/tasks', headers, etags[0])
+    assert response.status_code == 200
+    assert response.get_json()['tasks'] == []
+
+
+def test_versions_are_per_collection(client, signup):
+    headers = signup()
+    tasks = get(client, '/api/tasks', headers).headers['ETag']
+    dashboard = get(client, '/api/dashboard', headers).headers['ETag']
+    client.post('/api/knowledge', json={'title': 'kb', 'content': 'body'}, headers=headers)
+    assert get(client, '/api/tasks', headers, tasks).status_code == 304
+    assert get(client, '/api/dashboard', headers, dashboard).status_code == 200
+
+
+def test_versions_are_per_user(client, signup):
+    owner, other = signup(), signup()
+    etag = get(client, '/api/tasks', owner).headers['ETag']
+    assert get(client, '/api/tasks', other).headers['ETag'] != etag
+    client.post('/api/tasks', json={'title': 'not yours'}, headers=other)
+    assert get(client, '/api/tasks', owner, etag).status_code == 304
+
+
+def test_query_string_is_part_of_the_etag(client, signup):
+    headers = signup()
+    etag = get(client, '/api/tasks', headers).headers['ETag']
+    response = get(client, '/api/tasks', headers, etag, limit=1)
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_errors_carry_no_etag(client, signup):
+    response = get(client, '/api/tasks', signup(), cursor='not-a-cursor')
+    assert response.status_code == 400
+    assert 'ETag' not in response.headers
@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+import generation
+
+
+@pytest.fixture
+def paced_generation(monkeypatch):
+    """Generation that records how far it has got, standing in for a model."""
+    progress = {'chunks': 0, 'finished': False}
+
+    def stream(prompt, kind):
+        for word in ('one ', 'two ', 'three ', 'four'):
+            progress['chunks'] += 1
+            yield word
+        progress['finished'] = True
+
+    monkeypatch.setattr(generation, 'stream', stream)
+    return progress
+
+
+@pytest.mark.parametrize('accept', ['text/event-stream', 'application/x-ndjson'])
+@pytest.mark.parametrize('encoding', ['gzip', 'br, gzip', None])
+def test_first_event_arrives_before_generation_finishes(client, signup, paced_generation, accept, encoding):
+    headers = {**signup(), 'Accept': accept, 'Cache-Control': 'no-cache'}
+    if encoding:
+        headers['Accept-Encoding'] = encoding
+    response = client.post('/api/ai/generate', json={'prompt': 'stream test', 'type': 'general'},
+                           headers=headers, buffered=False)
+    assert 'Content-Encoding' not in response.headers
+
+    first = next(chunk for chunk in response.response if chunk)
+    assert not paced_generation['finished']
+    if accept == 'text/event-stream':
+        assert first.startswith(b'data: ')
+        event = json.loads(first[len(b'data: '):])
+    else:
+        event = json.loads(first)
+    assert event['text'] == 'one '
+    response.close()
@@ -0,0 +1,39 @@
+import threading
+
+import pytest
+
+import passwords
+
+
+class SlowPolicy(passwords.PasswordPolicy):
+    """Hashes only once ``release`` is set."""
+
+    def __init__(self):
+        super().__init__('pbkdf2:sha256:1000')
+        self.release = threading.Event()
+
+    def hash(self, password):
+        self.release.wait(5)
+        return super().hash(password)
+
+
+@pytest.fixture
+def slow_pool():
+    pool = passwords.HashingPool(workers=1, timeout=0.05, policy=SlowPolicy())
+    yield pool
+    pool.policy.release.set()
+
+
+def test_timeout_is_busy(slow_pool):
+    with pytest.raises(passwords.HashingBusy):
+        slow_pool.hash('secret')
+    assert slow_pool.stats()['timed_out'] == 1
+
+
+def test_register_timeout_is_503(client, monkeypatch, app_module, slow_pool):
+    monkeypatch.setattr(app_module, 'hashing_pool', slow_pool)
+    response = client.post('/api/auth/register', json={
+        'username': 'slowhash', 'email': 'slowhash@example.com', 'password': 'test-password'
+    })
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '2'
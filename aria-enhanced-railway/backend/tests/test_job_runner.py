@@ -0,0 +1,91 @@
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import jobs
+import migrations
+
+GENERATE = {'prompt': 'job runner test', 'type': 'general'}
+
+
+def execute(kind, payload):
+    # Runs in the pool's processes: a 'crash' job takes its process down
+    # the way the OOM killer would
+    if payload.get('crash'):
+        os._exit(1)
+    return jobs.execute(kind, payload)
+
+
+@pytest.fixture
+def write(tmp_path):
+    conn = sqlite3.connect(tmp_path / 'jobs.db', isolation_level=None, check_same_thread=False)
+    migrations.migrate(conn)
+    conn.execute("INSERT INTO users (id, username, email, password_hash) VALUES (1, 'jobs', 'jobs@example.com', '-')")
+    lock = threading.Lock()
+
+    def write(fn):
+        with lock:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                result = fn(conn)
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+            return result
+
+    yield write
+    conn.close()
+
+
+def run_until_idle(runner, write, timeout=60):
+    thread = threading.Thread(target=runner.run)
+    thread.start()
+    deadline = time.monotonic() + timeout
+    try:
+        while time.monotonic() < deadline:
+            counts = write(jobs.counts)
+            if not counts.get('queued') and not counts.get('running'):
+                return counts
+            time.sleep(0.1)
+        pytest.fail(f'jobs still pending: {counts}')
+    finally:
+        runner.stop()
+        thread.join(timeout=30)
+
+
+def test_broken_pool_is_rebuilt_and_innocent_jobs_rerun(write, monkeypatch):
+    monkeypatch.setattr(jobs, 'execute', execute)
+    crash = write(lambda conn: jobs.submit(conn, 1, 'generate', {**GENERATE, 'crash': True}))
+    innocent = [write(lambda conn: jobs.submit(conn, 1, 'generate', GENERATE)) for _ in range(3)]
+    runner = jobs.JobRunner(write, processes=2, max_running_per_user=4, max_attempts=2, poll_interval=0.05)
+
+    run_until_idle(runner, write)
+
+    assert write(lambda conn: jobs.get(conn, 1, crash))['status'] == 'failed'
+    for job_id in innocent:
+        job = write(lambda conn: jobs.get(conn, 1, job_id))
+        assert job['status'] == 'succeeded'
+        assert job['result']['content'] == 'Generated response for: job runner test'
+
+
+def test_failing_iteration_does_not_stop_the_runner(write):
+    failures = []
+
+    def flaky_write(fn):
+        # The first few writes time out, as they would on a busy database
+        if len(failures) < 3:
+            failures.append(fn)
+            raise TimeoutError('database is busy')
+        return write(fn)
+
+    job_id = write(lambda conn: jobs.submit(conn, 1, 'generate', GENERATE))
+    runner = jobs.JobRunner(flaky_write, processes=1, poll_interval=0.01)
+
+    run_until_idle(runner, write)
+
+    assert len(failures) == 3
+    assert write(lambda conn: jobs.get(conn, 1, job_id))['status'] == 'succeeded'
@@ -0,0 +1,61 @@
+import base64
+
+import pytest
+
+
+def create_tasks(client, headers, count):
+    return [client.post('/api/tasks', json={'title': f'task {i}'}, headers=headers).get_json()['task_id']
+            for i in range(count)]
+
+
+def walk(client, url, headers, key):
+    """Follow next_cursor to the end; returns the ids of every page."""
+    pages = []
+    cursor = None
+    while True:
+        query = {'limit': 2, **({'cursor': cursor} if cursor else {})}
+        body = client.get(url, query_string=query, headers=headers).get_json()
+        pages.append([item['id'] for item in body[key]])
+        cursor = body['next_cursor']
+        if cursor is None:
+            return pages
+
+
+def test_cursors_walk_every_row_once_newest_first(client, signup):
+    headers = signup()
+    # Created within the same second, so the id breaks the created_at ties
+    ids = create_tasks(client, headers, 5)
+    pages = walk(client, '/api/tasks', headers, 'tasks')
+    assert pages == [ids[4:2:-1], ids[2:0:-1], ids[:1]]
+
+
+def test_rows_created_while_paging_do_not_shift_pages(client, signup):
+    headers = signup()
+    ids = create_tasks(client, headers, 4)
+    first = client.get('/api/tasks', query_string={'limit': 2}, headers=headers).get_json()
+    create_tasks(client, headers, 1)
+    second = client.get('/api/tasks', query_string={'limit': 2, 'cursor': first['next_cursor']},
+                        headers=headers).get_json()
+    assert [task['id'] for task in second['tasks']] == [ids[1], ids[0]]
+    assert second['next_cursor'] is None
+
+
+def test_cursors_are_per_user(client, signup):
+    owner, other = signup(), signup()
+    create_tasks(client, owner, 3)
+    cursor = client.get('/api/tasks', query_string={'limit': 1}, headers=owner).get_json()['next_cursor']
+    body = client.get('/api/tasks', query_string={'cursor': cursor}, headers=other).get_json()
+    assert body == {'tasks': [], 'next_cursor': None}
+
+
+@pytest.mark.parametrize('cursor', [
+    'not-a-cursor',
+    base64.urlsafe_b64encode(b'{}').decode(),
+    base64.urlsafe_b64encode(b'null').decode(),
+    base64.urlsafe_b64encode(b'["2024-01-01 00:00:00", "x"]').decode(),
+])
+@pytest.mark.parametrize('url', ['/api/tasks', '/api/knowledge', '/api/integrations'])
+def test_bad_cursor_is_400(client, signup, url, cursor):
+    response = client.get(url, query_string={'cursor': cursor}, headers=signup())
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Invalid cursor'}
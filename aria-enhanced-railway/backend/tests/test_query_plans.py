@@ -0,0 +1,9 @@
+import database
+import migrations
+
+
+def test_hot_queries_use_indexes(client, app_module):
+    # client has run init_db on a fresh database
+    with database.get_pool(app_module.app).connection() as conn:
+        assert migrations.unindexed_queries(conn) == {}
+        assert migrations.HOT_QUERIES
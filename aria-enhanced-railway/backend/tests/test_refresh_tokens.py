@@ -0,0 +1,65 @@
+import itertools
+
+import pytest
+
+_usernames = (f'refresh{i}' for i in itertools.count(1))
+
+
+@pytest.fixture
+def session(client):
+    """Tokens from a fresh registration."""
+    username = next(_usernames)
+    response = client.post('/api/auth/register', json={
+        'username': username, 'email': f'{username}@example.com', 'password': 'test-password'
+    })
+    return response.get_json()
+
+
+def refresh(client, refresh_token):
+    return client.post('/api/auth/refresh', json={'refresh_token': refresh_token})
+
+
+def bearer(tokens):
+    return {'Authorization': f"Bearer {tokens['token']}"}
+
+
+def test_refresh_rotates_the_token(client, session):
+    response = refresh(client, session['refresh_token'])
+    assert response.status_code == 200
+    rotated = response.get_json()
+    assert rotated['refresh_token'] != session['refresh_token']
+    assert client.get('/api/dashboard', headers=bearer(rotated)).status_code == 200
+    assert refresh(client, rotated['refresh_token']).status_code == 200
+
+
+def test_reused_refresh_token_ends_every_session(client, session):
+    rotated = refresh(client, session['refresh_token']).get_json()
+    assert refresh(client, session['refresh_token']).status_code == 401
+    # The legitimate holder of the rotated token is signed out too
+    assert refresh(client, rotated['refresh_token']).status_code == 401
+
+
+def test_logout_revokes_access_and_refresh_tokens(client, session):
+    response = client.post('/api/auth/logout', json={'refresh_token': session['refresh_token']},
+                           headers=bearer(session))
+    assert response.status_code == 200
+    assert client.get('/api/dashboard', headers=bearer(session)).status_code == 401
+    assert refresh(client, session['refresh_token']).status_code == 401
+
+
+def test_logout_without_a_body(client, session):
+    assert client.post('/api/auth/logout', headers=bearer(session)).status_code == 200
+
+
+@pytest.mark.parametrize('body', [['token'], 'token', {}, {'refresh_token': 5}, {'refresh_token': ['x']}])
+def test_refresh_rejects_malformed_bodies(client, body):
+    assert client.post('/api/auth/refresh', json=body).status_code == 400
+
+
+@pytest.mark.parametrize('body', [['token'], 'token', {'refresh_token': 5}])
+def test_logout_rejects_malformed_bodies(client, body):
+    assert client.post('/api/auth/logout', json=body).status_code == 400
+
+
+def test_unknown_refresh_token(client):
+    assert refresh(client, 'not-a-token').status_code == 401
@@ -0,0 +1,14 @@
+def register(client, username, email):
+    return client.post('/api/auth/register', json={
+        'username': username, 'email': email, 'password': 'test-password'
+    })
+
+
+def test_fresh_database_relies_on_the_unique_indexes(app_module, client):
+    assert app_module.app.config['USERS_CHECK_CASE'] is False
+
+
+def test_names_and_emails_are_unique_in_any_case(client):
+    assert register(client, 'Dana', 'dana@example.com').status_code == 201
+    assert register(client, 'DANA', 'other@example.com').status_code == 409
+    assert register(client, 'dana2', 'Dana@Example.com').status_code == 409
@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+import generation
+import resultcache
+
+
+@pytest.fixture
+def broken_cache(tmp_path):
+    # A directory cannot be opened as a database, so every disk access fails
+    return resultcache.ResultCache(str(tmp_path))
+
+
+def test_disk_errors_are_misses(broken_cache, tmp_path):
+    broken_cache.put('key', {'answer': 42})
+    assert broken_cache.get('key') == ({'answer': 42}, 'memory')
+    assert broken_cache.get('other') is None
+    assert resultcache.ResultCache(str(tmp_path)).get('key') is None
+    assert broken_cache.stats()['disk_errors'] == 2
+
+
+def test_memory_hits_do_not_wait_for_the_disk(tmp_path):
+    cache = resultcache.ResultCache(str(tmp_path / 'cache.db'))
+    cache.put('key', 'value')
+    with cache._disk_lock:
+        assert cache.get('key') == ('value', 'memory')
+
+
+def test_stream_survives_a_broken_cache(client, signup, monkeypatch, app_module, broken_cache):
+    monkeypatch.setattr(app_module, 'result_cache', broken_cache)
+    monkeypatch.setattr(generation, 'stream', lambda prompt, kind: iter(['one ', 'two']))
+    response = client.post('/api/ai/generate', json={'prompt': 'cache test', 'type': 'general'},
+                           headers={**signup(), 'Accept': 'application/x-ndjson'})
+    assert response.status_code == 200
+    events = [json.loads(line) for line in response.data.splitlines()]
+    assert [event.get('text') for event in events[:-1]] == ['one ', 'two']
+    assert events[-1]['status'] == 'success'
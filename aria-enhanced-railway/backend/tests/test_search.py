@@ -0,0 +1,83 @@
+import sqlite3
+
+import pytest
+
+import migrations
+import search
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:', isolation_level=None)
+    migrations.migrate(conn)
+    conn.executemany('INSERT INTO users (id, username, email, password_hash) VALUES (?, ?, ?, ?)',
+                     [(1, 'one', 'one@example.com', '-'), (12, 'twelve', 'twelve@example.com', '-')])
+    yield conn
+    conn.close()
+
+
+def add(conn, user_id, title, content, tags=''):
+    knowledge_id = conn.execute(
+        'INSERT INTO knowledge_base (user_id, title, content, tags) VALUES (?, ?, ?, ?)',
+        (user_id, title, content, tags)
+    ).lastrowid
+    search.index_entry(conn, knowledge_id, user_id, title, content, tags)
+    return knowledge_id
+
+
+def ids(results):
+    return [result['id'] for result in results]
+
+
+def test_only_the_users_entries_match(conn):
+    mine = add(conn, 1, 'Budget review', 'numbers for the quarter')
+    add(conn, 12, 'Budget review', 'numbers for the quarter')
+    assert ids(search.search_knowledge(conn, 1, 'budget')) == [mine]
+    assert ids(search.search_knowledge(conn, 1, 'budg')) == [mine]
+
+
+def test_prefix_and_stemmed_terms(conn):
+    entry = add(conn, 12, 'Planning meetings', 'weekly sync')
+    assert ids(search.search_knowledge(conn, 12, 'meeting')) == [entry]
+    assert ids(search.search_knowledge(conn, 12, 'weekly pla')) == [entry]
+    assert search.search_knowledge(conn, 1, 'meeting') == []
+
+
+def test_title_outranks_content(conn):
+    in_content = add(conn, 1, 'Notes', 'the roadmap for next year')
+    in_title = add(conn, 1, 'Roadmap', 'plans for next year')
+    assert ids(search.search_knowledge(conn, 1, 'roadmap')) == [in_title, in_content]
+
+
+def test_highlights_are_escaped_without_namespaces(conn):
+    add(conn, 1, 'Fix <b>deploy</b> u1xdeploy', 'deploy & release <script>', 'ops')
+    result = search.search_knowledge(conn, 1, 'deploy')[0]
+    assert result['title'] == 'Fix &lt;b&gt;<mark>deploy</mark>&lt;/b&gt; u1xdeploy'
+    assert result['snippet'] == '<mark>deploy</mark> &amp; release &lt;script&gt;'
+
+
+def test_deleted_entries_leave_the_index(conn):
+    entry = add(conn, 1, 'Temporary', 'scratch notes')
+    conn.execute('DELETE FROM knowledge_base WHERE id = ?', (entry,))
+    assert search.search_knowledge(conn, 1, 'scratch') == []
+
+
+def test_backfill_indexes_existing_entries(conn):
+    entry = add(conn, 12, 'Vendor contract', 'renewal terms')
+    conn.execute('DELETE FROM knowledge_fts')
+    search.backfill_index(conn)
+    assert ids(search.search_knowledge(conn, 12, 'renewal')) == [entry]
+
+
+def test_queries_are_never_fts_syntax(conn):
+    add(conn, 1, 'Release', 'notes')
+    assert search.search_knowledge(conn, 1, 'release" OR "u12x*') == []
+    assert search.search_knowledge(conn, 1, '***') == []
+
+
+def test_search_endpoint(client, signup):
+    headers = signup()
+    client.post('/api/knowledge', json={'title': 'Launch checklist', 'content': 'steps'}, headers=headers)
+    client.post('/api/knowledge', json={'title': 'Launch checklist', 'content': 'steps'}, headers=signup())
+    body = client.get('/api/knowledge/search', query_string={'q': 'launch'}, headers=headers).get_json()
+    assert [result['title'] for result in body['results']] == ['<mark>Launch</mark> checklist']
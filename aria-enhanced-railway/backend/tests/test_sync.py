@@ -0,0 +1,97 @@
+import sqlite3
+
+
+def sync(client, headers, **query):
+    response = client.get('/api/sync', query_string=query, headers=headers)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_first_sync_hands_out_the_head(client, signup):
+    headers = signup()
+    assert sync(client, headers) == {'watermark': 0}
+    client.post('/api/tasks', json={'title': 'first'}, headers=headers)
+    assert sync(client, headers)['watermark'] > 0
+
+
+def test_changes_since_watermark(client, signup):
+    headers = signup()
+    watermark = sync(client, headers)['watermark']
+    task_id = client.post('/api/tasks', json={'title': 'synced'}, headers=headers).get_json()['task_id']
+    knowledge_id = client.post('/api/knowledge', json={'title': 'kb', 'content': 'body', 'tags': ['t']},
+                               headers=headers).get_json()['knowledge_id']
+
+    body = sync(client, headers, since=watermark)
+    assert [row['id'] for row in body['changes']['tasks']['upserted']] == [task_id]
+    assert body['changes']['knowledge']['upserted'][0]['id'] == knowledge_id
+    assert body['changes']['knowledge']['upserted'][0]['tags'] == ['t']
+    assert body['changes']['integrations'] == {'upserted': [], 'deleted': []}
+    assert body['has_more'] is False
+
+    again = sync(client, headers, since=body['watermark'])
+    assert again['watermark'] == body['watermark']
+    assert all(change == {'upserted': [], 'deleted': []} for change in again['changes'].values())
+
+
+def test_repeated_updates_are_sent_once(client, signup):
+    headers = signup()
+    task_id = client.post('/api/tasks', json={'title': 'busy'}, headers=headers).get_json()['task_id']
+    watermark = sync(client, headers)['watermark']
+    for status in ('in_progress', 'completed'):
+        client.put(f'/api/tasks/{task_id}', json={'status': status}, headers=headers)
+    upserted = sync(client, headers, since=watermark)['changes']['tasks']['upserted']
+    assert [(row['id'], row['status']) for row in upserted] == [(task_id, 'completed')]
+
+
+def test_deletes_are_tombstones(client, signup):
+    headers = signup()
+    watermark = sync(client, headers)['watermark']
+    task_id = client.post('/api/tasks', json={'title': 'short-lived'}, headers=headers).get_json()['task_id']
+    client.delete(f'/api/tasks/{task_id}', headers=headers)
+    tasks = sync(client, headers, since=watermark)['changes']['tasks']
+    assert tasks == {'upserted': [], 'deleted': [task_id]}
+
+
+def test_changes_are_per_user(client, signup):
+    owner, other = signup(), signup()
+    watermark = sync(client, owner)['watermark']
+    client.post('/api/tasks', json={'title': 'not yours'}, headers=other)
+    body = sync(client, owner, since=watermark)
+    assert body['changes']['tasks']['upserted'] == []
+
+
+def test_batches_follow_the_watermark(client, signup):
+    headers = signup()
+    ids = [client.post('/api/tasks', json={'title': f'task {i}'}, headers=headers).get_json()['task_id']
+           for i in range(5)]
+    seen = []
+    watermark = 0
+    while True:
+        body = sync(client, headers, since=watermark, limit=2)
+        seen += [row['id'] for row in body['changes']['tasks']['upserted']]
+        watermark = body['watermark']
+        if not body['has_more']:
+            break
+    assert seen == ids
+
+
+def test_bad_parameters_are_400(client, signup):
+    headers = signup()
+    for query in ({'since': 'x'}, {'since': 0, 'limit': 'x'}, {'since': -1}, {'since': 0, 'limit': 0}):
+        assert client.get('/api/sync', query_string=query, headers=headers).status_code == 400
+
+
+# Last: the horizon is shared by every user of the module's database
+def test_pruned_tombstones_force_a_reset(client, signup, app_module):
+    headers = signup()
+    watermark = sync(client, headers)['watermark']
+    task_id = client.post('/api/tasks', json={'title': 'old'}, headers=headers).get_json()['task_id']
+    client.delete(f'/api/tasks/{task_id}', headers=headers)
+    with sqlite3.connect(app_module.app.config['DATABASE']) as conn:
+        conn.execute("UPDATE change_log SET changed_at = datetime('now', '-40 days') WHERE deleted = 1")
+    result = app_module.app.test_cli_runner().invoke(args=['prune-changes', '--days', '30'])
+    assert result.exit_code == 0
+
+    head = sync(client, headers)['watermark']
+    assert sync(client, headers, since=watermark) == {'reset': True, 'watermark': head, 'has_more': False}
+    assert 'changes' in sync(client, headers, since=head)
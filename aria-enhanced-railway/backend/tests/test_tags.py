@@ -0,0 +1,69 @@
+def create_entry(client, headers, title, tags):
+    response = client.post('/api/knowledge', json={'title': title, 'content': f'{title} body', 'tags': tags},
+                           headers=headers)
+    assert response.status_code == 201
+    return response.get_json()['knowledge_id']
+
+
+def listing(client, headers, **query):
+    return client.get('/api/knowledge', query_string=query, headers=headers).get_json()
+
+
+def test_tags_are_normalized(client, signup):
+    headers = signup()
+    create_entry(client, headers, 'normalized', [' Python ', 'python', '', 'Flask', 'PYTHON'])
+    assert listing(client, headers)['knowledge'][0]['tags'] == ['Python', 'Flask']
+
+
+def test_filter_by_tag_pages_newest_first(client, signup):
+    headers = signup()
+    tagged = [create_entry(client, headers, f'tagged {i}', ['sqlite', 'db']) for i in range(3)]
+    create_entry(client, headers, 'untagged', ['other'])
+
+    ids = []
+    cursor = None
+    while True:
+        body = listing(client, headers, tag='sqlite', limit=1, **({'cursor': cursor} if cursor else {}))
+        ids += [entry['id'] for entry in body['knowledge']]
+        assert all(entry['tags'] == ['sqlite', 'db'] for entry in body['knowledge'])
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+    assert ids == tagged[::-1]
+
+
+def test_filter_is_case_insensitive(client, signup):
+    headers = signup()
+    entry = create_entry(client, headers, 'cased', ['Caching'])
+    assert [e['id'] for e in listing(client, headers, tag='CACHING')['knowledge']] == [entry]
+    assert [e['id'] for e in listing(client, headers, tag=' caching ')['knowledge']] == [entry]
+
+
+def test_filter_is_per_user(client, signup):
+    owner, other = signup(), signup()
+    create_entry(client, owner, 'private', ['shared-tag'])
+    mine = create_entry(client, other, 'mine', ['shared-tag'])
+    assert [e['id'] for e in listing(client, other, tag='shared-tag')['knowledge']] == [mine]
+
+
+def test_unknown_tag_is_empty(client, signup):
+    headers = signup()
+    create_entry(client, headers, 'entry', ['known'])
+    assert listing(client, headers, tag='never-used') == {'knowledge': [], 'next_cursor': None}
+
+
+def test_tag_cloud_counts_uses(client, signup):
+    headers = signup()
+    create_entry(client, headers, 'one', ['alpha', 'beta'])
+    create_entry(client, headers, 'two', ['alpha'])
+    body = client.get('/api/knowledge/tags', headers=headers).get_json()
+    assert body['tags'] == [{'name': 'alpha', 'count': 2}, {'name': 'beta', 'count': 1}]
+
+
+def test_tags_must_be_strings(client, signup):
+    response = client.post('/api/knowledge', json={'title': 't', 'content': 'c', 'tags': 'alpha'},
+                           headers=signup())
+    assert response.status_code == 400
+    response = client.post('/api/knowledge', json={'title': 't', 'content': 'c', 'tags': [1]},
+                           headers=signup())
+    assert response.status_code == 400
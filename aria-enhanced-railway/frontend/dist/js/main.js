@@ -3,11 +3,27 @@
 // Global variables
 let currentUser = null;
 let authToken = null;
+let refreshToken = null;
+let refreshInFlight = null;
 let currentView = 'dashboard';
 
 // API Base URL
 const API_BASE = window.location.origin + '/api';
 
+// Infinite scroll state per paginated collection
+const PAGE_SIZE = 50;
+const pagination = {
+    tasks: { cursor: null, done: false, loading: false, generation: 0 },
+    knowledge: { cursor: null, done: false, loading: false, generation: 0 },
+    integrations: { cursor: null, done: false, loading: false, generation: 0 }
+};
+
+// Delta sync: after a mutation, apply rows changed since the watermark
+// instead of reloading whole collections
+let syncWatermark = null;
+let syncReady = Promise.resolve();
+let syncQueue = Promise.resolve();
+
 // Initialize application
 document.addEventListener('DOMContentLoaded', function() {
     initializeApp();
@@ -21,6 +37,7 @@ function initializeApp() {
 
     // Check for existing auth token
     authToken = localStorage.getItem('aria_token');
+    refreshToken = localStorage.getItem('aria_refresh_token');
     if (authToken) {
         validateToken();
     } else {
@@ -60,6 +77,14 @@ function initializeEventListeners() {
     // Knowledge form
     document.getElementById('knowledge-form').addEventListener('submit', handleCreateKnowledge);
 
+    // Knowledge search (debounced)
+    let searchTimer = null;
+    document.getElementById('global-search')?.addEventListener('input', function() {
+        clearTimeout(searchTimer);
+        const query = this.value.trim();
+        searchTimer = setTimeout(() => searchKnowledge(query), 250);
+    });
+
     // Modal close buttons
     document.querySelectorAll('.modal-close').forEach(btn => {
         btn.addEventListener('click', function() {
@@ -107,9 +132,8 @@ async function handleLogin(e) {
         const data = await response.json();
 
         if (response.ok) {
-            authToken = data.token;
+            storeTokens(data);
             currentUser = data.user;
-            localStorage.setItem('aria_token', authToken);
             
             hideLoginModal();
             showApp();
@@ -143,9 +167,8 @@ async function handleRegister(e) {
         const data = await response.json();
 
         if (response.ok) {
-            authToken = data.token;
+            storeTokens(data);
             currentUser = data.user;
-            localStorage.setItem('aria_token', authToken);
             
             hideLoginModal();
             showApp();
@@ -162,37 +185,101 @@ async function handleRegister(e) {
 
 async function validateToken() {
     try {
-        const response = await fetch(`${API_BASE}/dashboard`, {
+        const response = await authFetch(`${API_BASE}/dashboard`, {
             headers: {
                 'Authorization': `Bearer ${authToken}`
             }
         });
 
         if (response.ok) {
+            // The auth check already fetched the dashboard; render it directly
+            const data = await response.json();
             showApp();
-            loadDashboard();
+            updateDashboardStats(data.stats);
+            updateRecentActivity(data.recent_activity);
         } else {
-            localStorage.removeItem('aria_token');
-            authToken = null;
+            clearTokens();
             showLoginModal();
         }
     } catch (error) {
         console.error('Token validation error:', error);
-        localStorage.removeItem('aria_token');
-        authToken = null;
+        clearTokens();
         showLoginModal();
     }
 }
 
 function logout() {
-    localStorage.removeItem('aria_token');
-    authToken = null;
+    // Revoke server-side so the tokens stop working everywhere, not just here
+    fetch(`${API_BASE}/auth/logout`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Authorization': `Bearer ${authToken}`
+        },
+        body: JSON.stringify({ refresh_token: refreshToken })
+    }).catch(error => console.error('Logout error:', error));
+
+    clearTokens();
     currentUser = null;
+    syncWatermark = null;
     hideApp();
     showLoginModal();
     showNotification('Logged out successfully', 'success');
 }
 
+function storeTokens(data) {
+    authToken = data.token;
+    refreshToken = data.refresh_token;
+    localStorage.setItem('aria_token', authToken);
+    localStorage.setItem('aria_refresh_token', refreshToken);
+}
+
+function clearTokens() {
+    localStorage.removeItem('aria_token');
+    localStorage.removeItem('aria_refresh_token');
+    authToken = null;
+    refreshToken = null;
+}
+
+// Exchange the refresh token for a new pair; concurrent callers share one request
+function refreshAccessToken() {
+    if (!refreshToken) {
+        return Promise.resolve(false);
+    }
+    if (!refreshInFlight) {
+        refreshInFlight = fetch(`${API_BASE}/auth/refresh`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ refresh_token: refreshToken })
+        }).then(async response => {
+            if (!response.ok) {
+                return false;
+            }
+            storeTokens(await response.json());
+            return true;
+        }).catch(() => false).finally(() => {
+            refreshInFlight = null;
+        });
+    }
+    return refreshInFlight;
+}
+
+// fetch() with the current access token, retried once after a refresh on 401
+async function authFetch(url, options = {}) {
+    const withAuth = () => ({
+        ...options,
+        headers: { ...(options.headers || {}), 'Authorization': `Bearer ${authToken}` }
+    });
+
+    let response = await fetch(url, withAuth());
+    if (response.status === 401 && await refreshAccessToken()) {
+        response = await fetch(url, withAuth());
+    }
+    return response;
+}
+
 // UI functions
 function showLoginModal() {
     document.getElementById('login-modal').classList.add('active');
@@ -204,6 +291,7 @@ function hideLoginModal() {
 
 function showApp() {
     document.getElementById('app').classList.remove('hidden');
+    syncReady = initSync();
     if (currentUser) {
         document.getElementById('user-name').textContent = currentUser.username;
     }
@@ -259,7 +347,7 @@ function toggleSidebar() {
 // Dashboard functions
 async function loadDashboard() {
     try {
-        const response = await fetch(`${API_BASE}/dashboard`, {
+        const response = await authFetch(`${API_BASE}/dashboard`, {
             headers: {
                 'Authorization': `Bearer ${authToken}`
             }
@@ -321,7 +409,7 @@ async function analyzeText() {
     }
 
     try {
-        const response = await fetch(`${API_BASE}/ai/analyze`, {
+        const response = await authFetch(`${API_BASE}/ai/analyze`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -378,21 +466,27 @@ async function generateContent() {
     }
 
     try {
-        const response = await fetch(`${API_BASE}/ai/generate`, {
+        const response = await authFetch(`${API_BASE}/ai/generate`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
+                'Accept': 'text/event-stream',
                 'Authorization': `Bearer ${authToken}`
             },
             body: JSON.stringify({ prompt, type })
         });
 
-        const data = await response.json();
+        if (!response.ok) {
+            const data = await response.json();
+            showNotification(data.error || 'Generation failed', 'error');
+            return;
+        }
 
-        if (response.ok) {
-            displayGenerationResults(data.content, data.type);
+        if (response.body && (response.headers.get('Content-Type') || '').startsWith('text/event-stream')) {
+            await streamGeneration(response, type);
         } else {
-            showNotification(data.error || 'Generation failed', 'error');
+            const data = await response.json();
+            displayGenerationResults(data.content, data.type);
         }
     } catch (error) {
         console.error('Generation error:', error);
@@ -400,70 +494,114 @@ async function generateContent() {
     }
 }
 
+// Render each chunk as it arrives instead of waiting for the whole body
+async function streamGeneration(response, type) {
+    const output = displayGenerationResults('', type);
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line; keep any partial one
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        for (const raw of events) {
+            let event = 'message';
+            let data = '';
+            for (const line of raw.split('\n')) {
+                if (line.startsWith('event: ')) {
+                    event = line.slice(7);
+                } else if (line.startsWith('data: ')) {
+                    data += line.slice(6);
+                }
+            }
+            const payload = JSON.parse(data);
+            if (event === 'error') {
+                throw new Error(payload.error);
+            }
+            if (event === 'message') {
+                output.textContent += payload.text;
+            }
+        }
+    }
+}
+
 function displayGenerationResults(content, type) {
     const container = document.getElementById('generation-results');
     container.innerHTML = `
         <h4>Generated ${type.charAt(0).toUpperCase() + type.slice(1)}</h4>
         <div class="generated-content">
-            <pre>${content}</pre>
+            <pre></pre>
         </div>
-        <button onclick="copyToClipboard('${content.replace(/'/g, "\\'")}')">
+        <button>
             <i class="fas fa-copy"></i> Copy
         </button>
     `;
+    const output = container.querySelector('pre');
+    output.textContent = content;
+    container.querySelector('button').addEventListener('click', () => copyToClipboard(output.textContent));
+    return output;
 }
 
 // Task functions
-async function loadTasks() {
+async function loadTasks(reset = true) {
     try {
-        const response = await fetch(`${API_BASE}/tasks`, {
-            headers: {
-                'Authorization': `Bearer ${authToken}`
-            }
-        });
-
-        if (response.ok) {
-            const data = await response.json();
-            displayTasks(data.tasks);
+        const data = await fetchPage('tasks', 'tasks', reset);
+        if (data) {
+            displayTasks(data.tasks, !reset);
         }
     } catch (error) {
         console.error('Tasks load error:', error);
     }
 }
 
-function displayTasks(tasks) {
+function displayTasks(tasks, append = false) {
     const container = document.getElementById('tasks-list');
-    container.innerHTML = '';
+    if (!append) {
+        container.innerHTML = '';
+    }
 
-    if (tasks.length === 0) {
+    if (tasks.length === 0 && !append) {
         container.innerHTML = '<p class="empty-state">No tasks found. Create your first task!</p>';
         return;
     }
 
-    tasks.forEach(task => {
-        const item = document.createElement('div');
-        item.className = 'task-item';
-        item.innerHTML = `
-            <div class="task-info">
-                <div class="task-title">${task.title}</div>
-                <div class="task-description">${task.description || 'No description'}</div>
-                <div class="task-meta">
-                    <span class="task-status ${task.status}">${task.status}</span>
-                    <span class="task-priority ${task.priority}">${task.priority}</span>
-                    <span>${formatDate(task.created_at)}</span>
-                </div>
-            </div>
-            <div class="task-actions">
-                <button onclick="toggleTaskStatus(${task.id}, '${task.status}')" class="btn-secondary">
-                    <i class="fas fa-${task.status === 'completed' ? 'undo' : 'check'}"></i>
-                </button>
-                <button onclick="deleteTask(${task.id})" class="btn-error">
-                    <i class="fas fa-trash"></i>
-                </button>
+    tasks.forEach(task => container.appendChild(taskElement(task)));
+
+    attachScrollSentinel(container, 'tasks', () => loadTasks(false));
+}
+
+function taskElement(task) {
+    const item = document.createElement('div');
+    item.className = 'task-item';
+    item.dataset.id = task.id;
+    item.dataset.created = task.created_at;
+    item.innerHTML = `
+        <div class="task-info">
+            <div class="task-title">${task.title}</div>
+            <div class="task-description">${task.description || 'No description'}</div>
+            <div class="task-meta">
+                <span class="task-status ${task.status}">${task.status}</span>
+                <span class="task-priority ${task.priority}">${task.priority}</span>
+                <span>${formatDate(task.created_at)}</span>
             </div>
-        `;
-        container.appendChild(item);
-    });
+        </div>
+        <div class="task-actions">
+            <button onclick="toggleTaskStatus(${task.id}, '${task.status}')" class="btn-secondary">
+                <i class="fas fa-${task.status === 'completed' ? 'undo' : 'check'}"></i>
+            </button>
+            <button onclick="deleteTask(${task.id})" class="btn-error">
+                <i class="fas fa-trash"></i>
+            </button>
+        </div>
+    `;
+    return item;
 }
 
 function showCreateTaskModal() {
@@ -478,7 +616,7 @@ async function handleCreateTask(e) {
     const priority = document.getElementById('task-priority').value;
 
     try {
-        const response = await fetch(`${API_BASE}/tasks`, {
+        const response = await authFetch(`${API_BASE}/tasks`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -491,7 +629,7 @@ async function handleCreateTask(e) {
 
         if (response.ok) {
             closeModal('task-modal');
-            loadTasks();
+            syncChanges();
             showNotification('Task created successfully!', 'success');
             
             // Reset form
@@ -509,7 +647,7 @@ async function toggleTaskStatus(taskId, currentStatus) {
     const newStatus = currentStatus === 'completed' ? 'pending' : 'completed';
 
     try {
-        const response = await fetch(`${API_BASE}/tasks/${taskId}`, {
+        const response = await authFetch(`${API_BASE}/tasks/${taskId}`, {
             method: 'PUT',
             headers: {
                 'Content-Type': 'application/json',
@@ -519,7 +657,7 @@ async function toggleTaskStatus(taskId, currentStatus) {
         });
 
         if (response.ok) {
-            loadTasks();
+            syncChanges();
             showNotification('Task updated successfully!', 'success');
         }
     } catch (error) {
@@ -534,7 +672,7 @@ async function deleteTask(taskId) {
     }
 
     try {
-        const response = await fetch(`${API_BASE}/tasks/${taskId}`, {
+        const response = await authFetch(`${API_BASE}/tasks/${taskId}`, {
             method: 'DELETE',
             headers: {
                 'Authorization': `Bearer ${authToken}`
@@ -542,7 +680,7 @@ async function deleteTask(taskId) {
         });
 
         if (response.ok) {
-            loadTasks();
+            syncChanges();
             showNotification('Task deleted successfully!', 'success');
         }
     } catch (error) {
@@ -552,43 +690,108 @@ async function deleteTask(taskId) {
 }
 
 // Knowledge Base functions
-async function loadKnowledge() {
+async function loadKnowledge(reset = true) {
+    try {
+        const data = await fetchPage('knowledge', 'knowledge', reset);
+        if (data) {
+            displayKnowledge(data.knowledge, !reset);
+        }
+    } catch (error) {
+        console.error('Knowledge load error:', error);
+    }
+}
+
+function displayKnowledge(knowledge, append = false) {
+    const container = document.getElementById('knowledge-list');
+    if (!append) {
+        container.innerHTML = '';
+    }
+
+    if (knowledge.length === 0 && !append) {
+        container.innerHTML = '<p class="empty-state">No knowledge entries found. Add your first entry!</p>';
+        return;
+    }
+
+    knowledge.forEach(item => container.appendChild(knowledgeElement(item)));
+
+    attachScrollSentinel(container, 'knowledge', () => loadKnowledge(false));
+}
+
+function knowledgeElement(item) {
+    const element = document.createElement('div');
+    element.className = 'knowledge-item';
+    element.dataset.id = item.id;
+    element.dataset.created = item.created_at;
+    element.innerHTML = `
+        <div class="knowledge-title">${item.title}</div>
+        <div class="knowledge-content">${item.content.substring(0, 200)}${item.content.length > 200 ? '...' : ''}</div>
+        <div class="knowledge-meta">
+            <span class="knowledge-category">${item.category}</span>
+            <span>${formatDate(item.created_at)}</span>
+        </div>
+    `;
+    return element;
+}
+
+let searchSequence = 0;
+
+async function searchKnowledge(query) {
+    if (!query) {
+        if (currentView === 'knowledge') {
+            loadKnowledge();
+        }
+        return;
+    }
+
+    if (currentView !== 'knowledge') {
+        switchView('knowledge');
+    }
+
+    // Drop any list page in flight and pause infinite scroll while searching
+    const state = pagination.knowledge;
+    state.generation++;
+    state.done = true;
+    const sequence = ++searchSequence;
+
     try {
-        const response = await fetch(`${API_BASE}/knowledge`, {
+        const params = new URLSearchParams({ q: query });
+        const response = await authFetch(`${API_BASE}/knowledge/search?${params}`, {
             headers: {
                 'Authorization': `Bearer ${authToken}`
             }
         });
 
-        if (response.ok) {
+        if (response.ok && sequence === searchSequence) {
             const data = await response.json();
-            displayKnowledge(data.knowledge);
+            displaySearchResults(data.results);
         }
     } catch (error) {
-        console.error('Knowledge load error:', error);
+        console.error('Knowledge search error:', error);
     }
 }
 
-function displayKnowledge(knowledge) {
+function displaySearchResults(results) {
     const container = document.getElementById('knowledge-list');
     container.innerHTML = '';
 
-    if (knowledge.length === 0) {
-        container.innerHTML = '<p class="empty-state">No knowledge entries found. Add your first entry!</p>';
+    if (results.length === 0) {
+        container.innerHTML = '<p class="empty-state">No matching knowledge entries.</p>';
         return;
     }
 
-    knowledge.forEach(item => {
+    results.forEach(item => {
         const element = document.createElement('div');
         element.className = 'knowledge-item';
+        // title and snippet arrive HTML-escaped with only <mark> highlights
         element.innerHTML = `
             <div class="knowledge-title">${item.title}</div>
-            <div class="knowledge-content">${item.content.substring(0, 200)}${item.content.length > 200 ? '...' : ''}</div>
+            <div class="knowledge-content">${item.snippet}</div>
             <div class="knowledge-meta">
-                <span class="knowledge-category">${item.category}</span>
+                <span class="knowledge-category"></span>
                 <span>${formatDate(item.created_at)}</span>
             </div>
         `;
+        element.querySelector('.knowledge-category').textContent = item.category;
         container.appendChild(element);
     });
 }
@@ -606,7 +809,7 @@ async function handleCreateKnowledge(e) {
     const tags = document.getElementById('knowledge-tags').value.split(',').map(tag => tag.trim()).filter(tag => tag);
 
     try {
-        const response = await fetch(`${API_BASE}/knowledge`, {
+        const response = await authFetch(`${API_BASE}/knowledge`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -619,7 +822,7 @@ async function handleCreateKnowledge(e) {
 
         if (response.ok) {
             closeModal('knowledge-modal');
-            loadKnowledge();
+            syncChanges();
             showNotification('Knowledge entry created successfully!', 'success');
             
             // Reset form
@@ -634,57 +837,221 @@ async function handleCreateKnowledge(e) {
 }
 
 // Integration functions
-async function loadIntegrations() {
+async function loadIntegrations(reset = true) {
     try {
-        const response = await fetch(`${API_BASE}/integrations`, {
-            headers: {
-                'Authorization': `Bearer ${authToken}`
-            }
-        });
-
-        if (response.ok) {
-            const data = await response.json();
-            displayIntegrations(data.integrations);
+        const data = await fetchPage('integrations', 'integrations', reset);
+        if (data) {
+            displayIntegrations(data.integrations, !reset);
         }
     } catch (error) {
         console.error('Integrations load error:', error);
     }
 }
 
-function displayIntegrations(integrations) {
+function displayIntegrations(integrations, append = false) {
     const container = document.getElementById('integrations-list');
-    container.innerHTML = '';
+    if (!append) {
+        container.innerHTML = '';
+    }
 
-    if (integrations.length === 0) {
+    if (integrations.length === 0 && !append) {
         container.innerHTML = '<p class="empty-state">No active integrations. Connect your first integration!</p>';
         return;
     }
 
-    integrations.forEach(integration => {
-        const item = document.createElement('div');
-        item.className = 'integration-item';
-        item.innerHTML = `
-            <div class="integration-info">
-                <div class="integration-name">${integration.name}</div>
-                <div class="integration-type">${integration.type}</div>
-                <div class="integration-status ${integration.is_active ? 'active' : 'inactive'}">
-                    ${integration.is_active ? 'Active' : 'Inactive'}
-                </div>
-            </div>
-            <div class="integration-actions">
-                <button onclick="toggleIntegration(${integration.id}, ${integration.is_active})" class="btn-secondary">
-                    ${integration.is_active ? 'Disable' : 'Enable'}
-                </button>
+    integrations.forEach(integration => container.appendChild(integrationElement(integration)));
+
+    attachScrollSentinel(container, 'integrations', () => loadIntegrations(false));
+}
+
+function integrationElement(integration) {
+    const item = document.createElement('div');
+    item.className = 'integration-item';
+    item.dataset.id = integration.id;
+    item.dataset.created = integration.created_at;
+    item.innerHTML = `
+        <div class="integration-info">
+            <div class="integration-name">${integration.name}</div>
+            <div class="integration-type">${integration.type}</div>
+            <div class="integration-status ${integration.is_active ? 'active' : 'inactive'}">
+                ${integration.is_active ? 'Active' : 'Inactive'}
             </div>
-        `;
-        container.appendChild(item);
-    });
+        </div>
+        <div class="integration-actions">
+            <button onclick="toggleIntegration(${integration.id}, ${integration.is_active})" class="btn-secondary">
+                ${integration.is_active ? 'Disable' : 'Enable'}
+            </button>
+        </div>
+    `;
+    return item;
 }
 
 function showCreateIntegrationModal() {
     showNotification('Integration setup coming soon!', 'info');
 }
 
+// Pagination functions
+async function fetchPage(name, endpoint, reset) {
+    const state = pagination[name];
+    if (reset) {
+        // Invalidate any page still in flight for the previous listing
+        state.generation++;
+        state.cursor = null;
+        state.done = false;
+        state.loading = false;
+    }
+    if (state.loading || state.done) {
+        return null;
+    }
+
+    const generation = state.generation;
+    const params = new URLSearchParams({ limit: PAGE_SIZE });
+    if (state.cursor) {
+        params.set('cursor', state.cursor);
+    }
+
+    state.loading = true;
+    try {
+        const response = await authFetch(`${API_BASE}/${endpoint}?${params}`, {
+            headers: {
+                'Authorization': `Bearer ${authToken}`
+            }
+        });
+
+        if (!response.ok || generation !== state.generation) {
+            return null;
+        }
+
+        const data = await response.json();
+        state.cursor = data.next_cursor;
+        state.done = !data.next_cursor;
+        return data;
+    } finally {
+        if (generation === state.generation) {
+            state.loading = false;
+        }
+    }
+}
+
+function attachScrollSentinel(container, name, loadMore) {
+    container.querySelector('.scroll-sentinel')?.remove();
+    if (pagination[name].done) {
+        return;
+    }
+
+    const sentinel = document.createElement('div');
+    sentinel.className = 'scroll-sentinel';
+    container.appendChild(sentinel);
+
+    const observer = new IntersectionObserver(entries => {
+        if (entries[0].isIntersecting) {
+            observer.disconnect();
+            loadMore();
+        }
+    });
+    observer.observe(sentinel);
+}
+
+// Sync functions
+const syncedLists = {
+    tasks: {
+        container: 'tasks-list',
+        render: taskElement,
+        reload: loadTasks,
+        empty: '<p class="empty-state">No tasks found. Create your first task!</p>'
+    },
+    knowledge: {
+        container: 'knowledge-list',
+        render: knowledgeElement,
+        reload: loadKnowledge,
+        empty: '<p class="empty-state">No knowledge entries found. Add your first entry!</p>'
+    },
+    integrations: {
+        container: 'integrations-list',
+        render: integrationElement,
+        reload: loadIntegrations,
+        empty: '<p class="empty-state">No active integrations. Connect your first integration!</p>'
+    }
+};
+
+async function initSync() {
+    syncWatermark = null;
+    try {
+        const response = await authFetch(`${API_BASE}/sync`);
+        if (response.ok) {
+            syncWatermark = (await response.json()).watermark;
+        }
+    } catch (error) {
+        console.error('Sync init error:', error);
+    }
+}
+
+// Runs one pass at a time so each starts from the watermark the last reached
+function syncChanges() {
+    syncQueue = syncQueue.then(runSync).catch(error => console.error('Sync error:', error));
+    return syncQueue;
+}
+
+async function runSync() {
+    await syncReady;
+    if (syncWatermark === null) {
+        syncedLists[currentView]?.reload();
+        return;
+    }
+
+    let hasMore = true;
+    while (hasMore) {
+        const response = await authFetch(`${API_BASE}/sync?since=${syncWatermark}`);
+        if (!response.ok) {
+            return;
+        }
+        const data = await response.json();
+        if (data.reset) {
+            // Deletions we never saw were pruned server-side: start over
+            syncWatermark = data.watermark;
+            syncedLists[currentView]?.reload();
+            return;
+        }
+        Object.entries(data.changes).forEach(([name, change]) => applyChanges(name, change));
+        syncWatermark = data.watermark;
+        hasMore = data.has_more;
+    }
+}
+
+function applyChanges(name, change) {
+    const list = syncedLists[name];
+    const container = document.getElementById(list.container);
+
+    change.deleted.forEach(id => container.querySelector(`[data-id="${id}"]`)?.remove());
+
+    change.upserted.forEach(row => {
+        const element = list.render(row);
+        const existing = container.querySelector(`[data-id="${row.id}"]`);
+        if (existing) {
+            existing.replaceWith(element);
+            return;
+        }
+
+        // Keep newest-first order; rows older than everything loaded so far
+        // will arrive with their page instead
+        const after = Array.from(container.querySelectorAll('[data-id]')).find(other =>
+            other.dataset.created < row.created_at ||
+            (other.dataset.created === row.created_at && Number(other.dataset.id) < row.id));
+        if (after) {
+            container.insertBefore(element, after);
+        } else if (pagination[name].done) {
+            container.insertBefore(element, container.querySelector('.scroll-sentinel'));
+        } else {
+            return;
+        }
+        container.querySelector('.empty-state')?.remove();
+    });
+
+    if (!container.querySelector('[data-id]') && pagination[name].done) {
+        container.innerHTML = list.empty;
+    }
+}
+
 // Utility functions
 function closeModal(modalId) {
     document.getElementById(modalId).classList.remove('active');